@@ -0,0 +1,169 @@
+"""
+Admission control for surges.
+
+Every request is put in an endpoint class. Classes have their own
+concurrency limit and also share a total budget; when a slot frees up it
+goes to the highest-priority waiter, so triage submissions are always
+admitted ahead of queue/dashboard reads.
+
+    triage   POST /patient-visits, POST /patients   (highest priority)
+    write    other POST/PATCH/PUT/DELETE
+    read     GET endpoints
+    explain  /triage-explain (LLM)                   (shed first)
+
+Instead of letting latency grow without bound, requests that can't get a
+slot within their class's queue timeout are rejected with 503 and a
+Retry-After header. Explain calls are never queued: under pressure they are
+rejected immediately with 429. While the backend is under pressure,
+`under_pressure` tells create_visit to skip the remote ML engine and score
+locally.
+"""
+import asyncio
+import itertools
+import os
+from bisect import insort
+from typing import Dict, List, Optional, Tuple
+
+PRIORITY = {"triage": 0, "write": 1, "read": 2, "explain": 3}
+TRIAGE_PATHS = {"/patient-visits", "/patients"}
+EXEMPT_PREFIXES = ("/admin", "/internal", "/metrics", "/healthz", "/readyz")
+
+
+class Rejected(Exception):
+    def __init__(self, status_code: int, retry_after: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.detail = detail
+
+
+def classify(method: str, path: str) -> Optional[str]:
+    """Endpoint class for a request, or None if it bypasses admission control"""
+    if path == "/" or path.startswith(EXEMPT_PREFIXES) or method == "OPTIONS":
+        return None
+    if path == "/triage-explain":
+        return "explain"
+    if method == "POST" and path in TRIAGE_PATHS:
+        return "triage"
+    if method in ("POST", "PATCH", "PUT", "DELETE"):
+        return "write"
+    return "read"
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        total: int,
+        limits: Dict[str, int],
+        queue_timeouts: Dict[str, float],
+        shed_threshold: float = 0.75,
+        retry_after: int = 2,
+        explain_retry_after: int = 10,
+    ):
+        self.total = total
+        self.limits = limits
+        self.queue_timeouts = queue_timeouts
+        self.shed_threshold = shed_threshold
+        self.retry_after = retry_after
+        self.explain_retry_after = explain_retry_after
+        self.in_flight = {c: 0 for c in PRIORITY}
+        self.total_in_flight = 0
+        self._waiters: List[Tuple[int, int, str, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self.stats = {
+            "admitted": {c: 0 for c in PRIORITY},
+            "queued": {c: 0 for c in PRIORITY},
+            "rejected": {c: 0 for c in PRIORITY},
+        }
+
+    @classmethod
+    def from_env(cls) -> "AdmissionController":
+        return cls(
+            total=int(os.getenv("ADMISSION_TOTAL", "64")),
+            limits={
+                "triage": int(os.getenv("ADMISSION_TRIAGE_LIMIT", "64")),
+                "write": int(os.getenv("ADMISSION_WRITE_LIMIT", "32")),
+                "read": int(os.getenv("ADMISSION_READ_LIMIT", "32")),
+                "explain": int(os.getenv("ADMISSION_EXPLAIN_LIMIT", "4")),
+            },
+            queue_timeouts={
+                "triage": float(os.getenv("ADMISSION_TRIAGE_TIMEOUT", "30")),
+                "write": float(os.getenv("ADMISSION_WRITE_TIMEOUT", "10")),
+                "read": float(os.getenv("ADMISSION_READ_TIMEOUT", "1")),
+                "explain": 0.0,
+            },
+            shed_threshold=float(os.getenv("ADMISSION_SHED_THRESHOLD", "0.75")),
+        )
+
+    @property
+    def under_pressure(self) -> bool:
+        """True once the shared budget is mostly used or anyone is waiting"""
+        return bool(self._waiters) or self.total_in_flight >= self.total * self.shed_threshold
+
+    def _has_room(self, cls: str) -> bool:
+        return self.total_in_flight < self.total and self.in_flight[cls] < self.limits[cls]
+
+    def _grant(self, cls: str):
+        self.in_flight[cls] += 1
+        self.total_in_flight += 1
+        self.stats["admitted"][cls] += 1
+
+    def _reject(self, cls: str, status_code: int, retry_after: int, detail: str) -> Rejected:
+        self.stats["rejected"][cls] += 1
+        return Rejected(status_code, retry_after, detail)
+
+    async def acquire(self, cls: str):
+        if cls == "explain":
+            if self.under_pressure or not self._has_room(cls):
+                raise self._reject(cls, 429, self.explain_retry_after, "Explanations are paused while the system is busy")
+            self._grant(cls)
+            return
+
+        # Only jump straight in if nobody of equal or higher priority is already waiting
+        blocked = any(p <= PRIORITY[cls] for p, _, _, _ in self._waiters)
+        if not blocked and self._has_room(cls):
+            self._grant(cls)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (PRIORITY[cls], next(self._seq), cls, future)
+        insort(self._waiters, entry)
+        self.stats["queued"][cls] += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=self.queue_timeouts[cls])
+        except asyncio.TimeoutError:
+            if future.done():
+                return  # Granted at the last moment
+            self._waiters.remove(entry)
+            future.cancel()
+            raise self._reject(cls, 503, self.retry_after, "Server busy, please retry")
+        except asyncio.CancelledError:
+            # Client went away while queued: give back a slot we may have just been handed
+            if future.done():
+                self.release(cls)
+            else:
+                self._waiters.remove(entry)
+                future.cancel()
+            raise
+
+    def release(self, cls: str):
+        self.in_flight[cls] -= 1
+        self.total_in_flight -= 1
+        # Hand freed capacity to waiters in priority order, skipping classes at their own limit
+        i = 0
+        while i < len(self._waiters) and self.total_in_flight < self.total:
+            _, _, w_cls, future = self._waiters[i]
+            if self.in_flight[w_cls] < self.limits[w_cls]:
+                del self._waiters[i]
+                self._grant(w_cls)
+                future.set_result(None)
+            else:
+                i += 1
+
+    def snapshot(self) -> Dict:
+        return {
+            "in_flight": dict(self.in_flight),
+            "waiting": len(self._waiters),
+            "under_pressure": self.under_pressure,
+            **self.stats,
+        }
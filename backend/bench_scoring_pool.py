@@ -0,0 +1,139 @@
+"""
+Benchmark: inline vs process-pool scoring.
+
+Scores the same synthetic visits two ways and reports throughput plus
+the worst event-loop stall seen by a 1ms ticker running alongside (the
+cost other requests pay while scoring happens):
+
+    inline   predict() called directly on the event loop
+    pool     one pool job per visit, `--concurrency` in flight
+
+    python bench_scoring_pool.py [--visits 20000] [--workers 4] [--concurrency 64] [--model-dir models/<version>] [--json]
+
+Without --model-dir a throwaway model is fitted to the local rules.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from scoring import DEFAULT_RULES, extract_features, score_rules
+from scoring_pool import ScoringPool
+from triage_model import FEATURE_NAMES, TriageModel, train, vectorize
+
+DEPARTMENTS = ["Emergency", "Cardiology", "Respiratory", "Neurology", "General Medicine", "Orthopedics"]
+SYMPTOMS = ["chest pain", "shortness of breath", "severe headache", "cough", "high fever", "abdominal pain", "back pain", "dizziness"]
+CONDITIONS = ["heart failure", "asthma", "copd", "type 2 diabetes", "hypertension"]
+
+
+def synthetic_features(n, seed=7):
+    rng = random.Random(seed)
+    records = []
+    for _ in range(n):
+        history = [{"condition_name": rng.choice(CONDITIONS), "notes": None, "is_chronic": True}] if rng.random() < 0.4 else []
+        records.append(extract_features(
+            {"age": rng.randint(1, 95), "gender": rng.choice(["Male", "Female"])},
+            history,
+            {"bp_systolic": rng.randint(85, 200), "heart_rate": rng.randint(40, 150), "temperature": rng.uniform(96, 104)},
+            [{"symptom_name": s, "severity_score": rng.randint(1, 5)} for s in rng.sample(SYMPTOMS, rng.randint(1, 3))],
+        ))
+    return records
+
+
+def throwaway_model(path):
+    records = synthetic_features(2000, seed=1)
+    X = np.array([vectorize(f) for f in records], dtype=np.float32)
+    Y = []
+    for f in records:
+        r = score_rules(f)
+        Y.append(np.clip([r["risk_score"]] + [r["department_scores"][d] for d in DEPARTMENTS], 0, 1))
+    W, b = train(X, np.array(Y, dtype=np.float32), epochs=300)
+    manifest = {"version": "bench", "departments": DEPARTMENTS, "feature_names": FEATURE_NAMES}
+    TriageModel("bench", DEPARTMENTS, W, b, manifest).save(path)
+    return path
+
+
+async def measure(fn):
+    """Run fn() while a 1ms ticker records the worst event-loop stall"""
+    worst = 0.0
+    done = False
+
+    async def ticker():
+        nonlocal worst
+        while not done:
+            t = time.perf_counter()
+            await asyncio.sleep(0.001)
+            worst = max(worst, time.perf_counter() - t - 0.001)
+
+    tick = asyncio.create_task(ticker())
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    await fn()
+    elapsed = time.perf_counter() - start
+    done = True
+    await tick
+    return elapsed, worst
+
+
+async def run(args):
+    model_dir = args.model_dir or throwaway_model(os.path.join(tempfile.mkdtemp(), "bench"))
+    model = TriageModel.load(model_dir, mmap=True)
+    records = synthetic_features(args.visits)
+
+    pool = ScoringPool(workers=args.workers, max_pending=args.concurrency, queue_timeout=60)
+    pool.start(model_dir, DEFAULT_RULES)
+    await pool.score(records[0])  # Spawn and warm the workers
+
+    async def inline():
+        for i, f in enumerate(records):
+            model.predict(f)
+            if i % 1000 == 0:
+                await asyncio.sleep(0)
+
+    async def pooled():
+        sem = asyncio.Semaphore(args.concurrency)
+
+        async def one(f):
+            async with sem:
+                await pool.score(f)
+        await asyncio.gather(*(one(f) for f in records))
+
+    results = {"visits": args.visits, "workers": args.workers, "cpu_count": os.cpu_count(), "modes": {}}
+    for name, fn in (("inline", inline), ("pool", pooled)):
+        elapsed, stall = await measure(fn)
+        results["modes"][name] = {
+            "seconds": round(elapsed, 4),
+            "visits_per_second": round(args.visits / elapsed, 1),
+            "max_loop_stall_ms": round(stall * 1000, 2),
+        }
+    pool.shutdown()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--visits", type=int, default=20000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--model-dir")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{args.visits} visits, {args.workers} workers, {results['cpu_count']} CPUs")
+    print(f"{'mode':<8}{'seconds':>10}{'visits/s':>12}{'max stall ms':>14}")
+    for name, r in results["modes"].items():
+        print(f"{name:<8}{r['seconds']:>10}{r['visits_per_second']:>12}{r['max_loop_stall_ms']:>14}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Benchmark: serializing a 50-entry department queue.
+
+Times the JSON encoders a /queues/{dept} response can go through and the
+size on the wire after compression:
+
+    default         jsonable_encoder + stdlib json (FastAPI without a response model)
+    response_model  QueueResponse validation + pydantic-core JSON (FastAPI with a response model)
+    fast_json       FastJSONResponse.render (what the endpoint uses: orjson if installed, else pydantic-core)
+
+    python bench_serialization.py [--entries 50] [--iterations 2000] [--json]
+"""
+import argparse
+import gzip
+import json
+import random
+import time
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from compression import brotli
+from schemas import FastJSONResponse, QueueResponse
+
+COMPLAINTS = ["Chest pain radiating to left arm", "Shortness of breath", "Severe headache", "High fever and cough", "Abdominal pain"]
+
+
+def synthetic_queue(entries, seed=7):
+    rng = random.Random(seed)
+    queue = []
+    for i in range(entries):
+        queue.append({
+            "queue_id": 1000 + i,
+            "prediction_id": 5000 + i,
+            "dept_id": 1,
+            "priority_score": round(rng.uniform(0.1, 1.5), 4),
+            "queue_position": i + 1,
+            "routing_role": rng.choice(["primary", "shadow"]),
+            "status": "pending",
+            "added_timestamp": f"2025-03-01T10:{i % 60:02d}:00.123456",
+            "triage_predictions": {
+                "risk_score": round(rng.random(), 4),
+                "risk_level": rng.choice(["High", "Medium", "Low"]),
+                "patient_visits": {
+                    "visit_id": 3000 + i,
+                    "visit_timestamp": f"2025-03-01T10:{i % 60:02d}:00.123456",
+                    "chief_complaint": rng.choice(COMPLAINTS),
+                    "patients": {
+                        "full_name": f"Patient {i}",
+                        "age": rng.randint(1, 95),
+                        "gender": rng.choice(["Male", "Female"]),
+                        "contact_info": f"patient{i}@example.com",
+                    },
+                },
+            },
+        })
+    return {"queue": queue}
+
+
+def default_encode(payload):
+    return json.dumps(
+        jsonable_encoder(payload), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def timed(fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        out = fn()
+    return (time.perf_counter() - start) / iterations, out
+
+
+def run(args):
+    payload = synthetic_queue(args.entries)
+    adapter = TypeAdapter(QueueResponse)
+
+    encoders = {
+        "default": lambda: default_encode(payload),
+        "response_model": lambda: adapter.dump_json(adapter.validate_python(payload)),
+    }
+    fast = FastJSONResponse.__new__(FastJSONResponse)
+    encoders["fast_json"] = lambda: fast.render(payload)
+
+    results = {"entries": args.entries, "iterations": args.iterations, "encoders": {}, "wire": {}}
+    body = None
+    for name, fn in encoders.items():
+        per_call, out = timed(fn, args.iterations)
+        body = body or out
+        results["encoders"][name] = {"us_per_response": round(per_call * 1e6, 1), "bytes": len(out)}
+
+    compressors = {"identity": lambda: body, "gzip": lambda: gzip.compress(body, compresslevel=5)}
+    if brotli is not None:
+        compressors["br"] = lambda: brotli.compress(body, quality=5)
+    for name, fn in compressors.items():
+        per_call, out = timed(fn, max(1, args.iterations // 10))
+        results["wire"][name] = {"bytes": len(out), "us_to_compress": round(per_call * 1e6, 1)}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entries", type=int, default=50)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    results = run(args)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{args.entries}-entry queue, {args.iterations} iterations")
+    print(f"{'encoder':<16}{'us/response':>14}{'bytes':>10}")
+    for name, r in results["encoders"].items():
+        print(f"{name:<16}{r['us_per_response']:>14}{r['bytes']:>10}")
+    print(f"{'encoding':<16}{'bytes':>14}{'us to compress':>16}")
+    for name, r in results["wire"].items():
+        print(f"{name:<16}{r['bytes']:>14}{r['us_to_compress']:>16}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""
+Microbenchmarks for the backend's hot paths, with stored baselines.
+
+    run_ml_engine        score_rules() on visit features (the local scoring path)
+    model_predict        embedded TriageModel.predict() (throwaway model fitted to the rules)
+    run_ml_logic         populate_bulk_data.run_ml_logic()
+    dashboard_stats      stats.summarize_active_queue() over the active queue rows
+    queue_serialization  FastJSONResponse rendering of 50-entry queue pages
+
+Every benchmark runs over fixed, seeded synthetic datasets of 1k, 100k or 1M
+visits. Data is generated in chunks outside the timed sections, so only
+the hot path itself is measured. Each benchmark reports the best of
+--repeat runs.
+
+    python bench_suite.py                                 # 1k and 100k, compared with the baseline
+    python bench_suite.py --sizes 1k,100k,1m --only run_ml_engine,dashboard_stats
+    python bench_suite.py --save-baseline                 # record a new baseline
+    python bench_suite.py --json --fail-on-regression 0.15
+
+The baseline (bench_baseline.json) is machine-specific: record it on the
+machine you compare on.
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+os.environ.setdefault("DB_BACKEND", "memory")  # populate_bulk_data creates a client at import
+
+import populate_bulk_data
+from bench_scoring_pool import synthetic_features, throwaway_model
+from bench_serialization import synthetic_queue
+from schemas import FastJSONResponse
+from scoring import DEFAULT_RULES, score_rules
+from stats import summarize_active_queue
+from triage_model import TriageModel
+
+SIZES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+CHUNK = 10_000
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+NOW = datetime(2025, 3, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def chunks(n, make):
+    """Yield make(count, seed) for consecutive chunks of n items"""
+    for i, start in enumerate(range(0, n, CHUNK)):
+        yield make(min(CHUNK, n - start), 1000 + i)
+
+
+def timed_over_chunks(n, make, work):
+    elapsed = 0.0
+    for chunk in chunks(n, make):
+        start = time.perf_counter()
+        work(chunk)
+        elapsed += time.perf_counter() - start
+    return elapsed
+
+
+def bench_run_ml_engine(n):
+    def work(records):
+        for f in records:
+            score_rules(f, DEFAULT_RULES)
+    return timed_over_chunks(n, lambda count, seed: synthetic_features(count, seed), work)
+
+
+_model = None
+
+
+def bench_model_predict(n):
+    global _model
+    if _model is None:
+        _model = TriageModel.load(throwaway_model(os.path.join(tempfile.mkdtemp(), "bench")))
+
+    def work(records):
+        for f in records:
+            _model.predict(f)
+    return timed_over_chunks(n, lambda count, seed: synthetic_features(count, seed), work)
+
+
+def bulk_visits(count, seed):
+    rng = random.Random(seed)
+    visits = []
+    for i in range(count):
+        symptoms = [
+            {"name": s["name"], "severity": rng.randint(*s["sevRange"])}
+            for s in rng.sample(populate_bulk_data.SYMPTOMS, rng.randint(1, 3))
+        ]
+        visits.append((i, {"age": rng.randint(1, 95)}, symptoms))
+    return visits
+
+
+def bench_run_ml_logic(n):
+    def work(visits):
+        for visit_id, patient, symptoms in visits:
+            populate_bulk_data.run_ml_logic(visit_id, patient, symptoms)
+    return timed_over_chunks(n, bulk_visits, work)
+
+
+def active_queue_rows(n, seed=7):
+    """Active department_queue rows; about one patient in five also has a shadow entry"""
+    rng = random.Random(seed)
+    rows = []
+    pred_id = 0
+    while len(rows) < n:
+        pred_id += 1
+        row = {
+            "prediction_id": pred_id,
+            "status": rng.choice(["pending", "pending", "treating"]),
+            "triage_predictions": {
+                "risk_level": rng.choice(["High", "Medium", "Low"]),
+                "patient_visits": {"visit_timestamp": (NOW - timedelta(minutes=rng.randint(0, 600))).isoformat()},
+            },
+        }
+        rows.append(row)
+        if rng.random() < 0.2 and len(rows) < n:
+            rows.append(dict(row, status="pending"))
+    return rows
+
+
+def bench_dashboard_stats(n):
+    rows = active_queue_rows(n)
+    start = time.perf_counter()
+    summarize_active_queue(rows, now=NOW)
+    return time.perf_counter() - start
+
+
+def bench_queue_serialization(n):
+    fast = FastJSONResponse.__new__(FastJSONResponse)
+    pages = max(1, n // 50)
+    page = synthetic_queue(50)
+    start = time.perf_counter()
+    for _ in range(pages):
+        fast.render(page)
+    return time.perf_counter() - start
+
+
+BENCHMARKS = {
+    "run_ml_engine": bench_run_ml_engine,
+    "model_predict": bench_model_predict,
+    "run_ml_logic": bench_run_ml_logic,
+    "dashboard_stats": bench_dashboard_stats,
+    "queue_serialization": bench_queue_serialization,
+}
+
+
+def run(names, sizes, repeat):
+    results = {}
+    for name in names:
+        for size in sizes:
+            n = SIZES[size]
+            best = min(BENCHMARKS[name](n) for _ in range(repeat))
+            results[f"{name}/{size}"] = {"seconds": round(best, 6), "ns_per_visit": round(best / n * 1e9, 1)}
+    return results
+
+
+def compare(results, baseline, threshold):
+    report = {}
+    for key, r in results.items():
+        base = baseline.get("results", {}).get(key)
+        entry = {"ns_per_visit": r["ns_per_visit"]}
+        if base:
+            change = r["ns_per_visit"] / base["ns_per_visit"] - 1
+            entry.update({
+                "baseline_ns_per_visit": base["ns_per_visit"],
+                "change": round(change, 4),
+                "status": "regression" if change > threshold else "improvement" if change < -threshold else "ok",
+            })
+        else:
+            entry["status"] = "new"
+        report[key] = entry
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1k,100k", help=f"comma-separated, from {', '.join(SIZES)}")
+    parser.add_argument("--only", help="comma-separated benchmark names")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative change reported as a regression")
+    parser.add_argument("--fail-on-regression", type=float, metavar="THRESHOLD",
+                        help="exit 1 if anything is slower than the baseline by more than THRESHOLD")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    names = args.only.split(",") if args.only else list(BENCHMARKS)
+    sizes = args.sizes.split(",")
+    results = run(names, sizes, args.repeat)
+
+    if args.save_baseline:
+        baseline = {"recorded_at": datetime.now(timezone.utc).isoformat(), "results": results}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                old = json.load(f)
+            baseline["results"] = {**old.get("results", {}), **results}
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"Baseline written to {args.baseline}")
+        return
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    threshold = args.fail_on_regression if args.fail_on_regression is not None else args.threshold
+    report = compare(results, baseline, threshold)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"{'benchmark':<30}{'ns/visit':>12}{'baseline':>12}{'change':>10}  status")
+        for key, r in report.items():
+            base = r.get("baseline_ns_per_visit", "-")
+            change = f"{r['change'] * 100:+.1f}%" if "change" in r else "-"
+            print(f"{key:<30}{r['ns_per_visit']:>12}{base:>12}{change:>10}  {r['status']}")
+
+    if args.fail_on_regression is not None and any(r["status"] == "regression" for r in report.values()):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Small in-process caches.
+
+TTLCache is a bounded LRU map whose entries also expire after a
+time-to-live. It can be bounded by entry count and, optionally, by an
+approximate memory size (serialized JSON length of each value). It keeps
+hit/miss counters so callers can export a hit rate.
+Not thread-safe: it is meant to be used from the event loop.
+"""
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+_MISSING = object()
+
+
+def json_size(value: Any) -> int:
+    return len(json.dumps(value, default=str))
+
+
+class TTLCache:
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_seconds: float = 300.0,
+        max_bytes: Optional[int] = None,
+        sizeof: Callable[[Any], int] = json_size,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.bytes = 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        item = self._data.get(key, _MISSING)
+        if item is _MISSING:
+            self.misses += 1
+            return default
+        value, expires_at, _size = item
+        if expires_at < time.monotonic():
+            self._remove(key)
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None):
+        size = self.sizeof(value) if self.max_bytes is not None else 0
+        if self.max_bytes is not None and size > self.max_bytes:
+            return  # Would evict everything else; not worth caching
+        self._remove(key)
+        self._data[key] = (value, time.monotonic() + (ttl_seconds if ttl_seconds is not None else self.ttl), size)
+        self.bytes += size
+        while len(self._data) > self.max_entries or (self.max_bytes is not None and self.bytes > self.max_bytes):
+            _, (_, _, evicted_size) = self._data.popitem(last=False)
+            self.bytes -= evicted_size
+            self.evictions += 1
+
+    def _remove(self, key: Hashable) -> bool:
+        item = self._data.pop(key, _MISSING)
+        if item is _MISSING:
+            return False
+        self.bytes -= item[2]
+        return True
+
+    def delete(self, key: Hashable):
+        if self._remove(key):
+            self.invalidations += 1
+
+    def delete_where(self, predicate: Callable[[Hashable], bool]):
+        """Drop every entry whose key matches predicate"""
+        for key in [k for k in self._data if predicate(k)]:
+            self.delete(key)
+
+    def clear(self):
+        self.invalidations += len(self._data)
+        self._data.clear()
+        self.bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "max_entries": self.max_entries,
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+class VersionedCache(TTLCache):
+    """
+    TTLCache tied to the version of whatever produced its values (a model or
+    rule set). Setting a different version drops every cached entry.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 300.0, version: Optional[str] = None):
+        super().__init__(max_entries, ttl_seconds)
+        self.version = version
+
+    def set_version(self, version: str):
+        if version != self.version:
+            self.clear()
+            self.version = version
+
+    def stats(self) -> Dict[str, Any]:
+        return {"version": self.version, **super().stats()}
@@ -0,0 +1,114 @@
+"""
+Cross-worker cache coherence via Postgres LISTEN/NOTIFY.
+
+setup_change_notifications.sql installs triggers that publish every change
+to the cached tables on the `triage_changes` channel. Each worker holds one
+direct Postgres connection (DATABASE_URL, asyncpg) listening on it and
+applies the changes to its in-process state: queue position indexes,
+change counters behind the ETags, patient caches and the department map.
+
+Notifications sent while a worker was disconnected are lost, so after
+every (re)connect the worker drops all of that state (`on_resync`) and
+reloads it lazily. Writes carry the worker's id (X-Triage-Worker, see
+db.WORKER_ID) and their echoes are skipped: the worker already applied them.
+
+asyncpg is optional; without it, or without DATABASE_URL, the API runs as
+before and each worker only sees its own writes.
+"""
+import asyncio
+import json
+import logging
+import os
+from typing import Any, Callable, Dict, Optional
+
+try:
+    import asyncpg
+except ImportError:  # Optional: only needed with several workers / replicas
+    asyncpg = None
+
+log = logging.getLogger(__name__)
+
+CHANNEL = "triage_changes"
+CHANGE_LISTENER_HEARTBEAT_SECONDS = float(os.getenv("CHANGE_LISTENER_HEARTBEAT_SECONDS", "15"))
+CHANGE_LISTENER_MAX_BACKOFF_SECONDS = float(os.getenv("CHANGE_LISTENER_MAX_BACKOFF_SECONDS", "30"))
+
+
+class ChangeListener:
+    def __init__(
+        self,
+        dsn: str,
+        on_change: Callable[[Dict[str, Any]], None],
+        on_resync: Callable[[], None],
+        origin: Optional[str] = None,
+        channel: str = CHANNEL,
+    ):
+        self.dsn = dsn
+        self.on_change = on_change
+        self.on_resync = on_resync
+        self.origin = origin
+        self.channel = channel
+        self.connected = False
+        self.stats = {"received": 0, "applied": 0, "own": 0, "errors": 0, "connects": 0, "resyncs": 0}
+
+    @classmethod
+    def from_env(cls, on_change, on_resync, origin=None) -> Optional["ChangeListener"]:
+        dsn = os.getenv("DATABASE_URL")
+        if not dsn:
+            return None
+        if asyncpg is None:
+            log.warning("DATABASE_URL is set but asyncpg is not installed; cross-worker invalidation is off")
+            return None
+        return cls(dsn, on_change, on_resync, origin=origin)
+
+    def _notified(self, connection, pid, channel, payload: str):
+        self.stats["received"] += 1
+        try:
+            change = json.loads(payload)
+            if self.origin and change.get("origin") == self.origin:
+                self.stats["own"] += 1
+                return
+            self.on_change(change)
+            self.stats["applied"] += 1
+        except Exception as e:
+            self.stats["errors"] += 1
+            log.warning(f"Could not apply change notification: {e}", extra={"payload": payload[:200]})
+
+    async def run(self):
+        """Listen until cancelled, reconnecting with backoff"""
+        backoff = 1.0
+        while True:
+            conn = None
+            try:
+                conn = await asyncpg.connect(self.dsn)
+                lost = asyncio.Event()
+                conn.add_termination_listener(lambda _: lost.set())
+                await conn.add_listener(self.channel, self._notified)
+                self.connected = True
+                self.stats["connects"] += 1
+                backoff = 1.0
+
+                # Anything may have changed while we weren't listening
+                self.on_resync()
+                self.stats["resyncs"] += 1
+                log.info("Listening for change notifications", extra={"channel": self.channel})
+
+                while not lost.is_set():
+                    try:
+                        await asyncio.wait_for(lost.wait(), CHANGE_LISTENER_HEARTBEAT_SECONDS)
+                    except asyncio.TimeoutError:
+                        await conn.execute("SELECT 1")  # Detects half-open connections
+                raise ConnectionError("listener connection closed")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats["errors"] += 1
+                log.warning(f"Change listener disconnected ({e}); reconnecting in {backoff:.0f}s")
+            finally:
+                self.connected = False
+                if conn is not None and not conn.is_closed():
+                    await conn.close()
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, CHANGE_LISTENER_MAX_BACKOFF_SECONDS)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"connected": self.connected, "channel": self.channel, **self.stats}
@@ -0,0 +1,117 @@
+"""
+Change counters for conditional GETs.
+
+Every write that changes what a polling endpoint would return bumps a
+counter (per department for queue writes, "patients" for registrations).
+Endpoints build a weak ETag from the counters they depend on, so deciding
+whether a client's copy is current costs a dict lookup instead of a query
+plus a payload hash.
+
+The epoch is fresh on every process start, so tags issued before a restart
+never match. Counters see writes made through this process, plus other
+workers' writes when the change listener is running (change_listener.py);
+the `bucket` part of a tag (see time_bucket) bounds how long a tag can
+outlive a write the process didn't hear about.
+
+QueueChangeLog keeps the recent queue writes behind those counters so
+pollers can fetch just what changed since the version they hold.
+"""
+import os
+import time
+import uuid
+from collections import defaultdict, deque
+from typing import Dict, Hashable, Iterable, Optional
+
+ETAG_MAX_AGE_SECONDS = int(os.getenv("ETAG_MAX_AGE_SECONDS", "60"))
+
+
+class ChangeCounters:
+    def __init__(self):
+        self.epoch = uuid.uuid4().hex[:8]
+        self._counts: Dict[Hashable, int] = defaultdict(int)
+        self.total = 0  # Bumped with every key, for endpoints that span all departments
+
+    def bump(self, *keys: Hashable):
+        for key in keys:
+            self._counts[key] += 1
+            self.total += 1
+
+    def get(self, key: Hashable) -> int:
+        return self._counts.get(key, 0)
+
+
+def time_bucket(seconds: int = ETAG_MAX_AGE_SECONDS) -> int:
+    return int(time.time() // seconds) if seconds > 0 else 0
+
+
+def make_etag(*parts) -> str:
+    return 'W/"' + "-".join(str(p) for p in parts) + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match comparison (weak: the W/ prefix is ignored)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    wanted = etag[2:] if etag.startswith("W/") else etag
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if (tag[2:] if tag.startswith("W/") else tag) == wanted:
+            return True
+    return False
+
+
+QUEUE_CHANGE_LOG_SIZE = int(os.getenv("QUEUE_CHANGE_LOG_SIZE", "1000"))
+
+
+class QueueChangeLog:
+    """
+    Bounded per-department log of queue changes for delta sync.
+
+    Each change bumps the department's counter, so a department's version is
+    "<epoch>-<counter>" and the log holds (counter, queue_id, op) with op
+    "upsert" or "remove". A client that is further behind than the log
+    reaches (or holds a version from another process lifetime) has to do a
+    full resync.
+    """
+
+    def __init__(self, counters: ChangeCounters, max_entries: int = QUEUE_CHANGE_LOG_SIZE):
+        self.counters = counters
+        self.max_entries = max_entries
+        self._logs: Dict[int, deque] = {}
+
+    def record(self, dept_id: int, queue_id: int, op: str):
+        self.counters.bump(("dept", dept_id))
+        log = self._logs.setdefault(dept_id, deque(maxlen=self.max_entries))
+        log.append((self.counters.get(("dept", dept_id)), queue_id, op))
+
+    def reset(self, dept_ids: Iterable[int]):
+        """Changes may have been missed: every older version now needs a full resync"""
+        self._logs.clear()
+        for dept_id in dept_ids:
+            self.counters.bump(("dept", dept_id))
+
+    def version(self, dept_id: int) -> str:
+        return f"{self.counters.epoch}-{self.counters.get(('dept', dept_id))}"
+
+    def since(self, dept_id: int, version: str) -> Optional[Dict[int, str]]:
+        """Latest op per queue_id after `version`, or None if a full resync is needed"""
+        epoch, _, n = version.rpartition("-")
+        if epoch != self.counters.epoch or not n.isdigit():
+            return None
+        n = int(n)
+        current = self.counters.get(("dept", dept_id))
+        if n > current:
+            return None
+        if n == current:
+            return {}
+
+        log = self._logs.get(dept_id)
+        if not log or log[0][0] > n + 1:
+            return None  # Some of the changes have already been dropped
+        ops = {}
+        for counter, queue_id, op in log:
+            if counter > n:
+                ops[queue_id] = op
+        return ops
@@ -0,0 +1,133 @@
+"""
+Response compression.
+
+ASGI middleware that compresses JSON/text responses larger than
+`minimum_size` bytes with the best encoding the client accepts: brotli when
+the optional `brotli` package is installed, otherwise gzip. The body is
+buffered before compressing, so event streams, other content types, small
+bodies and responses that already carry a Content-Encoding are passed
+through uncompressed. Every JSON/text response gets `Vary: Accept-Encoding`,
+compressed or not, so a shared cache never hands one client's variant to
+another.
+"""
+import gzip
+import os
+
+try:
+    import brotli
+except ImportError:  # Optional: gzip only
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+
+
+def choose_encoding(accept_encoding: str):
+    """Preferred encoding from an Accept-Encoding header, or None"""
+    offered = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        offered[name.strip()] = q
+    if brotli is not None and offered.get("br", 0) > 0:
+        return "br"
+    if offered.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: str, level: int) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=min(level, 11))
+    return gzip.compress(body, compresslevel=min(level, 9))
+
+
+def with_vary(headers):
+    """Response headers with Accept-Encoding added to Vary"""
+    vary = None
+    out = []
+    for k, v in headers:
+        if k.lower() == b"vary":
+            vary = v
+        else:
+            out.append((k, v))
+    if vary is None:
+        vary = b"Accept-Encoding"
+    elif b"accept-encoding" not in vary.lower() and vary.strip() != b"*":
+        vary += b", Accept-Encoding"
+    return out + [(b"vary", vary)]
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = 1024, level: int = 5):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.level = level
+
+    @classmethod
+    def env_options(cls):
+        return {
+            "minimum_size": int(os.getenv("COMPRESSION_MIN_BYTES", "1024")),
+            "level": int(os.getenv("COMPRESSION_LEVEL", "5")),
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept = ""
+        for key, value in scope["headers"]:
+            if key == b"accept-encoding":
+                accept = value.decode("latin-1")
+        encoding = choose_encoding(accept) if accept else None
+
+        start = None
+        chunks = []
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                start = message  # Held until we've seen the body
+                headers = {k.lower(): v for k, v in start["headers"]}
+                content_type = headers.get(b"content-type", b"").decode("latin-1")
+                if (
+                    b"content-encoding" in headers
+                    or not content_type.startswith(COMPRESSIBLE_TYPES)
+                    or content_type.startswith("text/event-stream")
+                ):
+                    passthrough = True
+                    await send(start)
+                elif encoding is None:
+                    # Nothing to compress for this client, but the response still varies by it
+                    passthrough = True
+                    await send({**start, "headers": with_vary(start["headers"])})
+                return
+
+            # JSON arrives in one piece, or in a few chunks through BaseHTTPMiddleware
+            chunks.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+            body = b"".join(chunks)
+            if len(body) < self.minimum_size:
+                await send({**start, "headers": with_vary(start["headers"])})
+                await send({"type": "http.response.body", "body": body})
+                return
+
+            compressed = compress(body, encoding, self.level)
+            start_headers = [(k, v) for k, v in with_vary(start["headers"]) if k.lower() != b"content-length"]
+            start_headers += [
+                (b"content-encoding", encoding.encode()),
+                (b"content-length", str(len(compressed)).encode()),
+            ]
+            await send({**start, "headers": start_headers})
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,319 @@
+"""
+Database client selection.
+
+DB_BACKEND=supabase (default) connects to the project in SUPABASE_URL /
+SUPABASE_KEY. DB_BACKEND=postgrest talks to a plain PostgREST at
+POSTGREST_URL (bearer POSTGREST_TOKEN if set), e.g. the local stack in
+docker-compose.replicas.yml. DB_BACKEND=memory uses the in-process fake from fake_db.py,
+seeded with the departments, so the API can run offline with injected
+latency (FAKE_DB_LATENCY, FAKE_DB_ERROR_RATE, ...):
+
+    DB_BACKEND=memory FAKE_DB_LATENCY=lognormal:15:10 python -m uvicorn main:app
+
+lazy_db_client() defers creating the client (and importing supabase, which
+pulls in most of its HTTP stack) until the first query, so importing the API
+stays fast; the startup warm-up then makes that first query.
+
+Read replicas: with DB_REPLICA_URLS (comma-separated PostgREST base URLs;
+for a Supabase read replica that is its API URL + /rest/v1) the API's
+selects go to the replicas, round-robin, and everything else to the
+primary. Reads still go to the primary when:
+
+- they are not made for a request (startup, background loops)
+- the current request has already written (read-your-writes within it)
+- the request is pinned (RequestDBStats.pinned): main.py pins every request
+  that isn't a GET, so read-before-write never sees a lagging replica; GETs
+  whose ETag/version comes from in-process counters (queues, dashboard); and
+  a client's GETs for DB_PIN_SECONDS after a request of theirs wrote
+- no replica is healthy: a replica that fails with a connection-level error
+  is skipped for DB_REPLICA_RETRY_SECONDS, and the failed read is retried on
+  the primary
+
+Scripts using create_db_client() always talk to the primary.
+
+Whatever the backend, the client is wrapped so that every execute() is counted and
+timed against the current request (see begin_request). A request's
+round-trips, DB time and per-table breakdown can then go to response
+headers and logs, and repeated identical calls (N+1 patterns) stand out.
+"""
+import contextvars
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Any, Callable, List, Optional
+
+import httpx
+
+log = logging.getLogger(__name__)
+
+# Sent as X-Triage-Worker with every PostgREST request; change notifications
+# carry it back so a worker can skip the echo of its own writes
+WORKER_ID = uuid.uuid4().hex[:12]
+
+ACTIONS = ("select", "insert", "update", "delete", "upsert")
+WRITE_ACTIONS = ("insert", "update", "delete", "upsert")
+
+REPLICA_URLS = [u.strip() for u in os.getenv("DB_REPLICA_URLS", "").split(",") if u.strip()]
+DB_PIN_SECONDS = float(os.getenv("DB_PIN_SECONDS", "5"))
+DB_REPLICA_RETRY_SECONDS = float(os.getenv("DB_REPLICA_RETRY_SECONDS", "10"))
+
+
+class RequestDBStats:
+    def __init__(self):
+        self.roundtrips = 0
+        self.seconds = 0.0
+        self.calls: Counter = Counter()  # (table, action) -> count
+        self.pinned = False  # Read from the primary (see RoutedClient)
+
+    def record(self, table: str, action: str, seconds: float):
+        self.roundtrips += 1
+        self.seconds += seconds
+        self.calls[(table, action)] += 1
+
+    @property
+    def wrote(self) -> bool:
+        return any(action in WRITE_ACTIONS for _, action in self.calls)
+
+    def repeated(self, threshold: int):
+        """(table, action, count) issued at least `threshold` times - likely a per-row loop"""
+        return [(t, a, n) for (t, a), n in self.calls.most_common() if n >= threshold]
+
+    def summary(self) -> str:
+        return ", ".join(f"{t}.{a} x{n}" for (t, a), n in self.calls.most_common())
+
+
+_request_stats: contextvars.ContextVar[Optional[RequestDBStats]] = contextvars.ContextVar("db_stats", default=None)
+
+
+# Called as observer(table, action, seconds) after every execute(), e.g. to feed /metrics
+query_observers: List[Callable[[str, str, float], None]] = []
+
+
+def begin_request() -> RequestDBStats:
+    """Start accounting DB calls made in the current context (and tasks/threads spawned from it)"""
+    stats = RequestDBStats()
+    _request_stats.set(stats)
+    return stats
+
+
+def current_stats() -> Optional[RequestDBStats]:
+    return _request_stats.get()
+
+
+def reads_from_primary() -> bool:
+    """Whether selects in the current context must see the primary (see RoutedClient)"""
+    stats = _request_stats.get()
+    return stats is None or stats.pinned or stats.wrote
+
+
+class TracedQuery:
+    """Wraps a query builder; builder methods stay wrapped, execute() is accounted"""
+
+    def __init__(self, target, table: str, action: str = "select"):
+        self._target = target
+        self._table = table
+        self._action = action
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return attr
+        action = name if name in ACTIONS else self._action
+
+        def call(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            return TracedQuery(result, self._table, action) if hasattr(result, "execute") else result
+        return call
+
+    def execute(self):
+        start = time.perf_counter()
+        try:
+            return self._target.execute()
+        finally:
+            elapsed = time.perf_counter() - start
+            stats = _request_stats.get()
+            if stats is not None:
+                stats.record(self._table, self._action, elapsed)
+            for observer in query_observers:
+                observer(self._table, self._action, elapsed)
+
+
+class TracedClient:
+    def __init__(self, client):
+        self.client = client
+
+    def table(self, name: str) -> TracedQuery:
+        return TracedQuery(self.client.table(name), name)
+
+    from_ = table
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+
+class LazyClient:
+    """Builds the underlying client on first use (thread-safe)"""
+
+    def __init__(self, factory: Callable[[], object]):
+        self._factory = factory
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def created(self) -> bool:
+        return self._client is not None
+
+    def get(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._factory()
+        return self._client
+
+    def table(self, name: str):
+        return self.get().table(name)
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+
+def replica_unavailable(error: Exception) -> bool:
+    """Connection-level failures worth retrying on the primary (not bad queries)"""
+    if isinstance(error, httpx.TransportError):
+        return True
+    code = getattr(error, "code", None)
+    # PGRST000-003: PostgREST can't reach its database; numeric codes are non-JSON 5xx from a proxy
+    return str(code).startswith("PGRST00") or (isinstance(code, int) and code >= 500)
+
+
+class _ReplicaRead:
+    """A select built against a replica; replayed on the primary if the replica is down"""
+
+    def __init__(self, router: "RoutedClient", table: str, replica: int, calls: list):
+        self._router = router
+        self._table = table
+        self._replica = replica
+        self._calls = calls
+
+    def __getattr__(self, name):
+        def call(*args, **kwargs):
+            self._calls.append((name, args, kwargs))
+            return self
+        return call
+
+    def _build(self, client):
+        query = client.table(self._table)
+        for name, args, kwargs in self._calls:
+            query = getattr(query, name)(*args, **kwargs)
+        return query
+
+    def execute(self):
+        try:
+            return self._build(self._router.replicas[self._replica]).execute()
+        except Exception as e:
+            if not replica_unavailable(e):
+                raise
+            self._router.mark_down(self._replica, e)
+            return self._build(self._router.primary).execute()
+
+
+class _RoutedTable:
+    def __init__(self, router: "RoutedClient", table: str):
+        self._router = router
+        self._table = table
+
+    def select(self, *args, **kwargs):
+        replica = self._router.pick_replica()
+        if replica is None:
+            return self._router.primary.table(self._table).select(*args, **kwargs)
+        return _ReplicaRead(self._router, self._table, replica, [("select", args, kwargs)])
+
+    def __getattr__(self, name):
+        return getattr(self._router.primary.table(self._table), name)
+
+
+class RoutedClient:
+    """Selects go to a healthy replica unless the request must read from the primary"""
+
+    def __init__(self, primary, replicas: List[Any], retry_seconds: float = DB_REPLICA_RETRY_SECONDS):
+        self.primary = primary
+        self.replicas = replicas
+        self.retry_seconds = retry_seconds
+        self._down_until = [0.0] * len(replicas)
+        self._turn = 0
+        self.stats = {"replica_reads": 0, "primary_reads": 0, "pinned_reads": 0, "failovers": 0}
+
+    def table(self, name: str) -> _RoutedTable:
+        return _RoutedTable(self, name)
+
+    from_ = table
+
+    def pick_replica(self) -> Optional[int]:
+        if reads_from_primary():
+            self.stats["pinned_reads"] += 1
+            return None
+        now = time.monotonic()
+        for _ in range(len(self.replicas)):
+            self._turn = (self._turn + 1) % len(self.replicas)
+            if self._down_until[self._turn] <= now:
+                self.stats["replica_reads"] += 1
+                return self._turn
+        self.stats["primary_reads"] += 1
+        return None
+
+    def mark_down(self, replica: int, error: Exception):
+        self._down_until[replica] = time.monotonic() + self.retry_seconds
+        self.stats["failovers"] += 1
+        log.warning(f"Read replica {replica} unavailable ({error}); reading from the primary for {self.retry_seconds:.0f}s")
+
+    def snapshot(self):
+        now = time.monotonic()
+        return {**self.stats, "replicas": len(self.replicas), "down": [i for i, t in enumerate(self._down_until) if t > now]}
+
+    def __getattr__(self, name):
+        return getattr(self.primary, name)
+
+
+def _postgrest(url: str, token: Optional[str]):
+    from postgrest import SyncPostgrestClient
+    headers = {"Accept": "application/json", "Content-Type": "application/json", "X-Triage-Worker": WORKER_ID}
+    if token:
+        headers.update({"apikey": token, "Authorization": f"Bearer {token}"})
+    return SyncPostgrestClient(url, headers=headers)
+
+
+def _connect(replicas: bool = False):
+    backend = os.getenv("DB_BACKEND", "supabase")
+    if backend == "memory":
+        from fake_db import FakeClient
+        log.info("Using in-memory database (DB_BACKEND=memory)")
+        return FakeClient()
+
+    if backend == "postgrest":
+        token = os.getenv("POSTGREST_TOKEN")
+        primary = _postgrest(os.getenv("POSTGREST_URL", "http://localhost:3000"), token)
+    elif backend == "supabase":
+        from supabase import ClientOptions, create_client
+        token = os.getenv("SUPABASE_KEY")
+        options = ClientOptions(headers={**ClientOptions().headers, "X-Triage-Worker": WORKER_ID})
+        primary = create_client(os.getenv("SUPABASE_URL"), token, options=options)
+    else:
+        raise ValueError(f"Unknown DB_BACKEND {backend!r} (expected 'supabase', 'postgrest' or 'memory')")
+
+    if not (replicas and REPLICA_URLS):
+        return primary
+    log.info("Routing reads to replicas", extra={"replicas": len(REPLICA_URLS)})
+    return RoutedClient(primary, [_postgrest(url, token) for url in REPLICA_URLS])
+
+
+def create_db_client() -> TracedClient:
+    """Primary only (scripts)"""
+    return TracedClient(_connect())
+
+
+def lazy_db_client() -> TracedClient:
+    """The API's client: connects on the first query, reads from replicas if configured"""
+    return TracedClient(LazyClient(lambda: _connect(replicas=True)))
@@ -0,0 +1,369 @@
+"""
+In-memory stand-in for the Supabase/PostgREST client.
+
+Implements the subset of supabase-py's query builder the backend uses, so
+main.py can run, be load-tested and be benchmarked without a Supabase
+project (DB_BACKEND=memory, see db.py):
+
+    client.table("department_queue").select("*, triage_predictions!inner(risk_level)") \
+        .eq("dept_id", 1).neq("status", "completed").order("priority_score", desc=True).limit(50).execute()
+
+- select: column lists, `*`, and nested embeds along foreign keys
+  (many-to-one embeds an object, one-to-many a list; `!inner` drops rows
+  without a match), count="exact"
+- views: active_department_queue (read-only, computed on every query)
+- filters: eq, neq, gt, gte, lt, lte, in_, like, ilike; order, limit, range
+- insert / update / delete return the affected rows, like PostgREST with
+  return=representation; deletes cascade along ON DELETE CASCADE keys
+- execute() returns an object with .data and .count that also unpacks as
+  `data, count = ...execute()` (data[1] is the rows), like APIResponse
+
+Every execute() sleeps for a delay drawn from the FAKE_DB_* latency profile
+and fails with an APIError at FAKE_DB_ERROR_RATE (see stub_latency.py).
+Unknown tables raise the PGRST205 error PostgREST gives for a missing table.
+"""
+import copy
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from postgrest.exceptions import APIError
+
+from stub_latency import LatencyProfile
+
+
+def _now():
+    return datetime.utcnow().isoformat()
+
+
+# Mirrors setup_database.sql: primary key, defaults and foreign keys (column -> (table, cascade))
+SCHEMA = {
+    "patients": {
+        "pk": "patient_id",
+        "defaults": {"created_at": _now, "updated_at": _now},
+        "fks": {},
+    },
+    "patient_medical_history": {
+        "pk": "history_id",
+        "defaults": {"is_chronic": False},
+        "fks": {"patient_id": ("patients", True)},
+    },
+    "patient_visits": {
+        "pk": "visit_id",
+        "defaults": {"visit_timestamp": _now, "visit_status": "active"},
+        "fks": {"patient_id": ("patients", True)},
+    },
+    "vitals": {
+        "pk": "vitals_id",
+        "defaults": {"recorded_at": _now},
+        "fks": {"visit_id": ("patient_visits", True)},
+    },
+    "visit_symptoms": {
+        "pk": "symptom_id",
+        "defaults": {},
+        "fks": {"visit_id": ("patient_visits", True)},
+    },
+    "departments": {
+        "pk": "dept_id",
+        "defaults": {},
+        "fks": {},
+    },
+    "triage_predictions": {
+        "pk": "prediction_id",
+        "defaults": {},
+        "fks": {"visit_id": ("patient_visits", True)},
+    },
+    "department_queue": {
+        "pk": "queue_id",
+        "defaults": {"routing_role": "primary", "status": "pending", "added_timestamp": _now},
+        "fks": {"prediction_id": ("triage_predictions", True), "dept_id": ("departments", False)},
+    },
+    "active_department_queue": {
+        "pk": "queue_id",
+        "defaults": {},
+        "fks": {"prediction_id": ("triage_predictions", False), "dept_id": ("departments", False)},
+    },
+}
+
+
+def _rank_active_queue(rows):
+    """active_department_queue: unfinished entries with their rank in the department"""
+    by_dept: Dict[Any, List[Dict[str, Any]]] = {}
+    for row in rows:
+        if row.get("status") not in ("completed", "discharged"):
+            by_dept.setdefault(row.get("dept_id"), []).append(row)
+    ranked = []
+    for dept_rows in by_dept.values():
+        # priority_score DESC (NULLS FIRST, the Postgres default), then queue_id
+        dept_rows.sort(key=lambda r: (r.get("priority_score") is not None, -(r.get("priority_score") or 0), r["queue_id"]))
+        ranked.extend({**row, "queue_rank": i + 1} for i, row in enumerate(dept_rows))
+    return ranked
+
+
+# Mirrors the views in setup_database.sql: name -> (base table, rows -> view rows)
+VIEWS = {"active_department_queue": ("department_queue", _rank_active_queue)}
+
+SEED_DEPARTMENTS = [
+    {"dept_name": "Emergency", "specialty_description": "Acute care for critical conditions"},
+    {"dept_name": "Cardiology", "specialty_description": "Heart and vascular system disorders"},
+    {"dept_name": "Respiratory", "specialty_description": "Lung and respiratory tract diseases"},
+    {"dept_name": "Neurology", "specialty_description": "Nervous system disorders"},
+    {"dept_name": "General Medicine", "specialty_description": "Adult primary care and internal medicine"},
+    {"dept_name": "Orthopedics", "specialty_description": "Musculoskeletal system care"},
+]
+
+
+class FakeResponse:
+    def __init__(self, data: List[Dict[str, Any]], count: Optional[int] = None):
+        self.data = data
+        self.count = count
+
+    def __iter__(self):
+        yield "data", self.data
+        yield "count", self.count
+
+
+def parse_select(columns: str) -> List[Any]:
+    """
+    "a, b, rel!inner(x, sub(y))" -> ["a", "b", ("rel", True, ["x", ("sub", False, ["y"])])]
+    """
+    items, depth, token = [], 0, ""
+    for ch in columns + ",":
+        if ch == "," and depth == 0:
+            token = token.strip()
+            if token:
+                items.append(_parse_item(token))
+            token = ""
+            continue
+        depth += ch == "("
+        depth -= ch == ")"
+        token += ch
+    return items
+
+
+def _parse_item(token: str):
+    if "(" not in token:
+        return token
+    head, inner = token.split("(", 1)
+    name, _, hint = head.strip().partition("!")
+    return (name.strip(), hint.strip() == "inner", parse_select(inner.rsplit(")", 1)[0]))
+
+
+class FakeDatabase:
+    def __init__(self, profile: Optional[LatencyProfile] = None, seed_departments: bool = True):
+        self.profile = profile or LatencyProfile()
+        self.tables: Dict[str, Dict[int, Dict[str, Any]]] = {name: {} for name in SCHEMA if name not in VIEWS}
+        self.sequences = {name: 0 for name in self.tables}
+        self.lock = threading.RLock()
+        self.calls = 0
+        if seed_departments:
+            self.insert("departments", SEED_DEPARTMENTS)
+
+    def table_rows(self, name: str) -> Dict[int, Dict[str, Any]]:
+        if name in VIEWS:
+            base, rows = VIEWS[name]
+            return {row[SCHEMA[name]["pk"]]: row for row in rows(self.tables[base].values())}
+        if name not in self.tables:
+            raise APIError({
+                "code": "PGRST205",
+                "message": f"Could not find the table 'public.{name}' in the schema cache",
+                "details": None,
+                "hint": None,
+            })
+        return self.tables[name]
+
+    def insert(self, name: str, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        table, spec = self.table_rows(name), SCHEMA[name]
+        inserted = []
+        for values in rows:
+            row = {col: (default() if callable(default) else default) for col, default in spec["defaults"].items()}
+            row.update(copy.deepcopy(values))
+            if row.get(spec["pk"]) is None:
+                self.sequences[name] += 1
+                row[spec["pk"]] = self.sequences[name]
+            else:
+                self.sequences[name] = max(self.sequences[name], row[spec["pk"]])
+            table[row[spec["pk"]]] = row
+            inserted.append(row)
+        return inserted
+
+    def delete_rows(self, name: str, rows: List[Dict[str, Any]]):
+        pk = SCHEMA[name]["pk"]
+        for row in rows:
+            self.tables[name].pop(row[pk], None)
+            # ON DELETE CASCADE
+            for child, spec in SCHEMA.items():
+                for col, (parent, cascade) in spec["fks"].items():
+                    if parent == name and cascade:
+                        self.delete_rows(child, [r for r in self.tables[child].values() if r.get(col) == row[pk]])
+
+    def embed(self, name: str, row: Dict[str, Any], rel: str, inner: bool, columns: List[Any]):
+        """Rows of `rel` related to `row`: an object (many-to-one) or a list (one-to-many)"""
+        rel_rows = self.table_rows(rel)
+        for col, (parent, _) in SCHEMA[name]["fks"].items():
+            if parent == rel:
+                target = rel_rows.get(row.get(col))
+                return self.project(rel, target, columns) if target is not None else None
+        for col, (parent, _) in SCHEMA[rel]["fks"].items():
+            if parent == name:
+                key = row[SCHEMA[name]["pk"]]
+                children = [self.project(rel, r, columns) for r in rel_rows.values() if r.get(col) == key]
+                return [c for c in children if c is not None]
+        raise APIError({
+            "code": "PGRST200",
+            "message": f"Could not find a relationship between '{name}' and '{rel}' in the schema cache",
+            "details": None,
+            "hint": None,
+        })
+
+    def project(self, name: str, row: Dict[str, Any], columns: List[Any]) -> Optional[Dict[str, Any]]:
+        """Selected columns and embeds of a row, or None if an inner embed has no match"""
+        out = {}
+        for item in columns:
+            if item == "*":
+                out.update(copy.deepcopy(row))
+            elif isinstance(item, tuple):
+                rel, inner, sub = item
+                value = self.embed(name, row, rel, inner, sub)
+                if inner and not value:
+                    return None
+                out[rel] = value
+            else:
+                out[item] = copy.deepcopy(row.get(item))
+        return out
+
+
+def _like(pattern: str, flags=0):
+    regex = "".join(".*" if c == "%" else "." if c == "_" else re.escape(c) for c in pattern)
+    return re.compile(f"^{regex}$", flags | re.DOTALL)
+
+
+class FakeQuery:
+    def __init__(self, db: FakeDatabase, table: str):
+        self.db = db
+        self.table = table
+        self.action = "select"
+        self.columns = ["*"]
+        self.count_mode = None
+        self.values: Any = None
+        self.filters = []
+        self.orders = []
+        self.offset = 0
+        self.max_rows: Optional[int] = None
+
+    # --- Actions ---
+
+    def select(self, columns: str = "*", count: Optional[str] = None):
+        self.action, self.columns, self.count_mode = "select", parse_select(columns), count
+        return self
+
+    def insert(self, values):
+        self.action, self.values = "insert", values if isinstance(values, list) else [values]
+        return self
+
+    def update(self, values: Dict[str, Any]):
+        self.action, self.values = "update", values
+        return self
+
+    def delete(self):
+        self.action = "delete"
+        return self
+
+    # --- Filters and modifiers ---
+
+    def _filter(self, column, test):
+        self.filters.append((column, test))
+        return self
+
+    def eq(self, column, value):
+        return self._filter(column, lambda v: v == value)
+
+    def neq(self, column, value):
+        return self._filter(column, lambda v: v != value)
+
+    def gt(self, column, value):
+        return self._filter(column, lambda v: v is not None and v > value)
+
+    def gte(self, column, value):
+        return self._filter(column, lambda v: v is not None and v >= value)
+
+    def lt(self, column, value):
+        return self._filter(column, lambda v: v is not None and v < value)
+
+    def lte(self, column, value):
+        return self._filter(column, lambda v: v is not None and v <= value)
+
+    def in_(self, column, values):
+        allowed = set(values)
+        return self._filter(column, lambda v: v in allowed)
+
+    def like(self, column, pattern):
+        regex = _like(pattern)
+        return self._filter(column, lambda v: v is not None and bool(regex.match(str(v))))
+
+    def ilike(self, column, pattern):
+        regex = _like(pattern, re.IGNORECASE)
+        return self._filter(column, lambda v: v is not None and bool(regex.match(str(v))))
+
+    def order(self, column, desc: bool = False):
+        self.orders.append((column, desc))
+        return self
+
+    def limit(self, n: int):
+        self.max_rows = n
+        return self
+
+    def range(self, start: int, end: int):
+        self.offset, self.max_rows = start, end - start + 1
+        return self
+
+    # --- Execution ---
+
+    def _matching(self) -> List[Dict[str, Any]]:
+        rows = self.db.table_rows(self.table).values()
+        return [r for r in rows if all(test(r.get(col)) for col, test in self.filters)]
+
+    def execute(self) -> FakeResponse:
+        profile = self.db.profile
+        delay = profile.delay_seconds()
+        if delay:
+            time.sleep(delay)
+        if profile.fails():
+            raise APIError({"code": "FAKE500", "message": "Injected database error", "details": None, "hint": None})
+
+        with self.db.lock:
+            self.db.calls += 1
+            if self.action == "insert":
+                return FakeResponse(copy.deepcopy(self.db.insert(self.table, self.values)))
+            if self.action == "update":
+                rows = self._matching()
+                for row in rows:
+                    row.update(copy.deepcopy(self.values))
+                return FakeResponse(copy.deepcopy(rows))
+            if self.action == "delete":
+                rows = self._matching()
+                self.db.delete_rows(self.table, rows)
+                return FakeResponse(rows)
+
+            rows = self._matching()
+            for column, desc in reversed(self.orders):
+                # Postgres defaults: NULLS LAST ascending, NULLS FIRST descending
+                rows.sort(key=lambda r: (r.get(column) is None, r.get(column) if r.get(column) is not None else 0), reverse=desc)
+            projected = [p for p in (self.db.project(self.table, r, self.columns) for r in rows) if p is not None]
+            count = len(projected) if self.count_mode else None
+            end = None if self.max_rows is None else self.offset + self.max_rows
+            return FakeResponse(projected[self.offset:end], count)
+
+
+class FakeClient:
+    """Drop-in for supabase.Client's table() API"""
+
+    def __init__(self, db: Optional[FakeDatabase] = None):
+        self.db = db or FakeDatabase(LatencyProfile.from_env("FAKE_DB"))
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self.db, name)
+
+    from_ = table
@@ -0,0 +1,65 @@
+"""
+Local stand-in for the OpenRouter chat-completions API.
+
+Answers /api/v1/chat/completions with a short canned explanation in the
+OpenAI response shape, so /triage-explain can run without an OpenRouter key:
+
+    python -m uvicorn llm_stub:app --port 8002
+    OPENROUTER_URL=http://localhost:8002/api/v1/chat/completions python -m uvicorn main:app --port 8000
+
+Latency, errors and cold starts are injected from LLM_STUB_* (see
+stub_latency.py). LLM calls are slow and heavy-tailed, so a realistic
+profile is something like LLM_STUB_LATENCY=lognormal:2500:1500.
+Failures return 429 with an OpenRouter-style error body.
+"""
+import asyncio
+import time
+from typing import Any, Dict, List
+
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+from stub_latency import LatencyProfile
+
+app = FastAPI(title="LLM Stub")
+profile = LatencyProfile.from_env("LLM_STUB")
+
+
+class ChatRequest(BaseModel):
+    model: str = "stub"
+    messages: List[Dict[str, Any]]
+
+
+def canned_explanation(prompt: str) -> str:
+    lines = [l.strip() for l in prompt.splitlines()]
+    risk = next((l.split(":", 1)[1].strip() for l in lines if l.startswith("Risk Level:")), "Unknown")
+    dept = next((l.split(":", 1)[1].strip() for l in lines if l.startswith("Recommended Department:")), "General")
+    return (
+        f"Vitals and reported symptoms are the main contributors to the {risk} risk level.\n"
+        f"The symptom pattern matches {dept}.\n"
+        "Confidence is limited to the submitted data (stub response)."
+    )
+
+
+@app.get("/stub/profile")
+async def get_profile():
+    return profile.describe()
+
+
+@app.post("/api/v1/chat/completions")
+async def chat_completions(req: ChatRequest):
+    await asyncio.sleep(profile.delay_seconds())
+    if profile.fails():
+        return JSONResponse(status_code=429, content={"error": {"code": 429, "message": "Injected rate limit (stub)"}})
+
+    prompt = req.messages[-1].get("content", "") if req.messages else ""
+    content = canned_explanation(prompt)
+    return {
+        "id": f"stub-{time.time_ns()}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": req.model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": len(prompt.split()), "completion_tokens": len(content.split())},
+    }
@@ -2,21 +2,206 @@
 CORRECTED Main Backend - Fixed Queue Routing
 This version properly integrates with the ML backend API
 """
-from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import JSONResponse
+import time
+IMPORT_STARTED = time.perf_counter()  # Import-to-ready is measured from here
+
+from contextlib import asynccontextmanager
+from fastapi import BackgroundTasks, Depends, FastAPI, Header, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response
 from postgrest.exceptions import APIError
-from pydantic import BaseModel
-from supabase import create_client, Client
+from pydantic import BaseModel, Field
+import asyncio
+import copy
+import hmac
+import logging
 import os
 import httpx
 from typing import List, Dict, Any
 from dotenv import load_dotenv
+from admission import AdmissionController, Rejected, classify
+from cache import TTLCache, VersionedCache
+from change_listener import ChangeListener
+from change_tracking import ChangeCounters, QueueChangeLog, etag_matches, make_etag, time_bucket
+from compression import CompressionMiddleware
+import db
+from db import begin_request, lazy_db_client
+from metrics import registry as metrics
+from ml_batcher import MLMicroBatcher
+from model_registry import ScoringRegistry
+from pretriage import FAST_PATH_DEPARTMENT, FAST_PATH_PRIORITY, PRETRIAGE_VERSION, check_red_flags
+from profiler import ProfilerBusy, profiler
+from queue_positions import QueuePositionIndex
+from routing import DepartmentLoadTracker, RouteTarget, plan_routing
+from schemas import AllQueuesResponse, DashboardStats, FastJSONResponse, QueueChangesResponse, QueueResponse
+from scoring import feature_signature, patient_features, score_rules, visit_features
+from scoring_pool import PoolSaturated, pool_from_env
+from singleflight import SingleFlight
+from startup import Warmup
+from stats import summarize_active_queue
+from structured_logging import new_request_id, request_id, setup_logging, stop_logging
 
 load_dotenv()
+setup_logging()
+log = logging.getLogger("triage")
 
 from fastapi.middleware.cors import CORSMiddleware
-app = FastAPI(title="Triage Data API")
 
+# Warm-up steps are registered next to the state they fill (see @warmup.step)
+warmup = Warmup(IMPORT_STARTED)
+WARMUP_BLOCKING = os.getenv("WARMUP_BLOCKING", "0") == "1"  # Hold startup until warm (no readiness probe)
+WARMUP_RETRY_SECONDS = float(os.getenv("WARMUP_RETRY_SECONDS", "5"))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    tasks = [asyncio.create_task(warmup.run(WARMUP_RETRY_SECONDS))]
+    if SCORING_WATCH_SECONDS > 0:
+        tasks.append(asyncio.create_task(scorers.watch(SCORING_WATCH_SECONDS)))
+    if change_listener:
+        tasks.append(asyncio.create_task(change_listener.run()))
+    if WARMUP_BLOCKING:
+        await tasks[0]
+    yield
+    warmup.shutting_down = True  # /readyz fails first so load balancers stop routing here
+    for task in tasks:
+        task.cancel()
+    await ml_engine.close()
+    if scoring_pool:
+        scoring_pool.shutdown()
+    stop_logging()
+
+app = FastAPI(title="Triage Data API", lifespan=lifespan)
+
+admission = AdmissionController.from_env()
+
+# --- Metrics (served at /metrics) ---
+REQUEST_LATENCY = metrics.histogram(
+    "triage_http_request_duration_seconds", "HTTP request latency by route", ["method", "route", "status"])
+DB_QUERY_LATENCY = metrics.histogram(
+    "triage_db_query_duration_seconds", "Database round-trip latency", ["table", "action"])
+UPSTREAM_LATENCY = metrics.histogram(
+    "triage_upstream_request_duration_seconds", "Remote ML engine and LLM call latency", ["upstream", "outcome"])
+SCORING_PATHS = metrics.counter(
+    "triage_scoring_total", "Visits scored, by path (remote, cache, local, pretriage)", ["path"])
+SCORING_FALLBACKS = metrics.counter(
+    "triage_scoring_fallbacks_total", "Fallback activations while scoring a visit", ["reason"])
+EXPLAIN_CACHE = metrics.counter(
+    "triage_explain_cache_total", "Explanation cache lookups", ["result"])
+QUEUE_DEPTH = metrics.gauge(
+    "triage_queue_depth", "Patients waiting per department", ["department"])
+QUEUE_OLDEST_WAIT = metrics.gauge(
+    "triage_queue_oldest_wait_seconds", "Wait of the longest-waiting patient per department", ["department"])
+metrics.gauge(
+    "triage_startup_seconds", "Import, warm-up and import-to-ready time of this worker", ["phase"],
+    callback=lambda: [((phase.replace("_seconds", ""),), v) for phase, v in warmup.timings().items() if v is not None])
+metrics.gauge(
+    "triage_admission_in_flight", "Requests holding an admission slot", ["class"],
+    callback=lambda: [((cls,), n) for cls, n in admission.in_flight.items()])
+db.query_observers.append(lambda table, action, seconds: DB_QUERY_LATENCY.observe(table, action, value=seconds))
+
+@app.middleware("http")
+async def admission_control(request: Request, call_next):
+    """Bounded concurrency per endpoint class; triage first, explain shed first"""
+    cls = classify(request.method, request.url.path)
+    if cls is None:
+        return await call_next(request)
+    try:
+        await admission.acquire(cls)
+    except Rejected as e:
+        return JSONResponse(
+            status_code=e.status_code,
+            content={"detail": e.detail},
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    try:
+        return await call_next(request)
+    finally:
+        admission.release(cls)
+
+# Requests issuing more DB round-trips than this are logged with a per-table breakdown
+DB_ROUNDTRIP_BUDGET = int(os.getenv("DB_ROUNDTRIP_BUDGET", "10"))
+DB_REPEAT_THRESHOLD = int(os.getenv("DB_REPEAT_THRESHOLD", "4"))  # Same table+action this often looks like N+1
+DB_LOG_REQUESTS = os.getenv("DB_LOG_REQUESTS", "0") == "1"
+
+# Read-your-writes with read replicas: only GETs read from replicas, and after a
+# client's request writes, its GETs go to the primary for DB_PIN_SECONDS. The pin
+# travels in a cookie (works across workers); clients that don't keep cookies can
+# send an X-Client-ID instead, pinned here per worker. Never keyed on the address:
+# one write would pin everyone behind the same proxy or NAT.
+#
+# Queue and dashboard reads always use the primary: their ETags and delta-sync
+# versions come from this process's change counters, and a lagging replica would
+# serve older rows under a newer tag (then 304 forever), or make an entry it
+# hasn't replicated yet look removed.
+DB_PIN_COOKIE = "db_pin"
+READ_METHODS = ("GET", "HEAD")
+PRIMARY_READ_PREFIXES = ("/queues", "/dashboard")
+read_pins = TTLCache(max_entries=10000, ttl_seconds=db.DB_PIN_SECONDS)
+
+def reads_pinned(request: Request) -> bool:
+    if request.method not in READ_METHODS or request.url.path.startswith(PRIMARY_READ_PREFIXES):
+        return True
+    cookie = request.cookies.get(DB_PIN_COOKIE, "")
+    if cookie.isdigit() and int(cookie) > time.time():
+        return True
+    client_id = request.headers.get("x-client-id")
+    return client_id is not None and read_pins.get(client_id) is not None
+
+@app.middleware("http")
+async def db_accounting(request: Request, call_next):
+    """Count DB round-trips and time per request; report them in headers and logs"""
+    stats = begin_request()
+    if db.REPLICA_URLS:
+        stats.pinned = reads_pinned(request)
+    response = await call_next(request)
+    if db.REPLICA_URLS and stats.wrote:
+        if request.headers.get("x-client-id"):
+            read_pins.set(request.headers["x-client-id"], True)
+        response.set_cookie(DB_PIN_COOKIE, str(int(time.time() + db.DB_PIN_SECONDS)),
+                            max_age=max(1, int(db.DB_PIN_SECONDS)), httponly=True, samesite="lax")
+    response.headers["X-DB-Roundtrips"] = str(stats.roundtrips)
+    response.headers["X-DB-Time-ms"] = f"{stats.seconds * 1000:.1f}"
+
+    route = f"{request.method} {request.url.path}"
+    repeated = stats.repeated(DB_REPEAT_THRESHOLD)
+    if stats.roundtrips > DB_ROUNDTRIP_BUDGET or repeated:
+        reason = f"over budget ({DB_ROUNDTRIP_BUDGET})" if stats.roundtrips > DB_ROUNDTRIP_BUDGET else "repeated calls"
+        log.warning(f"DB {reason}: {route}", extra={
+            "roundtrips": stats.roundtrips, "db_ms": round(stats.seconds * 1000, 1), "calls": stats.summary()})
+    elif DB_LOG_REQUESTS and stats.roundtrips:
+        log.info(f"DB: {route}", extra={
+            "roundtrips": stats.roundtrips, "db_ms": round(stats.seconds * 1000, 1), "calls": stats.summary()})
+    return response
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    profiled = profiler.request_started(request.url.path) if profiler.session else None
+    try:
+        response = await call_next(request)
+    finally:
+        if profiled:
+            profiler.request_finished(profiled)
+    route = request.scope.get("route")
+    REQUEST_LATENCY.observe(
+        request.method, route.path if route else "unmatched", str(response.status_code),
+        value=time.perf_counter() - start,
+    )
+    return response
+
+@app.middleware("http")
+async def correlation_id(request: Request, call_next):
+    """Tag every log line of a request with its X-Request-ID (echoed back to the client)"""
+    rid = request.headers.get("x-request-id") or new_request_id()
+    request_id.set(rid)
+    response = await call_next(request)
+    response.headers["X-Request-ID"] = rid
+    return response
+
+# gzip/brotli for JSON bodies above COMPRESSION_MIN_BYTES
+app.add_middleware(CompressionMiddleware, **CompressionMiddleware.env_options())
+
+# Added last so it wraps everything: rejections still carry CORS headers
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:3000", "http://0.0.0.0:3000", "*"],
@@ -29,7 +214,18 @@ app.add_middleware(
 async def root():
     return {"message": "Triage API is running", "status": "ok"}
 
-supabase: Client = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"))
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and its event loop is responding"""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: 200 once warm-up has finished, 503 while starting or shutting down"""
+    return JSONResponse(status_code=200 if warmup.ready else 503, content=warmup.snapshot())
+
+# Supabase, or the in-memory fake with DB_BACKEND=memory; connects on first use (the warm-up)
+supabase = lazy_db_client()
 
 @app.exception_handler(APIError)
 async def postgrest_exception_handler(request: Request, exc: APIError):
@@ -39,7 +235,7 @@ async def postgrest_exception_handler(request: Request, exc: APIError):
             status_code=500,
             content={"detail": "CRITICAL: Database tables missing. Please run setup_database.sql in Supabase SQL Editor."},
         )
-    print(f"PostgREST Error: {exc}")
+    log.error("PostgREST error", extra={"path": request.url.path, "error": str(exc)})
     return JSONResponse(
         status_code=500,
         content={"detail": f"Database Error: {exc}"},
@@ -61,7 +257,7 @@ class PatientInput(BaseModel):
 
 class SymptomInput(BaseModel):
     symptom_name: str
-    severity_score: int
+    severity_score: int = Field(ge=1, le=5)  # Same scale as visit_symptoms and the red-flag checks
     duration: str
 
 class VisitInput(BaseModel):
@@ -76,6 +272,11 @@ class VisitInput(BaseModel):
 @app.get("/patients/lookup")
 async def lookup_patient(id: int = None, name: str = None, email: str = None):
     """Search patient by ID, Name, or Email"""
+    key = ("lookup", id, name.lower() if name else None, email)
+    cached = patient_read_cache.get(key)
+    if cached is not None:
+        return {"patients": cached}
+
     query = supabase.table("patients").select("*")
     
     if id:
@@ -87,13 +288,18 @@ async def lookup_patient(id: int = None, name: str = None, email: str = None):
             query = query.eq("contact_info", email)
             
     result = query.limit(5).execute()
+    patient_read_cache.set(key, result.data, ttl_seconds=PATIENT_LOOKUP_TTL_SECONDS)
     return {"patients": result.data}
 
 @app.get("/patients/{patient_id}/history")
 async def get_patient_history(patient_id: int):
     """Get patient medical history"""
-    result = supabase.table("patient_medical_history").select("*").eq("patient_id", patient_id).execute()
-    return {"history": result.data}
+    key = ("history", patient_id)
+    cached = patient_read_cache.get(key)
+    if cached is None:
+        cached = supabase.table("patient_medical_history").select("*").eq("patient_id", patient_id).execute().data
+        patient_read_cache.set(key, cached)
+    return {"history": cached}
 
 @app.post("/patients/{patient_id}/history")
 async def add_history(patient_id: int, history: List[MedicalHistory]):
@@ -109,6 +315,8 @@ async def add_history(patient_id: int, history: List[MedicalHistory]):
             } for h in history
         ]
         supabase.table("patient_medical_history").insert(hist_data).execute()
+        patient_feature_cache.delete(patient_id)
+        patient_read_cache.delete(("history", patient_id))
     return {"message": "History added"}
 
 @app.post("/patients")
@@ -123,6 +331,7 @@ async def create_patient(patient: PatientInput):
     
     new_pid = p_data[1][0]["patient_id"] 
     
+    new_history = []
     if patient.medical_history:
         hist_data = [
             {
@@ -133,86 +342,409 @@ async def create_patient(patient: PatientInput):
                 "diagnosis_date": h.diagnosis_date
             } for h in patient.medical_history
         ]
-        supabase.table("patient_medical_history").insert(hist_data).execute()
+        h_data, _ = supabase.table("patient_medical_history").insert(hist_data).execute()
+        new_history = h_data[1]
+
+    # A new patient can match earlier name/email searches; the rest is written through
+    patient_read_cache.delete_where(lambda key: key[0] == "lookup")
+    patient_read_cache.set(("history", new_pid), new_history)
+    changes.bump("patients")
+
+    # We already have everything the feature record needs
+    patient_feature_cache.set(new_pid, patient_features(
+        {"age": patient.age, "gender": patient.gender},
+        [{"condition_name": h.condition_name, "notes": h.notes, "is_chronic": h.is_chronic} for h in patient.medical_history],
+    ))
 
     return {"patient_id": new_pid, "message": "Patient created"}
 
-async def run_ml_engine(visit_id: int, patient_id: int):
+scoring_cache = VersionedCache(
+    max_entries=int(os.getenv("SCORING_CACHE_SIZE", "4096")),
+    ttl_seconds=float(os.getenv("SCORING_CACHE_TTL_SECONDS", "900")),
+)
+
+# Per-patient risk features; invalidated by create_patient / add_history
+patient_feature_cache = TTLCache(
+    max_entries=int(os.getenv("PATIENT_FEATURE_CACHE_SIZE", "20000")),
+    ttl_seconds=float(os.getenv("PATIENT_FEATURE_CACHE_TTL_SECONDS", "86400")),
+)
+
+# Read-through cache for patient lookups and history, bounded by entries and
+# approximate size. Keys: ("lookup", id, name, email) and ("history", patient_id).
+PATIENT_LOOKUP_TTL_SECONDS = float(os.getenv("PATIENT_LOOKUP_TTL_SECONDS", "60"))
+patient_read_cache = TTLCache(
+    max_entries=int(os.getenv("PATIENT_READ_CACHE_SIZE", "10000")),
+    ttl_seconds=float(os.getenv("PATIENT_READ_CACHE_TTL_SECONDS", "3600")),
+    max_bytes=int(os.getenv("PATIENT_READ_CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+)
+
+def get_patient_features(patient_id: int) -> Dict[str, Any]:
+    """Chronic flags, condition categories and age band for a patient (cached)"""
+    record = patient_feature_cache.get(patient_id)
+    if record is None:
+        # 1. Fetch STATIC Patient Data
+        p_res = supabase.table("patients").select("age, gender").eq("patient_id", patient_id).execute()
+        p_data = p_res.data[0] if p_res.data else {}
+        
+        # 2. Fetch STATIC History
+        h_res = supabase.table("patient_medical_history").select("condition_name, notes, is_chronic").eq("patient_id", patient_id).execute()
+
+        record = patient_features(p_data, h_res.data)
+        patient_feature_cache.set(patient_id, record)
+    return record
+
+def load_visit_features(visit: VisitInput) -> Dict[str, Any]:
+    """Build the canonical scoring features for a submitted visit"""
+    # Vitals + Symptoms come straight from the request
+    vitals = {"bp_systolic": visit.bp_systolic, "heart_rate": visit.heart_rate, "temperature": visit.temperature}
+    symptoms = [{"symptom_name": s.symptom_name, "severity_score": s.severity_score} for s in visit.symptoms]
+
+    return visit_features(get_patient_features(visit.patient_id), vitals, symptoms)
+
+async def run_ml_engine(features: Dict[str, Any], rules: Dict[str, Any]):
     """
     Local Fallback Logic:
-    Fetches data and performs rule-based triage when external ML is unavailable.
+    Rule-based triage on the visit features when external ML is unavailable.
     """
-    # 1. Fetch STATIC Patient Data
-    p_res = supabase.table("patients").select("age, gender").eq("patient_id", patient_id).execute()
-    p_data = p_res.data[0] if p_res.data else {}
-    
-    # 2. Fetch STATIC History
-    h_res = supabase.table("patient_medical_history").select("condition_name, notes").eq("patient_id", patient_id).execute()
-    history_text = " ".join([f"{h['condition_name']} {h.get('notes') or ''}" for h in h_res.data]).lower()
-    
-    # 3. Fetch Vitals
-    v_res = supabase.table("vitals").select("bp_systolic, heart_rate, temperature").eq("visit_id", visit_id).execute()
-    vitals = v_res.data[0] if v_res.data else {}
-    
-    # 4. Fetch Symptoms
-    s_res = supabase.table("visit_symptoms").select("symptom_name, severity_score").eq("visit_id", visit_id).execute()
-    symptoms = s_res.data
-    
-    # --- Logic ---
-    risk_score = 0.1
-    explainability = {}
-    dept_scores = {"Emergency": 0.1, "Cardiology": 0.1, "Respiratory": 0.1, "Neurology": 0.1, "General Medicine": 0.15, "Orthopedics": 0.05}
-    
-    # A. History
-    if any(k in history_text for k in ["heart", "cardiac", "angina", "murmur", "failure"]):
-        dept_scores["Cardiology"] += 0.3
-        risk_score += 0.15
-        explainability["Cardiac History"] = 0.15
+    return score_rules(features, rules)
+
+department_load = DepartmentLoadTracker()
+_dept_ids: Dict[str, int] = {}
+
+def get_department_ids() -> Dict[str, int]:
+    """Department name -> dept_id, loaded once (departments rarely change)"""
+    global _dept_ids
+    if not _dept_ids:
+        d_res = supabase.table("departments").select("dept_id, dept_name").execute()
+        _dept_ids = {d["dept_name"]: d["dept_id"] for d in d_res.data}
+    return _dept_ids
+
+@warmup.step("departments")
+async def warm_departments():
+    # First query: creates the client and opens a pooled connection
+    await run_in_threadpool(get_department_ids)
+
+def load_pending_entries(dept_id: int) -> List[Dict[str, Any]]:
+    q_res = supabase.table("department_queue").select("queue_id, priority_score") \
+        .eq("dept_id", dept_id).eq("status", "pending").execute()
+    return q_res.data
+
+queue_positions = QueuePositionIndex(load_pending_entries)
+
+@warmup.step("queues", required=False)
+async def warm_queues():
+    def preload():
+        for dept_id in get_department_ids().values():
+            queue_positions.department(dept_id)
+        refresh_department_load()
+    await run_in_threadpool(preload)
+
+# Bumped on every queue/patient write; backs the ETags of the polling endpoints.
+# Queue writes go through queue_changes, which also logs them for delta sync.
+changes = ChangeCounters()
+queue_changes = QueueChangeLog(changes)
+
+def refresh_department_load():
+    if department_load.needs_sync():
+        q_res = supabase.table("department_queue").select("dept_id, added_timestamp").eq("status", "pending").execute()
+        department_load.sync(q_res.data)
+
+# --- Other workers' writes (LISTEN/NOTIFY, see change_listener.py) ---
+
+def apply_remote_change(change: Dict[str, Any]):
+    """Bring this worker's in-process state up to date with a write made elsewhere"""
+    global _dept_ids
+    table, op = change.get("table"), change.get("op")
+
+    if table == "department_queue":
+        dept_id, queue_id = change["dept_id"], change["queue_id"]
+        if op != "DELETE" and change.get("status") == "pending":
+            queue_positions.on_insert(dept_id, queue_id, change.get("priority_score"))
+        else:
+            queue_positions.on_remove(dept_id, queue_id)
+        queue_changes.record(dept_id, queue_id, "remove" if op == "DELETE" else "upsert")
+        department_load.invalidate()
+
+    elif table == "triage_predictions":
+        for q in change.get("queues") or []:
+            queue_changes.record(q["dept_id"], q["queue_id"], "upsert")
+
+    elif table == "patients":
+        patient_id = change["patient_id"]
+        patient_feature_cache.delete(patient_id)
+        patient_read_cache.delete(("history", patient_id))
+        patient_read_cache.delete_where(lambda key: key[0] == "lookup")
+        changes.bump("patients")
+
+    elif table == "patient_medical_history":
+        patient_feature_cache.delete(change["patient_id"])
+        patient_read_cache.delete(("history", change["patient_id"]))
+
+    elif table == "departments":
+        _dept_ids = {}
+        queue_positions.invalidate()
+        department_load.invalidate()
+        changes.bump("departments")
+
+def resync_local_state():
+    """Notifications may have been missed: drop everything derived from the database"""
+    global _dept_ids
+    queue_changes.reset(_dept_ids.values())
+    _dept_ids = {}
+    queue_positions.invalidate()
+    department_load.invalidate()
+    patient_feature_cache.clear()
+    patient_read_cache.clear()
+    changes.bump("patients", "departments")
+
+change_listener = ChangeListener.from_env(apply_remote_change, resync_local_state, origin=db.WORKER_ID)
+
+def enqueue_targets(pred_id: int, targets: List[RouteTarget]) -> List[str]:
+    """Insert department_queue rows for the planned targets"""
+    if not targets:
+        return []
+
+    q_data, _ = supabase.table("department_queue").insert([
+        {
+            "prediction_id": pred_id,
+            "dept_id": t.dept_id,
+            "priority_score": t.priority_score,
+            "routing_role": t.role,
+            "status": "pending"
+        } for t in targets
+    ]).execute()
+
+    for row in q_data[1]:
+        queue_positions.on_insert(row["dept_id"], row["queue_id"], row["priority_score"])
+        queue_changes.record(row["dept_id"], row["queue_id"], "upsert")
+
+    queued_depts = []
+    for t in targets:
+        department_load.on_enqueue(t.dept_id)
+        queued_depts.append(f"{t.dept_name}({t.priority_score:.2f}, {t.role})")
+        log.debug("Queued", extra={
+            "prediction_id": pred_id, "department": t.dept_name, "role": t.role,
+            "priority": round(t.priority_score, 2), "expected_wait_min": round(t.expected_wait)})
+    return queued_depts
+
+def route_prediction(pred_id: int, ml_result: Dict[str, Any], recommended_dept: str, reserved_primary: str = None) -> List[str]:
+    """Queue a prediction to its primary department and any shadow departments"""
+    dept_ids = get_department_ids()
+    refresh_department_load()
+
+    targets = plan_routing(
+        ml_result["department_scores"],
+        recommended_dept,
+        dept_ids,
+        department_load,
+        fallback_score=ml_result["risk_score"],
+        reserved_primary=reserved_primary,
+    )
+    return enqueue_targets(pred_id, targets)
+
+ml_engine = MLMicroBatcher.from_env()
+REMOTE_MODEL_VERSION = "remote"  # Used when the engine doesn't report a model_version
+
+# auto: embedded model if one is installed, else remote engine
+# local: never call the remote engine (embedded model, else rules)
+# remote: always use the remote engine
+ML_ENGINE_MODE = os.getenv("ML_ENGINE_MODE", "auto")
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+MODELS_DIR = os.getenv("TRIAGE_MODELS_DIR", os.path.join(BACKEND_DIR, "models"))
+RULES_DIR = os.getenv("TRIAGE_RULES_DIR", os.path.join(BACKEND_DIR, "rules"))
+SCORING_WATCH_SECONDS = float(os.getenv("SCORING_WATCH_SECONDS", "0"))  # 0 = no file watcher
+
+scorers = ScoringRegistry(MODELS_DIR, RULES_DIR, use_model=ML_ENGINE_MODE != "remote")
+scoring_pool = pool_from_env()
+
+def restart_scoring_pool(snapshot):
+    # Workers preload the artifacts, so every swap needs fresh workers
+    if scoring_pool:
+        scoring_pool.start(snapshot.model.path if snapshot.model else None, snapshot.rules)
+
+def clear_scoring_cache(snapshot):
+    scoring_cache.clear()
+
+scorers.on_swap(restart_scoring_pool)
+scorers.on_swap(clear_scoring_cache)
+
+@warmup.step("scoring_artifacts", required=False)
+async def load_scoring_artifacts():
+    # On failure the built-in rules stay active
+    snapshot = await run_in_threadpool(scorers.reload)
+    log.info("Scoring artifacts loaded", extra={"versions": snapshot.versions})
+
+WARMUP_FEATURES = visit_features(
+    patient_features({"age": 45, "gender": "Female"}, []),
+    {"bp_systolic": 120, "heart_rate": 80, "temperature": 98.6},
+    [{"symptom_name": "cough", "severity_score": 2}],
+)
+
+@warmup.step("scoring", required=False)
+async def warm_scoring():
+    # Spawns the pool workers and pages in the model before the first visit needs them
+    workers = scoring_pool.workers if scoring_pool else 1
+    await asyncio.gather(*(score_locally(dict(WARMUP_FEATURES), scorers.active) for _ in range(workers)))
+
+@warmup.step("ml_engine", required=False)
+async def warm_ml_engine():
+    if ML_ENGINE_MODE == "local" or scorers.active.model is not None:
+        return
+    await ml_engine.client.get("/")  # Any response means a pooled connection is open
+
+async def score_locally(features: Dict[str, Any], active) -> Dict[str, Any]:
+    """Embedded model (or rules if there is none), in the scoring pool when enabled"""
+    if scoring_pool:
+        try:
+            return await scoring_pool.score(features)
+        except PoolSaturated as e:
+            # Shed load: scoring the model here would stall the event loop at peak load
+            SCORING_FALLBACKS.inc("pool_saturated")
+            log.warning(f"{e}. Scoring with the rules.", extra={"sample": "fallback"})
+            return await run_ml_engine(features, active.rules)
+        except Exception as e:
+            SCORING_FALLBACKS.inc("pool_error")
+            log.warning(f"Scoring pool failed ({e}). Switching to local fallback.", extra={"sample": "fallback"})
+            return await run_ml_engine(features, active.rules)
+
+    if active.model is None:
+        return await run_ml_engine(features, active.rules)
+    try:
+        return active.model.predict(features)
+    except Exception as e:
+        SCORING_FALLBACKS.inc("model_error")
+        log.warning(f"Embedded model failed ({e}). Switching to local fallback.", extra={"sample": "fallback"})
+        return await run_ml_engine(features, active.rules)
+
+async def score_visit(visit_id: int, visit: VisitInput) -> Dict[str, Any]:
+    """
+    Run triage scoring for a stored visit. The embedded model is used when
+    installed; otherwise the scoring cache, then the external ML engine, then
+    local rules if it fails. The result always carries "recommended_department".
+    """
+    features = load_visit_features(visit)
+    active = scorers.active  # One snapshot for the whole visit, even if a reload lands mid-way
+
+    if active.model is not None or ML_ENGINE_MODE == "local":
+        SCORING_PATHS.inc("local")
+        return await score_locally(features, active)
+
+    if admission.under_pressure:
+        # Surge: don't hold an admission slot on a slow remote call
+        log.info("Backend under pressure; scoring locally", extra={"visit_id": visit_id, "sample": "fallback"})
+        SCORING_PATHS.inc("local")
+        SCORING_FALLBACKS.inc("under_pressure")
+        return await score_locally(features, active)
+
+    # Keyed on the active artifacts too, so nothing cached under another snapshot is served
+    signature = (active.versions["model"], active.versions["rules"], feature_signature(features))
+
+    cached = scoring_cache.get(signature)
+    if cached is not None:
+        log.debug("Scoring cache hit", extra={"visit_id": visit_id})
+        SCORING_PATHS.inc("cache")
+        return copy.deepcopy(cached)
+
+    try:
+        log.debug("Calling ML engine", extra={"visit_id": visit_id})
+        start = time.perf_counter()
+        try:
+            ml_result = await ml_engine.score(visit_id)
+        except Exception:
+            UPSTREAM_LATENCY.observe("ml_engine", "error", value=time.perf_counter() - start)
+            raise
+        UPSTREAM_LATENCY.observe("ml_engine", "ok", value=time.perf_counter() - start)
+
+        if "primary_department" in ml_result:
+            ml_result["recommended_department"] = ml_result["primary_department"]
+        elif "recommended_department" not in ml_result:
+            raise ValueError("ML response missing department field")
         
-    if any(k in history_text for k in ["lung", "asthma", "copd", "breath"]):
-        dept_scores["Respiratory"] += 0.3
-        risk_score += 0.1
-
-    # B. Vitals
-    sys_bp = vitals.get('bp_systolic', 120)
-    if sys_bp > 160:
-        risk_score += 0.25
-        dept_scores["Emergency"] += 0.2
-        dept_scores["Cardiology"] += 0.3
-        explainability[f"BP {sys_bp}"] = 0.25
-
-    # C. Symptoms
-    for s in symptoms:
-        name = s['symptom_name'].lower()
-        if any(k in name for k in ["chest", "heart", "pain"]):
-            risk_score += 0.3
-            dept_scores["Cardiology"] += 0.5
-            dept_scores["Emergency"] += 0.2
-            explainability[f"Sx: {name}"] = 0.3
-        elif any(k in name for k in ["breath", "cough"]):
-            risk_score += 0.25
-            dept_scores["Respiratory"] += 0.5
+        if "department_scores" not in ml_result:
+            raise ValueError("ML response missing department_scores")
+
+        # A new engine version invalidates everything cached from the old one. The
+        # engine may not report one: then only the TTL bounds how long scores outlive it
+        ml_result.setdefault("model_version", REMOTE_MODEL_VERSION)
+        scoring_cache.set_version(ml_result["model_version"])
+        scoring_cache.set(signature, copy.deepcopy(ml_result))
+        SCORING_PATHS.inc("remote")
             
-    # Normalize
-    risk_score = min(risk_score, 0.99)
-    # Classification
-    if risk_score > 0.70: risk_level = "High"
-    elif risk_score > 0.40: risk_level = "Medium"
-    else: risk_level = "Low"
-
-    recommended_department = max(dept_scores, key=dept_scores.get)
-    
-    return {
-        "risk_level": risk_level,
-        "risk_score": round(risk_score, 2),
-        "primary_department": recommended_department, # key match
-        "recommended_department": recommended_department,
-        "department_scores": dept_scores,
-        "explainability": explainability
-    }
+    except (httpx.TimeoutException, httpx.HTTPError, Exception) as e:
+        log.warning(f"External ML service failed ({e}). Switching to local fallback.", extra={
+            "visit_id": visit_id, "sample": "fallback"})
+        SCORING_PATHS.inc("local")
+        SCORING_FALLBACKS.inc("remote_error")
+        try:
+            # LOCAL FALLBACK (not cached: it's cheap, and only stands in while the engine is down)
+            ml_result = await run_ml_engine(features, active.rules)
+        except Exception as local_e:
+            log.critical("Local fallback also failed", exc_info=True, extra={"visit_id": visit_id})
+            raise HTTPException(status_code=500, detail=f"Triage Assessment Failed: {str(local_e)}")
+
+    return ml_result
+
+def fast_track_visit(visit_id: int, red_flags: List[str]):
+    """Queue a red-flag visit to Emergency at top priority with a provisional prediction"""
+    dept_ids = get_department_ids()
+    refresh_department_load()
+
+    pred_data, _ = supabase.table("triage_predictions").insert({
+        "visit_id": visit_id,
+        "risk_level": "High",
+        "risk_score": 0.99,
+        "recommended_department": FAST_PATH_DEPARTMENT,
+        "department_scores": {FAST_PATH_DEPARTMENT: FAST_PATH_PRIORITY},
+        "explainability": {f"Red flag: {f}": 1.0 for f in red_flags},
+        "model_version": PRETRIAGE_VERSION
+    }).execute()
+    pred_id = pred_data[1][0]["prediction_id"]
+    SCORING_PATHS.inc("pretriage")
+
+    d_id = dept_ids[FAST_PATH_DEPARTMENT]
+    target = RouteTarget(FAST_PATH_DEPARTMENT, d_id, FAST_PATH_PRIORITY, "primary", 0.0)
+    return pred_id, enqueue_targets(pred_id, [target])
+
+async def rescore_fast_tracked(visit_id: int, visit: VisitInput, pred_id: int, red_flags: List[str]):
+    """
+    Background step for fast-tracked visits: run full scoring, record it on the
+    provisional prediction and add shadow queues for the departments it
+    suggests. The Emergency entry and High risk level are kept - red flags
+    are never downgraded by the model.
+    """
+    try:
+        ml_result = await score_visit(visit_id, visit)
+        recommended_dept = ml_result["recommended_department"]
+
+        explainability = dict(ml_result.get("explainability", {}))
+        explainability.update({f"Red flag: {f}": 1.0 for f in red_flags})
+
+        supabase.table("triage_predictions").update({
+            "risk_score": max(ml_result["risk_score"], 0.99),
+            "recommended_department": recommended_dept,
+            "department_scores": ml_result["department_scores"],
+            "explainability": explainability,
+            "model_version": ml_result["model_version"]
+        }).eq("prediction_id", pred_id).execute()
+        # Risk is shown on the patient's queue entries
+        q_res = supabase.table("department_queue").select("queue_id, dept_id, status").eq("prediction_id", pred_id).execute()
+        for row in q_res.data:
+            queue_changes.record(row["dept_id"], row["queue_id"], "upsert")
+
+        # Once Emergency has claimed (or discharged) the patient, shadows would be ghosts
+        emergency_id = get_department_ids().get(FAST_PATH_DEPARTMENT)
+        if not any(row["dept_id"] == emergency_id and row["status"] == "pending" for row in q_res.data):
+            log.info("Fast-tracked visit rescored; already claimed, no shadows", extra={"visit_id": visit_id})
+            return
+
+        shadows = route_prediction(pred_id, ml_result, recommended_dept, reserved_primary=FAST_PATH_DEPARTMENT)
+        log.info("Fast-tracked visit rescored", extra={"visit_id": visit_id, "shadows": shadows})
+    except Exception:
+        # The patient is already queued to Emergency, so this is not fatal
+        log.exception("Rescoring failed for fast-tracked visit", extra={"visit_id": visit_id})
 
 @app.post("/patient-visits")
-async def create_visit(visit: VisitInput):
+async def create_visit(visit: VisitInput, background_tasks: BackgroundTasks):
     """
     Create visit + trigger ML pipeline
     
@@ -221,9 +753,15 @@ async def create_visit(visit: VisitInput):
     - Removed flawed local fallback
     - Proper error handling
     - Standardized response keys
+
+    Red-flag vitals/symptoms skip the ML round-trip: the visit is queued to
+    Emergency immediately and scored in the background.
     """
-    print(f"Received Visit: {visit.patient_id} - {visit.chief_complaint}")
+    log.debug("Received visit", extra={"patient_id": visit.patient_id, "chief_complaint": visit.chief_complaint})
     try:
+        # 0. Deterministic pre-triage (no I/O)
+        red_flags = check_red_flags(visit)
+
         # 1. Insert Visit
         v_data, _ = supabase.table("patient_visits").insert({
             "patient_id": visit.patient_id,
@@ -253,40 +791,22 @@ async def create_visit(visit: VisitInput):
                 } for s in visit.symptoms
             ]
             supabase.table("visit_symptoms").insert(s_data).execute()
+
+        # 4a. Red flags: queue now, score later
+        if red_flags and FAST_PATH_DEPARTMENT in get_department_ids():
+            log.warning("Red flags", extra={"visit_id": visit_id, "red_flags": red_flags})
+            pred_id, queued_depts = fast_track_visit(visit_id, red_flags)
+            background_tasks.add_task(rescore_fast_tracked, visit_id, visit, pred_id, red_flags)
+            return {
+                "visit_id": visit_id,
+                "message": "Red flags detected: queued to Emergency, ML Analysis pending",
+                "queued_departments": queued_depts,
+                "red_flags": red_flags
+            }
         
-        # 4. ✅ FIXED: Call ML Engine with proper timeout and error handling
-        async with httpx.AsyncClient() as client:
-            try:
-                print(f"Calling ML Engine for visit {visit_id}...")
-                ml_response = await client.post(
-                    "https://ml-backend-engine-kanini.onrender.com/api/v1/process_visit",
-                    json={"visit_id": visit_id},
-                    timeout=60.0  # ✅ Increased to 60s
-                )
-                ml_response.raise_for_status()
-                ml_result = ml_response.json()
-                
-                print(f"ML Engine Response: {ml_result.keys()}")
-                
-                if "primary_department" in ml_result:
-                    recommended_dept = ml_result["primary_department"]
-                elif "recommended_department" in ml_result:
-                    recommended_dept = ml_result["recommended_department"]
-                else:
-                    raise ValueError("ML response missing department field")
-                
-                if "department_scores" not in ml_result:
-                    raise ValueError("ML response missing department_scores")
-                    
-            except (httpx.TimeoutException, httpx.HTTPError, Exception) as e:
-                print(f"External ML Service Failed ({str(e)}). Switching to Local Fallback.")
-                try:
-                    # LOCAL FALLBACK
-                    ml_result = await run_ml_engine(visit_id, visit.patient_id)
-                    recommended_dept = ml_result["recommended_department"]
-                except Exception as local_e:
-                    print(f"CRITICAL: Local Fallback also failed: {local_e}")
-                    raise HTTPException(status_code=500, detail=f"Triage Assessment Failed: {str(local_e)}")
+        # 4b. ✅ FIXED: Call ML Engine with proper timeout and error handling
+        ml_result = await score_visit(visit_id, visit)
+        recommended_dept = ml_result["recommended_department"]
     
         # 5. Insert Predictions
         pred_data, _ = supabase.table("triage_predictions").insert({
@@ -295,50 +815,18 @@ async def create_visit(visit: VisitInput):
             "risk_score": ml_result["risk_score"],
             "recommended_department": recommended_dept,  # ✅ FIXED: Use standardized key
             "department_scores": ml_result["department_scores"],
-            "explainability": ml_result.get("explainability", {})
+            "explainability": ml_result.get("explainability", {}),
+            "model_version": ml_result["model_version"]
         }).execute()
         
         pred_id = pred_data[1][0]["prediction_id"]
     
-        # 6. ✅ Multi-Department Queue Routing (Already Correct!)
-        threshold = 0.35  # Queue threshold
-        queued_depts = []
-        
-        print(f"Department Scores: {ml_result['department_scores']}")
-        
-        # Add to all departments with score >= threshold
-        for dept, score in ml_result["department_scores"].items():
-            if score >= threshold:
-                d_res = supabase.table("departments").select("dept_id").eq("dept_name", dept).execute()
-                if d_res.data:
-                    d_id = d_res.data[0]['dept_id']
-                    supabase.table("department_queue").insert({
-                        "prediction_id": pred_id,
-                        "dept_id": d_id,
-                        "priority_score": score, 
-                        "status": "pending"
-                    }).execute()
-                    queued_depts.append(f"{dept}({score:.2f})")
-                    print(f"✅ Queued to {dept} with priority {score:.2f}")
-
-        # Safety fallback: If no department met threshold, queue to primary
-        if not queued_depts:
-            dept_res = supabase.table("departments").select("dept_id").eq("dept_name", recommended_dept).execute()
-            
-            if not dept_res.data:
-                dept_res = supabase.table("departments").select("dept_id").eq("dept_name", "Emergency").execute()
-                 
-            if dept_res.data:
-                d_id = dept_res.data[0]['dept_id']
-                supabase.table("department_queue").insert({
-                    "prediction_id": pred_id,
-                    "dept_id": d_id,
-                    "priority_score": ml_result["department_scores"].get(recommended_dept, ml_result["risk_score"]), 
-                    "status": "pending"
-                }).execute()
-                queued_depts.append(f"{recommended_dept}(fallback)")
-        
-        print(f"✅ Visit {visit_id} queued to: {', '.join(queued_depts)}")
+        # 6. Load-aware routing: one primary queue + shadows
+        log.debug("Department scores", extra={"visit_id": visit_id, "department_scores": ml_result["department_scores"]})
+        queued_depts = route_prediction(pred_id, ml_result, recommended_dept)
+
+        log.info("Visit queued", extra={
+            "visit_id": visit_id, "risk_level": ml_result["risk_level"], "queued": queued_depts, "sample": "visit"})
         
         return {
             "visit_id": visit_id, 
@@ -349,22 +837,43 @@ async def create_visit(visit: VisitInput):
     except HTTPException:
         raise  # Re-raise HTTP exceptions as-is
     except Exception as e:
-        print(f"CRITICAL ERROR in create_visit: {e}")
-        import traceback
-        traceback.print_exc()
+        log.exception("create_visit failed", extra={"patient_id": visit.patient_id})
         raise HTTPException(status_code=500, detail=f"Processing Error: {str(e)}")
 
+def release_shadows(pred_id: int, keep_queue_id: int):
+    """Remove a patient's other pending entries once one department has claimed them"""
+    data, _ = supabase.table("department_queue").delete() \
+        .eq("prediction_id", pred_id).eq("status", "pending").neq("queue_id", keep_queue_id).execute()
+    for row in data[1]:
+        department_load.on_dequeue(row["dept_id"])
+        queue_positions.on_remove(row["dept_id"], row["queue_id"])
+        queue_changes.record(row["dept_id"], row["queue_id"], "remove")
+
 @app.patch("/queue/{queue_id}/status")
 async def update_queue_status(queue_id: int, status: str):
     """Update patient status"""
     allowed_statuses = ["pending", "treating", "completed", "discharged", "referred"]
     
     s_norm = status.lower().strip()
+
+    q_res = supabase.table("department_queue").select("prediction_id, dept_id, status, priority_score").eq("queue_id", queue_id).execute()
+    entry = q_res.data[0] if q_res.data else None
+
+    if entry:
+        was_pending = entry["status"] == "pending"
+        if was_pending and s_norm != "pending":
+            # Patient reached a clinician: feeds the department's service rate
+            department_load.on_dequeue(entry["dept_id"])
+            department_load.on_served(entry["dept_id"])
+            queue_positions.on_remove(entry["dept_id"], queue_id)
+            release_shadows(entry["prediction_id"], queue_id)
+        elif not was_pending and s_norm == "pending":
+            department_load.on_enqueue(entry["dept_id"])
+            queue_positions.on_insert(entry["dept_id"], queue_id, entry["priority_score"])
     
     if s_norm in ["completed", "discharged"]:
-        q_res = supabase.table("department_queue").select("prediction_id").eq("queue_id", queue_id).execute()
-        if q_res.data:
-            pred_id = q_res.data[0]['prediction_id']
+        if entry:
+            pred_id = entry['prediction_id']
             
             p_res = supabase.table("triage_predictions").select("visit_id").eq("prediction_id", pred_id).execute()
             if p_res.data:
@@ -372,22 +881,182 @@ async def update_queue_status(queue_id: int, status: str):
                 supabase.table("patient_visits").update({"visit_status": "completed"}).eq("visit_id", visit_id).execute()
 
         data, _ = supabase.table("department_queue").delete().eq("queue_id", queue_id).execute()
+        if entry:
+            queue_changes.record(entry["dept_id"], queue_id, "remove")
         return {"message": "Patient discharged and removed from queue", "data": data}
 
     else:
         data, _ = supabase.table("department_queue").update({"status": s_norm}).eq("queue_id", queue_id).execute()
+        if entry:
+            queue_changes.record(entry["dept_id"], queue_id, "upsert")
         return {"message": "Status updated", "data": data}
 
-@app.get("/queues/{dept_name}")
-async def get_queue(dept_name: str):
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+def require_admin(x_admin_token: str = Header(None)):
+    """Admin endpoints need X-Admin-Token to match ADMIN_TOKEN (disabled if unset)"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled (ADMIN_TOKEN not set)")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+@app.get("/admin/scoring", dependencies=[Depends(require_admin)])
+async def get_scoring_versions():
+    """Active and available scoring artifact versions"""
+    available_models = sorted(
+        d for d in os.listdir(MODELS_DIR) if os.path.isdir(os.path.join(MODELS_DIR, d))
+    ) if os.path.isdir(MODELS_DIR) else []
+    available_rules = sorted(
+        f[:-len(".json")] for f in os.listdir(RULES_DIR) if f.endswith(".json")
+    ) if os.path.isdir(RULES_DIR) else []
+    return {"active": scorers.active.versions, "models": available_models, "rules": available_rules}
+
+@app.post("/admin/scoring/reload", dependencies=[Depends(require_admin)])
+async def reload_scoring(model_version: str = None, rules_version: str = None):
+    """Hot-swap the scoring model / rule set without restarting (defaults: CURRENT)"""
+    previous = scorers.active.versions
+    if model_version and not scorers.use_model:
+        # Remote mode scores with the ML engine; loading a model here would quietly switch to local scoring
+        raise HTTPException(status_code=409, detail=f"ML_ENGINE_MODE={ML_ENGINE_MODE} does not use an embedded model")
+    try:
+        snapshot = scorers.reload(model_version=model_version, rules_version=rules_version)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Reload failed, still serving {previous}: {e}")
+    log.info("Scoring artifacts swapped", extra={"previous": previous, "active": snapshot.versions})
+    return {"previous": previous, "active": snapshot.versions}
+
+@app.post("/admin/profile", dependencies=[Depends(require_admin)])
+async def run_profiler(
+    seconds: float = None,
+    requests: int = None,
+    route: str = None,
+    interval_ms: float = 5,
+    include_idle: bool = False,
+    format: str = "collapsed",
+):
+    """
+    Sample this worker's stacks for `seconds`, or for the next `requests`
+    requests whose path matches `route` (trailing * for a prefix). Returns
+    collapsed stacks for flamegraph.pl / speedscope, or a JSON summary.
+    """
+    if seconds is None and requests is None:
+        raise HTTPException(status_code=400, detail="Give seconds or requests")
+    if format not in ("collapsed", "json"):
+        raise HTTPException(status_code=400, detail="format must be collapsed or json")
+    try:
+        session = await profiler.run(seconds=seconds, route=route, requests=requests,
+                                     interval_ms=interval_ms, include_idle=include_idle)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    log.info("Profiling session finished", extra={
+        "samples": session.samples, "seconds": round(session.duration, 1), "requests": session.completed_requests})
+
+    if format == "json":
+        leaves = {}
+        for stack, n in session.stacks.items():
+            leaf = stack.rsplit(";", 1)[-1]
+            leaves[leaf] = leaves.get(leaf, 0) + n
+        return {
+            "samples": session.samples,
+            "duration_seconds": round(session.duration, 3),
+            "requests": session.completed_requests,
+            "top_self": sorted(leaves.items(), key=lambda kv: -kv[1])[:25],
+            "stacks": dict(session.stacks.most_common()),
+        }
+    return Response(session.collapsed(), media_type="text/plain", headers={
+        "X-Profile-Samples": str(session.samples),
+        "X-Profile-Duration": f"{session.duration:.3f}",
+        "X-Profile-Requests": str(session.completed_requests),
+    })
+
+def db_routing_stats():
+    client = supabase.client.get() if supabase.client.created else None
+    return client.snapshot() if isinstance(client, db.RoutedClient) else None
+
+@app.get("/internal/stats")
+async def get_internal_stats():
+    """Runtime counters for the scoring pipeline"""
+    return {
+        "scoring_cache": scoring_cache.stats(),
+        "patient_feature_cache": patient_feature_cache.stats(),
+        "patient_read_cache": patient_read_cache.stats(),
+        "ml_engine": ml_engine.stats,
+        "ml_engine_mode": ML_ENGINE_MODE,
+        "scoring_versions": scorers.active.versions,
+        "scoring_pool": scoring_pool.stats if scoring_pool else None,
+        "admission": admission.snapshot(),
+        "read_coalescing": read_flights.stats,
+        "explain_cache": explain_cache.stats(),
+        "change_listener": change_listener.snapshot() if change_listener else None,
+        "db_routing": db_routing_stats(),
+    }
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus metrics"""
+    try:
+        # In-process counts, resynced at most every RESYNC_SECONDS - a scrape doesn't scan the queue
+        await run_in_threadpool(refresh_department_load)
+        for name, d_id in get_department_ids().items():
+            QUEUE_DEPTH.set(name, value=department_load.depth.get(d_id, 0))
+            QUEUE_OLDEST_WAIT.set(name, value=round(department_load.oldest_wait(d_id), 1))
+    except Exception as e:
+        log.warning(f"Queue gauges unavailable: {e}")
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/routing/load")
+async def get_routing_load():
+    """Current backlog, service rate and expected wait per department"""
+    refresh_department_load()
+    return {"departments": department_load.snapshot(get_department_ids())}
+
+# Identical concurrent dashboard reads share one DB round trip
+read_flights = SingleFlight()
+
+def not_modified(request: Request, etag: str):
+    """304 response if the client already holds this version"""
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return None
+
+def tagged(content: Dict[str, Any], etag: str) -> FastJSONResponse:
+    return FastJSONResponse(content, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+def queue_flight(dept_id: int):
+    # Keyed on the change counter: a read arriving after a write never joins a
+    # flight that started before it (and would go out under the newer ETag).
+    # Keyed on the read source too: a pinned client never gets a replica's result.
+    version = (changes.epoch, changes.get(("dept", dept_id)))
+    key = ("queue", dept_id, version, db.reads_from_primary())
+    return read_flights.do(key, lambda: load_queue(dept_id), label=f"queue:{dept_id}")
+
+@app.get("/queues", response_model=AllQueuesResponse)
+async def get_all_queues(request: Request):
+    """Active queues for every department"""
+    etag = make_etag("qa", changes.epoch, changes.total, time_bucket())
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+
+    version = (changes.epoch, changes.total)
+    key = ("all_queues", version, db.reads_from_primary())
+    queues = await read_flights.do(key, load_all_queues, label="all_queues")
+    return tagged(queues, etag)
+
+@app.get("/queues/{dept_name}", response_model=QueueResponse)
+async def get_queue(dept_name: str, request: Request):
     """Get active queue for department"""
-    d_res = supabase.table("departments").select("dept_id").eq("dept_name", dept_name).execute()
-    if not d_res.data:
+    dept_id = get_department_ids().get(dept_name)
+    if dept_id is None:
         return {"queue": []}
-        
-    dept_id = d_res.data[0]['dept_id']
-    
-    result = supabase.table("department_queue").select("""
+
+    etag = make_etag("q", changes.epoch, dept_id, changes.get(("dept", dept_id)), time_bucket())
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    return tagged(await queue_flight(dept_id), etag)
+
+QUEUE_ROW_COLUMNS = """
         *,
         triage_predictions!inner(
             risk_score, 
@@ -399,13 +1068,115 @@ async def get_queue(dept_name: str):
                 patients!inner(full_name, age, gender, contact_info)
             )
         )
-    """).eq("dept_id", dept_id).neq("status", "completed").neq("status", "discharged").order("priority_score", desc=True).limit(50).execute()
+    """
+QUEUE_LIMIT = 50
+
+def active_queue_rows():
+    return supabase.table("department_queue").select(QUEUE_ROW_COLUMNS).neq("status", "completed").neq("status", "discharged")
+
+def fetch_queue_rows(dept_id: int, queue_ids: List[int] = None) -> List[Dict[str, Any]]:
+    """Active entries for a department (top 50 by priority, or just queue_ids)"""
+    query = active_queue_rows().eq("dept_id", dept_id)
+    if queue_ids is not None:
+        query = query.in_("queue_id", queue_ids)
+    else:
+        query = query.limit(QUEUE_LIMIT)
+    return query.order("priority_score", desc=True).order("queue_id").execute().data
+
+def fetch_all_queue_rows() -> Dict[int, List[Dict[str, Any]]]:
+    """Active entries for every department, top 50 of each, in one query (ranked view)"""
+    rows = supabase.table("active_department_queue").select(QUEUE_ROW_COLUMNS) \
+        .lte("queue_rank", QUEUE_LIMIT).order("dept_id").order("queue_rank").execute().data
+    by_dept: Dict[int, List[Dict[str, Any]]] = {}
+    for entry in rows:
+        entry.pop("queue_rank", None)
+        by_dept.setdefault(entry["dept_id"], []).append(entry)
+    return by_dept
+
+async def load_queue(dept_id: int) -> Dict[str, Any]:
+    rows = await run_in_threadpool(fetch_queue_rows, dept_id)
+
+    # Live positions among waiting patients (None for patients already being seen)
+    positions = queue_positions.department(dept_id)
+    for entry in rows:
+        entry["queue_position"] = positions.position(entry["queue_id"])
     
-    return {"queue": result.data}
+    return {"queue": rows}
+
+async def load_all_queues() -> Dict[str, Any]:
+    by_dept = await run_in_threadpool(fetch_all_queue_rows)
+    queues = {}
+    for name, d_id in get_department_ids().items():
+        rows = by_dept.get(d_id, [])
+        positions = queue_positions.department(d_id)
+        for entry in rows:
+            entry["queue_position"] = positions.position(entry["queue_id"])
+        queues[name] = rows
+    return {"queues": queues}
+
+@app.get("/queues/{dept_name}/changes", response_model=QueueChangesResponse)
+async def get_queue_changes(dept_name: str, since: str = None):
+    """
+    Entries upserted or removed since `since` (a version from an earlier call).
+    Without `since`, or when it has fallen out of the change log, returns the
+    full queue with full_resync=true. Clients keep entries ordered by
+    priority_score, then queue_id.
+    """
+    dept_id = get_department_ids().get(dept_name)
+    if dept_id is None:
+        raise HTTPException(status_code=404, detail=f"Unknown department: {dept_name}")
+
+    version = queue_changes.version(dept_id)
+    ops = queue_changes.since(dept_id, since) if since else None
+    if ops is None:
+        full = await queue_flight(dept_id)
+        return FastJSONResponse({"version": version, "full_resync": True, "queue": full["queue"]})
+
+    removed = [q_id for q_id, op in ops.items() if op == "remove"]
+    upserted = []
+    upsert_ids = [q_id for q_id, op in ops.items() if op == "upsert"]
+    if upsert_ids:
+        upserted = await run_in_threadpool(fetch_queue_rows, dept_id, upsert_ids)
+        positions = queue_positions.department(dept_id)
+        for entry in upserted:
+            entry["queue_position"] = positions.position(entry["queue_id"])
+        # Rows that were completed or deleted after being logged
+        found = {entry["queue_id"] for entry in upserted}
+        removed.extend(q_id for q_id in upsert_ids if q_id not in found)
+
+    return FastJSONResponse({"version": version, "full_resync": False, "upserted": upserted, "removed": removed})
 
-@app.get("/dashboard/stats")
-async def get_dashboard_stats():
+@app.get("/queues/{dept_name}/position/{queue_id}")
+async def get_queue_position(dept_name: str, queue_id: int):
+    """Position of one queue entry among the department's waiting patients"""
+    dept_id = get_department_ids().get(dept_name)
+    if dept_id is None:
+        raise HTTPException(status_code=404, detail=f"Unknown department: {dept_name}")
+
+    positions = queue_positions.department(dept_id)
+    position = positions.position(queue_id)
+    if position is None:
+        raise HTTPException(status_code=404, detail="Queue entry is not waiting in this department")
+
+    return {"queue_id": queue_id, "dept_name": dept_name, "position": position, "waiting": len(positions)}
+
+@app.get("/dashboard/stats", response_model=DashboardStats)
+async def get_dashboard_stats(request: Request):
     """Get high-level hospital stats"""
+    # Average wait moves with the clock, so the tag also rolls over every minute
+    etag = make_etag("s", changes.epoch, changes.total, changes.get("patients"), time_bucket(60))
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    version = (changes.epoch, changes.total, changes.get("patients"))
+    stats = await read_flights.do(
+        ("dashboard_stats", version, db.reads_from_primary()),
+        lambda: run_in_threadpool(compute_dashboard_stats),
+        label="dashboard_stats",
+    )
+    return tagged(stats, etag)
+
+def compute_dashboard_stats() -> Dict[str, Any]:
     total_p = supabase.table("patients").select("patient_id", count="exact").execute()
     
     active_q_res = supabase.table("department_queue").select("""
@@ -417,77 +1188,14 @@ async def get_dashboard_stats():
         )
     """).in_("status", ["pending", "treating"]).execute()
     
-    active_items = active_q_res.data
-    unique_active_preds = {}
-    
-    avg_wait = 0
-    total_seconds = 0
-    valid_wait_times = 0
-
-    if active_items:
-        try:
-            from datetime import datetime, timezone
-            now = datetime.now(timezone.utc)
-            
-            for item in active_items:
-                pred_id = item['prediction_id']
-                
-                if pred_id not in unique_active_preds:
-                    unique_active_preds[pred_id] = {
-                        "risk_level": item['triage_predictions'].get('risk_level', 'Low')
-                    }
-                    
-                    try:
-                        ts_str = item['triage_predictions']['patient_visits']['visit_timestamp']
-                        if ts_str.endswith('Z'):
-                            ts_str = ts_str.replace('Z', '+00:00')
-                        visit_time = datetime.fromisoformat(ts_str)
-                        if visit_time.tzinfo is None:
-                            visit_time = visit_time.replace(tzinfo=timezone.utc)
-                        
-                        diff = now - visit_time
-                        wait_secs = max(0, diff.total_seconds())
-                        total_seconds += wait_secs
-                        valid_wait_times += 1
-                        
-                    except Exception:
-                        pass
-                
-        except Exception as e:
-            print(f"Error calculating stats: {e}")
-
-    high_count = 0
-    medium_count = 0
-    low_count = 0
-    
-    for pid, data in unique_active_preds.items():
-        if data['risk_level'] == 'High':
-            high_count += 1
-        elif data['risk_level'] == 'Medium':
-            medium_count += 1
-        else:
-            low_count += 1
-
-    active_count = len(unique_active_preds)
-    
-    if valid_wait_times > 0:
-        avg_wait = int((total_seconds / valid_wait_times) / 60)
-    
-    return {
-        "total_patients": total_p.count,
-        "active_visits": active_count,
-        "high_risk_patients": high_count,
-        "medium_risk_patients": medium_count, 
-        "low_risk_patients": low_count,
-        "avg_wait_time": avg_wait
-    }
+    summary = summarize_active_queue(active_q_res.data)
+    return {"total_patients": total_p.count, **summary}
 
 # ==============================
 # AI EXPLAINABILITY (OpenRouter)
 # ==============================
-import requests
-
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
+OPENROUTER_URL = os.getenv("OPENROUTER_URL", "https://openrouter.ai/api/v1/chat/completions")  # llm_stub for local runs
 
 class VisitRequest(BaseModel):
     visit_id: int # Changed from str to int to match DB
@@ -521,11 +1229,12 @@ def get_prediction_data(visit_id):
         return prediction, vitals, symptoms, visit, patient
 
     except Exception as e:
-        print(f"Error fetching data for explainability: {e}")
+        log.warning(f"Error fetching data for explainability: {e}", extra={"visit_id": visit_id})
         raise HTTPException(status_code=404, detail=f"Visit data not found: {str(e)}")
 
 
 def explain_prediction(prediction, vitals, symptoms, visit, patient):
+    import requests  # Only this endpoint uses it; kept off the startup path
     symptom_list = [s["symptom_name"] for s in symptoms]
 
     prompt = f"""
@@ -556,9 +1265,10 @@ Provide a concise explanation (MAX 3 lines - strictly do not exceed):
 Avoid assumptions or hallucinations.
 """
 
+    start = time.perf_counter()
     try:
         res = requests.post(
-            "https://openrouter.ai/api/v1/chat/completions",
+            OPENROUTER_URL,
             headers={
                 "Authorization": f"Bearer {OPENROUTER_API_KEY}",
                 "Content-Type": "application/json"
@@ -572,6 +1282,7 @@ Avoid assumptions or hallucinations.
 
         data = res.json()
         # print("OpenRouter RAW Response:", data)  
+        UPSTREAM_LATENCY.observe("openrouter", "ok" if "choices" in data else "error", value=time.perf_counter() - start)
 
         # Safe handling
         if "choices" not in data:
@@ -586,20 +1297,35 @@ Avoid assumptions or hallucinations.
         }
 
     except Exception as e:
+        UPSTREAM_LATENCY.observe("openrouter", "error", value=time.perf_counter() - start)
         return {
             "status": "error",
             "message": str(e)
         }
 
+# Explanations for a given prediction don't change; rescoring changes the key
+explain_cache = TTLCache(
+    max_entries=int(os.getenv("EXPLAIN_CACHE_SIZE", "2000")),
+    ttl_seconds=float(os.getenv("EXPLAIN_CACHE_TTL_SECONDS", "3600")),
+)
+
 @app.post("/triage-explain")
-def triage_explain(request: VisitRequest):
-    print(f"Explaining prediction for visit {request.visit_id}")
+async def triage_explain(request: VisitRequest):
+    log.debug("Explaining prediction", extra={"visit_id": request.visit_id})
     
     # 1. Gather Data
-    prediction, vitals, symptoms, visit, patient = get_prediction_data(request.visit_id)
+    prediction, vitals, symptoms, visit, patient = await run_in_threadpool(get_prediction_data, request.visit_id)
 
-    # 2. Call LLM
-    explanation_result = explain_prediction(prediction, vitals, symptoms, visit, patient)
+    # 2. Call LLM (unless this exact prediction was explained already)
+    key = (request.visit_id, prediction.get("prediction_id"), prediction.get("model_version"), prediction.get("risk_score"))
+    explanation_result = explain_cache.get(key)
+    if explanation_result is not None:
+        EXPLAIN_CACHE.inc("hit")
+    else:
+        EXPLAIN_CACHE.inc("miss")
+        explanation_result = await run_in_threadpool(explain_prediction, prediction, vitals, symptoms, visit, patient)
+        if explanation_result.get("status") == "success":
+            explain_cache.set(key, explanation_result)
 
     # Unwrap the dictionary response
     if isinstance(explanation_result, dict) and "explanation" in explanation_result:
@@ -615,4 +1341,6 @@ def triage_explain(request: VisitRequest):
         "risk_score": prediction["risk_score"],
         "recommended_department": prediction["recommended_department"],
         "explanation": explanation_text
-    }
\ No newline at end of file
+    }
+
+warmup.mark_imported()
@@ -0,0 +1,19 @@
+-- Brings a database created from an older setup_database.sql up to date.
+-- Idempotent: safe to run on any version of the schema, including a fresh one.
+
+-- Primary + shadow routing
+ALTER TABLE department_queue ADD COLUMN IF NOT EXISTS routing_role VARCHAR(10) DEFAULT 'primary';
+CREATE INDEX IF NOT EXISTS idx_queue_prediction ON department_queue(prediction_id);
+
+-- Versioned scoring artifacts
+ALTER TABLE triage_predictions ADD COLUMN IF NOT EXISTS model_version VARCHAR(50);
+
+-- Active queue entries ranked within their department, as GET /queues/{dept}
+-- orders them; GET /queues reads the top of every department in one query.
+-- Recreated because q.* is expanded when the view is created.
+DROP VIEW IF EXISTS active_department_queue;
+CREATE VIEW active_department_queue AS
+SELECT q.*,
+       row_number() OVER (PARTITION BY q.dept_id ORDER BY q.priority_score DESC, q.queue_id) AS queue_rank
+FROM department_queue q
+WHERE q.status NOT IN ('completed', 'discharged');
@@ -0,0 +1,123 @@
+"""
+Micro-batching client for the external ML engine.
+
+Concurrent create_visit calls each ask for one visit to be scored. Instead
+of one POST per visit, requests are collected for up to ML_BATCH_MAX_WAIT_MS
+(or until ML_BATCH_MAX_SIZE visits are waiting) and sent as a single call
+to the engine's batch endpoint; each caller then gets its own result back.
+
+Settings (environment):
+    ML_ENGINE_URL          Base URL of the ML engine
+    ML_BATCH_ENABLED       "1" to use the batch endpoint, otherwise one POST per visit
+    ML_BATCH_MAX_SIZE      Flush as soon as this many visits are waiting (default 16)
+    ML_BATCH_MAX_WAIT_MS   Flush at most this long after the first visit arrives (default 5)
+    ML_TIMEOUT_SECONDS     Per-request timeout (default 60, covers cold starts)
+
+Batch protocol: POST {"visit_ids": [...]} to /api/v1/process_visits_batch,
+response {"results": [{"visit_id": ..., <process_visit fields>}, ...]}.
+`ml_stub.py` serves both endpoints locally for testing.
+"""
+import asyncio
+import os
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import httpx
+
+DEFAULT_ENGINE_URL = "https://ml-backend-engine-kanini.onrender.com"
+SINGLE_PATH = "/api/v1/process_visit"
+BATCH_PATH = "/api/v1/process_visits_batch"
+
+
+class MLMicroBatcher:
+    def __init__(
+        self,
+        base_url: str = DEFAULT_ENGINE_URL,
+        enabled: bool = False,
+        max_batch_size: int = 16,
+        max_wait_ms: float = 5.0,
+        timeout: float = 60.0,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.enabled = enabled
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000
+        self.timeout = timeout
+        self._client: Optional[httpx.AsyncClient] = None
+        self._pending: List[Tuple[int, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._in_flight: Set[asyncio.Task] = set()  # Strong references: the loop only keeps weak ones
+        self.stats = {"requests": 0, "batches": 0, "visits_batched": 0, "errors": 0}
+
+    @classmethod
+    def from_env(cls) -> "MLMicroBatcher":
+        return cls(
+            base_url=os.getenv("ML_ENGINE_URL", DEFAULT_ENGINE_URL),
+            enabled=os.getenv("ML_BATCH_ENABLED", "0") == "1",
+            max_batch_size=int(os.getenv("ML_BATCH_MAX_SIZE", "16")),
+            max_wait_ms=float(os.getenv("ML_BATCH_MAX_WAIT_MS", "5")),
+            timeout=float(os.getenv("ML_TIMEOUT_SECONDS", "60")),
+        )
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # One pooled client for all calls: keeps connections to the engine warm
+        if self._client is None:
+            self._client = httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout)
+        return self._client
+
+    async def close(self):
+        """Send anything still waiting, let in-flight batches finish, then close the connections"""
+        self._flush()
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def score(self, visit_id: int) -> Dict[str, Any]:
+        """Score one visit; raises on HTTP errors or a missing result."""
+        self.stats["requests"] += 1
+        if not self.enabled:
+            response = await self.client.post(SINGLE_PATH, json={"visit_id": visit_id})
+            response.raise_for_status()
+            return response.json()
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((visit_id, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._send(batch))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    async def _send(self, batch: List[Tuple[int, asyncio.Future]]):
+        self.stats["batches"] += 1
+        self.stats["visits_batched"] += len(batch)
+        try:
+            response = await self.client.post(BATCH_PATH, json={"visit_ids": [vid for vid, _ in batch]})
+            response.raise_for_status()
+            results = {r["visit_id"]: r for r in response.json()["results"]}
+        except Exception as e:
+            self.stats["errors"] += 1
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for visit_id, future in batch:
+            if future.done():
+                continue  # Caller gave up (cancelled)
+            if visit_id in results:
+                future.set_result(results[visit_id])
+            else:
+                future.set_exception(ValueError(f"ML batch response missing visit {visit_id}"))
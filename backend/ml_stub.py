@@ -0,0 +1,83 @@
+"""
+Local stand-in for the external ML engine.
+
+Serves the single-visit and batch scoring endpoints with deterministic,
+made-up results (derived from the visit_id) so the backend's ML client and
+micro-batcher can be exercised without the hosted service:
+
+    python -m uvicorn ml_stub:app --port 8001
+    ML_ENGINE_URL=http://localhost:8001 ML_BATCH_ENABLED=1 python -m uvicorn main:app --port 8000
+
+Latency, errors and cold starts are injected from ML_STUB_* (see
+stub_latency.py), e.g. to mimic a hosted instance that spins down:
+
+    ML_STUB_LATENCY=lognormal:250:150 ML_STUB_ERROR_RATE=0.01 \
+    ML_STUB_COLD_START_MS=30000 ML_STUB_IDLE_SECONDS=900 python -m uvicorn ml_stub:app --port 8001
+
+A batch call costs one latency sample plus ML_STUB_PER_VISIT_MS per visit.
+"""
+import asyncio
+import os
+import random
+from typing import List
+
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel
+
+from stub_latency import LatencyProfile
+
+app = FastAPI(title="ML Engine Stub")
+profile = LatencyProfile.from_env("ML_STUB")
+PER_VISIT_MS = float(os.getenv("ML_STUB_PER_VISIT_MS", "0"))
+
+DEPARTMENTS = ["Emergency", "Cardiology", "Respiratory", "Neurology", "General Medicine", "Orthopedics"]
+
+
+class VisitRef(BaseModel):
+    visit_id: int
+
+
+class VisitBatch(BaseModel):
+    visit_ids: List[int]
+
+
+def fake_prediction(visit_id: int):
+    rng = random.Random(visit_id)
+    dept_scores = {d: round(rng.uniform(0.05, 0.9), 2) for d in DEPARTMENTS}
+    primary = max(dept_scores, key=dept_scores.get)
+    risk_score = round(rng.uniform(0.1, 0.95), 2)
+    if risk_score > 0.70: risk_level = "High"
+    elif risk_score > 0.40: risk_level = "Medium"
+    else: risk_level = "Low"
+
+    return {
+        "visit_id": visit_id,
+        "risk_level": risk_level,
+        "risk_score": risk_score,
+        "primary_department": primary,
+        "department_scores": dept_scores,
+        "explainability": {"stub": 1.0},
+    }
+
+
+async def simulate_work(visits: int = 1):
+    await asyncio.sleep(profile.delay_seconds() + PER_VISIT_MS * max(0, visits - 1) / 1000)
+    if profile.fails():
+        raise HTTPException(status_code=503, detail="Injected ML engine error")
+
+
+@app.get("/stub/profile")
+async def get_profile():
+    return profile.describe()
+
+
+@app.post("/api/v1/process_visit")
+async def process_visit(req: VisitRef):
+    await simulate_work()
+    return fake_prediction(req.visit_id)
+
+
+@app.post("/api/v1/process_visits_batch")
+async def process_visits_batch(req: VisitBatch):
+    await simulate_work(len(req.visit_ids))
+    return {"results": [fake_prediction(vid) for vid in req.visit_ids]}
@@ -0,0 +1,133 @@
+"""
+Versioned scoring artifacts with hot reload.
+
+The scorers a running process uses - the embedded model and the rule set -
+are loaded from versioned artifacts and held in one immutable snapshot.
+Reloading builds a complete new snapshot first and then swaps a single
+reference, so an in-flight request keeps the snapshot it started with
+and never sees a half-loaded model.
+
+Layout:
+    models/<version>/...     see triage_model.py (arrays are memory-mapped)
+    models/CURRENT           model version to serve
+    rules/<version>.json     rule set in the shape of scoring.DEFAULT_RULES
+    rules/CURRENT            rule set version to serve
+
+Without rules/CURRENT the built-in DEFAULT_RULES are used; without
+models/CURRENT there is no embedded model.
+"""
+import asyncio
+import json
+import logging
+import os
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from scoring import DEFAULT_RULES
+from triage_model import TriageModel
+
+log = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ScoringSnapshot:
+    model: Optional[TriageModel]
+    rules: Dict[str, Any]
+
+    @property
+    def versions(self) -> Dict[str, Optional[str]]:
+        return {
+            "model": self.model.version if self.model else None,
+            "rules": self.rules["version"],
+        }
+
+
+def _read_pointer(directory: str) -> Optional[str]:
+    pointer = os.path.join(directory, "CURRENT")
+    if not os.path.exists(pointer):
+        return None
+    with open(pointer) as f:
+        return f.read().strip() or None
+
+
+def _write_pointer(directory: str, version: str):
+    # Write-then-rename so a watcher never reads a half-written pointer
+    tmp = os.path.join(directory, "CURRENT.tmp")
+    with open(tmp, "w") as f:
+        f.write(version)
+    os.replace(tmp, os.path.join(directory, "CURRENT"))
+
+
+def load_rules(rules_dir: str, version: str) -> Dict[str, Any]:
+    with open(os.path.join(rules_dir, f"{version}.json")) as f:
+        rules = json.load(f)
+    missing = [k for k in DEFAULT_RULES if k not in rules]
+    if missing:
+        raise ValueError(f"Rule set {version} is missing {missing}")
+    if rules["version"] != version:
+        raise ValueError(f"Rule set file {version}.json declares version {rules['version']}")
+    return rules
+
+
+class ScoringRegistry:
+    def __init__(self, models_dir: str, rules_dir: str, use_model: bool = True):
+        self.models_dir = models_dir
+        self.rules_dir = rules_dir
+        self.use_model = use_model
+        self.active = ScoringSnapshot(model=None, rules=DEFAULT_RULES)
+        self.listeners: List[Callable[[ScoringSnapshot], None]] = []
+        self._pointer_mtimes: Dict[str, float] = {}
+
+    def on_swap(self, listener: Callable[[ScoringSnapshot], None]):
+        """Call listener(snapshot) after every successful swap"""
+        self.listeners.append(listener)
+
+    def reload(self, model_version: Optional[str] = None, rules_version: Optional[str] = None) -> ScoringSnapshot:
+        """
+        Load the requested versions (default: whatever CURRENT points at) and
+        swap them in. Explicit versions are also written to CURRENT so other
+        workers watching the directory follow. Raises without swapping if
+        anything fails to load, or if a model is requested while this
+        registry serves rules only (use_model=False).
+        """
+        if model_version and not self.use_model:
+            raise ValueError(f"Model {model_version} requested, but this registry does not serve an embedded model")
+        model_version = model_version or (_read_pointer(self.models_dir) if self.use_model else None)
+        rules_version = rules_version or _read_pointer(self.rules_dir)
+
+        model = TriageModel.load(os.path.join(self.models_dir, model_version), mmap=True) if model_version else None
+        rules = load_rules(self.rules_dir, rules_version) if rules_version else DEFAULT_RULES
+
+        if model_version and model_version != _read_pointer(self.models_dir):
+            _write_pointer(self.models_dir, model_version)
+        if rules_version and rules_version != _read_pointer(self.rules_dir):
+            _write_pointer(self.rules_dir, rules_version)
+
+        snapshot = ScoringSnapshot(model=model, rules=rules)
+        self.active = snapshot
+        self._pointer_mtimes = self._current_mtimes()
+        for listener in self.listeners:
+            listener(snapshot)
+        return snapshot
+
+    def _current_mtimes(self) -> Dict[str, float]:
+        mtimes = {}
+        for directory in (self.models_dir, self.rules_dir):
+            pointer = os.path.join(directory, "CURRENT")
+            if os.path.exists(pointer):
+                mtimes[pointer] = os.path.getmtime(pointer)
+        return mtimes
+
+    async def watch(self, interval_seconds: float):
+        """Poll the CURRENT pointers and reload when either changes"""
+        while True:
+            await asyncio.sleep(interval_seconds)
+            if self._current_mtimes() == self._pointer_mtimes:
+                continue
+            try:
+                snapshot = self.reload()
+                log.info("Scoring artifacts reloaded", extra={"versions": snapshot.versions})
+            except Exception as e:
+                # Keep serving the previous snapshot; retry on the next change
+                self._pointer_mtimes = self._current_mtimes()
+                log.error(f"Scoring artifact reload failed: {e}")
@@ -1,13 +1,12 @@
 
-import os
 import random
-from supabase import create_client, Client
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
+from db import create_db_client
 
 load_dotenv()
 
-supabase: Client = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"))
+supabase = create_db_client()
 
 # --- CONSTANTS ---
 FIRST_NAMES_MALE = ['James', 'John', 'Robert', 'Michael', 'William', 'David', 'Richard', 'Joseph', 'Thomas', 'Charles']
@@ -0,0 +1,66 @@
+"""
+Deterministic pre-triage.
+
+Red-flag checks on the vitals and symptoms submitted with a visit. They run
+before any ML scoring so the sickest patients are queued to Emergency
+immediately, no matter how slow the ML engine is. Pure Python with no I/O:
+a check costs a few microseconds.
+"""
+from typing import List
+
+PRETRIAGE_VERSION = "pretriage-1"  # Recorded on provisional predictions
+FAST_PATH_DEPARTMENT = "Emergency"
+FAST_PATH_PRIORITY = 3.0  # Above any score the ML engine or rules can produce
+
+# Vitals thresholds (temperature in Fahrenheit, as entered at the desk)
+SYSTOLIC_HIGH = 180
+SYSTOLIC_LOW = 90
+DIASTOLIC_HIGH = 120
+HEART_RATE_HIGH = 130
+HEART_RATE_LOW = 40
+TEMPERATURE_HIGH = 104.0
+TEMPERATURE_LOW = 95.0  # Strictly below: 95.0 is the intake form's minimum
+
+# Symptoms that are red flags at any severity
+CRITICAL_SYMPTOMS = [
+    "unconscious", "unresponsive", "not breathing", "seizure", "stroke",
+    "anaphylaxis", "severe bleeding", "cardiac arrest", "overdose",
+    "thunderclap headache", "worst headache",
+]
+# Symptoms that are red flags at maximum severity. An ordinary headache is
+# not, however bad: only the sudden/worst-ever kind above skips scoring.
+SEVERE_SYMPTOMS = ["chest pain", "shortness of breath", "breathing"]
+MAX_SEVERITY = 5  # severity_score is 1-5 (visit_symptoms CHECK; the API rejects anything else)
+
+
+def check_red_flags(visit) -> List[str]:
+    """
+    Return the red flags present in a VisitInput (empty list if none).
+    """
+    flags = []
+
+    if visit.bp_systolic >= SYSTOLIC_HIGH:
+        flags.append(f"Systolic BP {visit.bp_systolic}")
+    elif visit.bp_systolic <= SYSTOLIC_LOW:
+        flags.append(f"Hypotension {visit.bp_systolic}")
+    if visit.bp_diastolic >= DIASTOLIC_HIGH:
+        flags.append(f"Diastolic BP {visit.bp_diastolic}")
+
+    if visit.heart_rate >= HEART_RATE_HIGH:
+        flags.append(f"Heart rate {visit.heart_rate}")
+    elif visit.heart_rate <= HEART_RATE_LOW:
+        flags.append(f"Bradycardia {visit.heart_rate}")
+
+    if visit.temperature >= TEMPERATURE_HIGH:
+        flags.append(f"Temperature {visit.temperature}")
+    elif visit.temperature < TEMPERATURE_LOW:
+        flags.append(f"Hypothermia {visit.temperature}")
+
+    for s in visit.symptoms:
+        name = s.symptom_name.lower()
+        if any(k in name for k in CRITICAL_SYMPTOMS):
+            flags.append(f"Sx: {name}")
+        elif s.severity_score == MAX_SEVERITY and any(k in name for k in SEVERE_SYMPTOMS):
+            flags.append(f"Sx: {name} (severity {s.severity_score})")
+
+    return flags
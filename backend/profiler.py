@@ -0,0 +1,148 @@
+"""
+On-demand sampling profiler.
+
+A background thread snapshots every thread's Python stack with
+sys._current_frames() at a fixed interval and counts identical stacks. The
+result is in collapsed-stack format, one `frame;frame;frame count` line per
+stack, which flamegraph.pl, speedscope and inferno all read directly:
+
+    curl -s -X POST -H "X-Admin-Token: $ADMIN_TOKEN" \\
+        "localhost:8000/admin/profile?seconds=15" > triage.folded
+    flamegraph.pl triage.folded > triage.svg
+
+A session either runs for a number of seconds, or until a number of
+requests matching a route have completed. In the request mode, samples are
+only kept while at least one matching request is in flight.
+
+Nothing runs while no session is active: there is no sampler thread, and
+the request hook is a single attribute check. Only this process is
+sampled. Work done in the scoring process pool shows up as the thread
+waiting on it.
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+PROFILER_INTERVAL_MS = float(os.getenv("PROFILER_INTERVAL_MS", "5"))
+PROFILER_MAX_SECONDS = float(os.getenv("PROFILER_MAX_SECONDS", "120"))
+
+# Leaf frames of threads that are parked rather than working
+IDLE_LEAVES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),  # concurrent.futures workers blocked on their SimpleQueue
+}
+
+
+class ProfilerBusy(Exception):
+    pass
+
+
+def frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)})"
+
+
+class ProfileSession:
+    def __init__(self, interval: float, route: Optional[str] = None, requests: Optional[int] = None,
+                 include_idle: bool = False):
+        self.interval = interval
+        self.route = route
+        self.requests = requests
+        self.include_idle = include_idle
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.completed_requests = 0
+        self.in_flight = 0
+        self.started_at = time.monotonic()
+        self.finished = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+
+    @property
+    def duration(self) -> float:
+        return time.monotonic() - self.started_at
+
+    def matches(self, path: str) -> bool:
+        return self.route is None or path == self.route or (self.route.endswith("*") and path.startswith(self.route[:-1]))
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self.finished.wait(self.interval):
+            if self.requests is not None and self.in_flight == 0:
+                continue
+            self.sample(own)
+
+    def sample(self, skip_ident: int):
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == skip_ident:
+                continue
+            code = frame.f_code
+            if not self.include_idle and (os.path.basename(code.co_filename), code.co_name) in IDLE_LEAVES:
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(frame_label(frame.f_code))
+                frame = frame.f_back
+            labels.append(names.get(ident, f"thread-{ident}"))
+            self.stacks[";".join(reversed(labels))] += 1
+        self.samples += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {n}\n" for stack, n in self.stacks.most_common())
+
+
+class SamplingProfiler:
+    """One session at a time per process"""
+
+    def __init__(self):
+        self.session: Optional[ProfileSession] = None
+        self._done: Optional[asyncio.Event] = None
+
+    async def run(self, seconds: Optional[float] = None, route: Optional[str] = None,
+                  requests: Optional[int] = None, interval_ms: float = PROFILER_INTERVAL_MS,
+                  include_idle: bool = False) -> ProfileSession:
+        """
+        Sample for `seconds`, or until `requests` requests matching `route`
+        finish (capped at PROFILER_MAX_SECONDS either way).
+        """
+        if self.session is not None:
+            raise ProfilerBusy("A profiling session is already running")
+        timeout = min(seconds or PROFILER_MAX_SECONDS, PROFILER_MAX_SECONDS)
+        session = ProfileSession(max(interval_ms, 1.0) / 1000, route=route, requests=requests, include_idle=include_idle)
+        self.session, self._done = session, asyncio.Event()
+        session._thread.start()
+        try:
+            if requests is None:
+                await asyncio.sleep(timeout)
+            else:
+                try:
+                    await asyncio.wait_for(self._done.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            session.finished.set()
+            self.session = self._done = None
+            await asyncio.to_thread(session._thread.join)
+        return session
+
+    def request_started(self, path: str) -> Optional[ProfileSession]:
+        """Called by the request hook; returns the session tracking this request, if any"""
+        session = self.session
+        if session is None or session.requests is None or not session.matches(path):
+            return None
+        session.in_flight += 1
+        return session
+
+    def request_finished(self, session: ProfileSession):
+        session.in_flight -= 1
+        session.completed_requests += 1
+        if session is self.session and session.completed_requests >= session.requests:
+            self._done.set()
+
+
+profiler = SamplingProfiler()
@@ -0,0 +1,162 @@
+"""
+Live queue positions.
+
+Keeps an order-statistics index per department so "you are #N in the
+queue" is answered in O(log n) without re-sorting the queue. Entries are
+ordered the same way GET /queues/{dept} orders them: highest priority
+first, ties broken by queue_id (earlier arrivals first).
+
+Priorities are quantized into fixed-width buckets and counted with a
+Fenwick tree; entries that share a bucket are kept in a small list sorted
+by (-priority, queue_id), so the exact priority still decides order
+within a bucket.
+Only pending entries are indexed - a patient who has been claimed is no
+longer waiting.
+"""
+import threading
+from bisect import bisect_left, insort
+from typing import Callable, Dict, List, Optional, Tuple
+
+PRIORITY_RESOLUTION = 1000  # Buckets per 1.0 of priority_score
+MAX_PRIORITY = 4.0          # Scores above this share the top bucket
+
+
+class FenwickTree:
+    def __init__(self, size: int):
+        self.size = size
+        self.tree = [0] * (size + 1)
+
+    def add(self, index: int, delta: int):
+        i = index + 1
+        while i <= self.size:
+            self.tree[i] += delta
+            i += i & -i
+
+    def prefix_sum(self, index: int) -> int:
+        """Sum of counts in buckets [0, index]"""
+        total = 0
+        i = index + 1
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+
+class DepartmentPositions:
+    def __init__(self):
+        self.top_bucket = int(MAX_PRIORITY * PRIORITY_RESOLUTION)
+        self.counts = FenwickTree(self.top_bucket + 1)
+        self.buckets: Dict[int, List[Tuple[float, int]]] = {}  # bucket -> sorted (-priority, queue_id)
+        self.entries: Dict[int, Tuple[int, Tuple[float, int]]] = {}  # queue_id -> (bucket, sort key)
+
+    def _bucket(self, priority: float) -> int:
+        # Bucket 0 holds the highest priorities so prefix sums count "ahead of"
+        q = int(round(min(max(priority or 0.0, 0.0), MAX_PRIORITY) * PRIORITY_RESOLUTION))
+        return self.top_bucket - q
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def insert(self, queue_id: int, priority: float):
+        if queue_id in self.entries:
+            self.remove(queue_id)
+        b = self._bucket(priority)
+        key = (-(priority or 0.0), queue_id)
+        insort(self.buckets.setdefault(b, []), key)
+        self.entries[queue_id] = (b, key)
+        self.counts.add(b, 1)
+
+    def remove(self, queue_id: int):
+        entry = self.entries.pop(queue_id, None)
+        if entry is None:
+            return
+        b, key = entry
+        members = self.buckets[b]
+        del members[bisect_left(members, key)]
+        if not members:
+            del self.buckets[b]
+        self.counts.add(b, -1)
+
+    def position(self, queue_id: int) -> Optional[int]:
+        """1-based position among waiting patients, or None if not waiting"""
+        entry = self.entries.get(queue_id)
+        if entry is None:
+            return None
+        b, key = entry
+        ahead = self.counts.prefix_sum(b - 1) if b > 0 else 0
+        return ahead + bisect_left(self.buckets[b], key) + 1
+
+
+class QueuePositionIndex:
+    """
+    Position indexes for all departments.
+
+    A department is loaded from the database the first time it is queried
+    (`loader(dept_id)` returns its pending rows); after that it is kept up to
+    date by the insert/remove hooks called from the queue write paths.
+
+    Loads may run in a worker thread while the hooks run on the event loop.
+    Hooks that arrive while a department is loading are recorded and replayed
+    onto the loaded index before it is installed, so a row written between
+    the loader's query and the install is not lost. A load that overlaps an
+    invalidate() is returned but not installed.
+    """
+
+    def __init__(self, loader: Callable[[int], List[Dict]]):
+        self.loader = loader
+        self.departments: Dict[int, DepartmentPositions] = {}
+        self._loading: Dict[int, List[List[Tuple]]] = {}  # dept_id -> hooks seen by each load in progress
+        self._generation = 0  # Bumped by invalidate()
+        self._lock = threading.Lock()
+
+    def department(self, dept_id: int) -> DepartmentPositions:
+        positions = self.departments.get(dept_id)
+        if positions is not None:
+            return positions
+
+        missed: List[Tuple] = []
+        with self._lock:
+            generation = self._generation
+            self._loading.setdefault(dept_id, []).append(missed)
+        try:
+            positions = DepartmentPositions()
+            for row in self.loader(dept_id):
+                positions.insert(row["queue_id"], row["priority_score"])
+        finally:
+            with self._lock:
+                self._loading[dept_id].remove(missed)
+                if not self._loading[dept_id]:
+                    del self._loading[dept_id]
+
+        with self._lock:
+            for op, *args in missed:
+                getattr(positions, op)(*args)
+            if generation != self._generation:
+                return positions
+            return self.departments.setdefault(dept_id, positions)
+
+    def on_insert(self, dept_id: int, queue_id: int, priority: float):
+        # Departments that haven't been loaded yet will pick the row up from the DB
+        with self._lock:
+            if dept_id in self.departments:
+                self.departments[dept_id].insert(queue_id, priority)
+            for missed in self._loading.get(dept_id, ()):
+                missed.append(("insert", queue_id, priority))
+
+    def on_remove(self, dept_id: int, queue_id: int):
+        with self._lock:
+            if dept_id in self.departments:
+                self.departments[dept_id].remove(queue_id)
+            for missed in self._loading.get(dept_id, ()):
+                missed.append(("remove", queue_id))
+
+    def position(self, dept_id: int, queue_id: int) -> Optional[int]:
+        return self.department(dept_id).position(queue_id)
+
+    def invalidate(self, dept_id: Optional[int] = None):
+        with self._lock:
+            self._generation += 1
+            if dept_id is None:
+                self.departments.clear()
+            else:
+                self.departments.pop(dept_id, None)
@@ -0,0 +1,26 @@
+#!/bin/bash
+# Runs once, when the primary's data directory is first initialised
+set -e
+
+psql -v ON_ERROR_STOP=1 --username "$POSTGRES_USER" --dbname "$POSTGRES_DB" <<-SQL
+    CREATE ROLE replicator WITH REPLICATION LOGIN PASSWORD '${REPLICATION_PASSWORD}';
+    CREATE ROLE anon NOLOGIN;
+SQL
+echo "host replication replicator all scram-sha-256" >> "$PGDATA/pg_hba.conf"
+
+psql -v ON_ERROR_STOP=1 --username "$POSTGRES_USER" --dbname "$POSTGRES_DB" -f /sql/setup_database.sql
+psql -v ON_ERROR_STOP=1 --username "$POSTGRES_USER" --dbname "$POSTGRES_DB" -f /sql/setup_change_notifications.sql
+
+# PostgREST serves every request as `anon` (no JWT in the local stack)
+psql -v ON_ERROR_STOP=1 --username "$POSTGRES_USER" --dbname "$POSTGRES_DB" <<-SQL
+    GRANT USAGE ON SCHEMA public TO anon;
+    GRANT ALL ON ALL TABLES IN SCHEMA public TO anon;
+    GRANT ALL ON ALL SEQUENCES IN SCHEMA public TO anon;
+    INSERT INTO departments (dept_name, specialty_description) VALUES
+        ('Emergency', 'Acute care for critical conditions'),
+        ('Cardiology', 'Heart and vascular system disorders'),
+        ('Respiratory', 'Lung and respiratory tract diseases'),
+        ('Neurology', 'Nervous system disorders'),
+        ('General Medicine', 'Adult primary care and internal medicine'),
+        ('Orthopedics', 'Musculoskeletal system care');
+SQL
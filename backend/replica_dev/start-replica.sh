@@ -0,0 +1,14 @@
+#!/bin/bash
+# Streaming replica of db-primary: clone it on first start, then run as a hot standby
+set -e
+
+until pg_isready -h db-primary -U replicator; do sleep 1; done
+
+if [ ! -s "$PGDATA/PG_VERSION" ]; then
+    rm -rf "$PGDATA"/*
+    PGPASSWORD="$REPLICATION_PASSWORD" pg_basebackup -h db-primary -U replicator -D "$PGDATA" -R -X stream -c fast
+    chown -R postgres:postgres "$PGDATA"
+    chmod 700 "$PGDATA"
+fi
+
+exec gosu postgres postgres -c hot_standby=on
@@ -0,0 +1,193 @@
+"""
+Load-aware queue routing.
+
+Decides which department queues a triaged patient is placed in. The ML
+department scores say where a patient *could* be seen; this module combines
+them with each department's current backlog and a rolling estimate of how
+fast it is discharging patients, so the patient is reserved in the queue
+where they are likely to reach a clinician first.
+
+One department gets the patient as its PRIMARY entry. A few other suitable
+departments get a SHADOW entry so they can pick the patient up if they free
+up first; shadows are removed as soon as any department claims the patient.
+"""
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Deque, Dict, List, Optional
+
+QUEUE_THRESHOLD = 0.35       # Minimum department score to be considered at all
+PRIMARY_MARGIN = 0.75        # Departments scoring >= 75% of the best are clinically interchangeable
+MAX_SHADOWS = 2              # At most this many extra queues per patient
+SHADOW_PRIORITY_FACTOR = 0.9 # Shadows rank slightly below the department's own primaries
+SERVICE_WINDOW_SECONDS = 1800
+DEFAULT_SERVICE_RATE = 0.1   # Patients per minute assumed before we have observations
+PRIOR_MINUTES = 10.0         # Weight of the default rate in the rolling estimate
+RESYNC_SECONDS = 60
+
+
+@dataclass
+class RouteTarget:
+    dept_name: str
+    dept_id: int
+    priority_score: float
+    role: str  # "primary" or "shadow"
+    expected_wait: float  # minutes
+
+
+class DepartmentLoadTracker:
+    """
+    Per-department backlog and service-rate estimates.
+
+    Depth is seeded from the database and then adjusted in-process on every
+    enqueue/dequeue; a periodic resync corrects any drift. Service rate is
+    the number of patients served in the last SERVICE_WINDOW_SECONDS, blended
+    with DEFAULT_SERVICE_RATE so a quiet department doesn't look infinitely slow.
+    The oldest pending entry's add time is taken from the same resync, so it
+    can lag by up to RESYNC_SECONDS once that patient has been served.
+    """
+
+    def __init__(self):
+        self.depth: Dict[int, int] = {}
+        self.oldest_added: Dict[int, float] = {}
+        self.served: Dict[int, Deque[float]] = {}
+        self.started_at = time.time()
+        self.synced_at = 0.0
+
+    def needs_sync(self) -> bool:
+        return time.time() - self.synced_at > RESYNC_SECONDS
+
+    def sync(self, pending_rows: List[Dict]):
+        """Reset depths from a list of pending department_queue rows."""
+        depth: Dict[int, int] = {}
+        oldest: Dict[int, float] = {}
+        now = time.time()
+        for row in pending_rows:
+            depth[row["dept_id"]] = depth.get(row["dept_id"], 0) + 1
+            added = _epoch(row.get("added_timestamp")) or now
+            oldest[row["dept_id"]] = min(oldest.get(row["dept_id"], now), added)
+        self.depth = depth
+        self.oldest_added = oldest
+        self.synced_at = now
+
+    def invalidate(self):
+        """Force a resync before the next routing decision (e.g. after another worker's write)"""
+        self.synced_at = 0.0
+
+    def on_enqueue(self, dept_id: int):
+        self.depth[dept_id] = self.depth.get(dept_id, 0) + 1
+        self.oldest_added.setdefault(dept_id, time.time())
+
+    def on_dequeue(self, dept_id: int):
+        self.depth[dept_id] = max(self.depth.get(dept_id, 0) - 1, 0)
+        if not self.depth[dept_id]:
+            self.oldest_added.pop(dept_id, None)
+
+    def on_served(self, dept_id: int):
+        self.served.setdefault(dept_id, deque()).append(time.time())
+
+    def service_rate(self, dept_id: int) -> float:
+        """Rolling patients-per-minute estimate for a department."""
+        now = time.time()
+        window = self.served.get(dept_id)
+        count = 0
+        if window:
+            while window and now - window[0] > SERVICE_WINDOW_SECONDS:
+                window.popleft()
+            count = len(window)
+        observed_minutes = min(now - self.started_at, SERVICE_WINDOW_SECONDS) / 60
+        return (count + DEFAULT_SERVICE_RATE * PRIOR_MINUTES) / (observed_minutes + PRIOR_MINUTES)
+
+    def oldest_wait(self, dept_id: int) -> float:
+        """Seconds the longest-waiting pending patient has been queued."""
+        added = self.oldest_added.get(dept_id)
+        return max(time.time() - added, 0.0) if added is not None else 0.0
+
+    def expected_wait(self, dept_id: int) -> float:
+        """Minutes until a newly queued patient would be seen."""
+        return self.depth.get(dept_id, 0) / self.service_rate(dept_id)
+
+    def snapshot(self, dept_ids: Dict[str, int]) -> Dict[str, Dict[str, float]]:
+        return {
+            name: {
+                "pending": self.depth.get(d_id, 0),
+                "service_rate_per_min": round(self.service_rate(d_id), 3),
+                "expected_wait_min": round(self.expected_wait(d_id), 1),
+            }
+            for name, d_id in dept_ids.items()
+        }
+
+
+def _epoch(ts: Optional[str]) -> Optional[float]:
+    if not ts:
+        return None
+    added = datetime.fromisoformat(ts.replace("Z", "+00:00"))
+    if added.tzinfo is None:
+        added = added.replace(tzinfo=timezone.utc)
+    return added.timestamp()
+
+
+def plan_routing(
+    dept_scores: Dict[str, float],
+    recommended_dept: str,
+    dept_ids: Dict[str, int],
+    load: DepartmentLoadTracker,
+    fallback_score: Optional[float] = None,
+    reserved_primary: Optional[str] = None,
+) -> List[RouteTarget]:
+    """
+    Choose the primary queue and shadow queues for one prediction.
+
+    Among departments whose score is close to the best (PRIMARY_MARGIN), the
+    one with the shortest expected wait becomes the primary. Remaining
+    departments above QUEUE_THRESHOLD become shadows, best score first, but
+    only if they are expected to be no slower than the primary.
+
+    If `reserved_primary` is given the patient already holds a primary entry
+    there (e.g. from the red-flag fast path, ahead of everyone else); only
+    shadows are returned, and the primary's backlog doesn't limit them.
+    """
+    candidates = [
+        (dept, score) for dept, score in dept_scores.items()
+        if score >= QUEUE_THRESHOLD and dept in dept_ids
+    ]
+
+    if reserved_primary is not None:
+        return _plan_shadows(candidates, reserved_primary, float("inf"), dept_ids, load, MAX_SHADOWS)
+
+    if not candidates:
+        # Safety fallback: queue to the recommended department, or Emergency
+        dept = recommended_dept if recommended_dept in dept_ids else "Emergency"
+        if dept not in dept_ids:
+            return []
+        score = dept_scores.get(dept, fallback_score if fallback_score is not None else 0.0)
+        return [RouteTarget(dept, dept_ids[dept], score, "primary", load.expected_wait(dept_ids[dept]))]
+
+    best_score = max(score for _, score in candidates)
+    eligible = [(dept, score) for dept, score in candidates if score >= best_score * PRIMARY_MARGIN]
+    primary_dept, primary_score = min(
+        eligible,
+        key=lambda item: (load.expected_wait(dept_ids[item[0]]), -item[1]),
+    )
+    primary_wait = load.expected_wait(dept_ids[primary_dept])
+    targets = [RouteTarget(primary_dept, dept_ids[primary_dept], primary_score, "primary", primary_wait)]
+
+    return targets + _plan_shadows(candidates, primary_dept, primary_wait, dept_ids, load, MAX_SHADOWS)
+
+
+def _plan_shadows(candidates, primary_dept, primary_wait, dept_ids, load, limit) -> List[RouteTarget]:
+    others = sorted(
+        (item for item in candidates if item[0] != primary_dept),
+        key=lambda item: item[1],
+        reverse=True,
+    )
+    shadows = []
+    for dept, score in others:
+        if len(shadows) >= limit:
+            break
+        wait = load.expected_wait(dept_ids[dept])
+        if wait > primary_wait:
+            continue
+        shadows.append(RouteTarget(dept, dept_ids[dept], round(score * SHADOW_PRIORITY_FACTOR, 4), "shadow", wait))
+    return shadows
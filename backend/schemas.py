@@ -0,0 +1,90 @@
+"""
+Response models and the fast JSON response for the polling endpoints.
+
+The models document the payloads (OpenAPI, typed clients). The hot
+endpoints return FastJSONResponse directly, which skips FastAPI's
+jsonable_encoder + stdlib json path and per-response model validation:
+rows come straight from PostgREST, so they are already JSON-shaped.
+Timestamps stay as the strings PostgREST returns. Queue rows come from
+`select *`, so extra columns are allowed.
+"""
+from typing import Any, Dict, List, Optional
+
+import pydantic_core
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, ConfigDict
+
+try:
+    import orjson
+except ImportError:  # Optional: pydantic-core's encoder is nearly as fast
+    orjson = None
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON via orjson when installed, else pydantic-core"""
+
+    def render(self, content: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+        return pydantic_core.to_json(content)
+
+
+class PassThrough(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+
+class QueuePatient(PassThrough):
+    full_name: Optional[str] = None
+    age: Optional[int] = None
+    gender: Optional[str] = None
+    contact_info: Optional[str] = None
+
+
+class QueueVisit(PassThrough):
+    visit_id: int
+    visit_timestamp: Optional[str] = None
+    chief_complaint: Optional[str] = None
+    patients: QueuePatient
+
+
+class QueuePrediction(PassThrough):
+    risk_score: Optional[float] = None
+    risk_level: Optional[str] = None
+    patient_visits: QueueVisit
+
+
+class QueueEntry(PassThrough):
+    queue_id: int
+    prediction_id: Optional[int] = None
+    dept_id: Optional[int] = None
+    priority_score: Optional[float] = None
+    queue_position: Optional[int] = None
+    routing_role: Optional[str] = None
+    status: Optional[str] = None
+    added_timestamp: Optional[str] = None
+    triage_predictions: QueuePrediction
+
+
+class QueueResponse(BaseModel):
+    queue: List[QueueEntry]
+
+
+class AllQueuesResponse(BaseModel):
+    queues: Dict[str, List[QueueEntry]]
+
+
+class QueueChangesResponse(BaseModel):
+    version: str
+    full_resync: bool
+    queue: Optional[List[QueueEntry]] = None  # Full resync only
+    upserted: Optional[List[QueueEntry]] = None
+    removed: Optional[List[int]] = None
+
+
+class DashboardStats(BaseModel):
+    total_patients: Optional[int] = None
+    active_visits: int
+    high_risk_patients: int
+    medium_risk_patients: int
+    low_risk_patients: int
+    avg_wait_time: int
@@ -0,0 +1,180 @@
+"""
+Triage scoring features and local rules.
+
+Visits are reduced to a small canonical feature record (age band, vitals
+bands, symptom set, history flags). The local rule engine scores from that
+record only, so two visits with the same features always get the same
+result - which is what lets the scoring cache key on feature_signature().
+
+The rule weights are data (DEFAULT_RULES, or a versioned rule-set file
+loaded by model_registry.py), so they can change without a code deploy.
+"""
+import hashlib
+import json
+from typing import Any, Dict, List, Optional
+
+CARDIAC_KEYWORDS = ["heart", "cardiac", "angina", "murmur", "failure"]
+RESPIRATORY_KEYWORDS = ["lung", "asthma", "copd", "breath"]
+
+
+def age_band(age: Optional[int]) -> str:
+    if age is None: return "unknown"
+    if age < 18: return "0-17"
+    if age < 40: return "18-39"
+    if age < 65: return "40-64"
+    return "65+"
+
+
+def systolic_band(bp: Optional[int]) -> str:
+    # 160 is a rule threshold - keep it a band boundary
+    if bp is None: return "unknown"
+    if bp <= 90: return "low"
+    if bp <= 140: return "normal"
+    if bp <= 160: return "elevated"
+    return "high"
+
+
+def heart_rate_band(hr: Optional[int]) -> str:
+    if hr is None: return "unknown"
+    if hr < 50: return "low"
+    if hr <= 100: return "normal"
+    if hr <= 120: return "elevated"
+    return "high"
+
+
+def temperature_band(temp: Optional[float]) -> str:
+    if temp is None: return "unknown"
+    if temp < 97.0: return "low"
+    if temp <= 99.5: return "normal"
+    if temp <= 101.5: return "fever"
+    return "high fever"
+
+
+CONDITION_CATEGORIES = {
+    "cardiac": CARDIAC_KEYWORDS + ["coronary", "arrhythmia", "hypertension"],
+    "respiratory": RESPIRATORY_KEYWORDS + ["pulmonary", "pneumonia"],
+    "metabolic": ["diabetes", "thyroid", "obesity"],
+    "renal": ["kidney", "renal"],
+    "neurological": ["stroke", "epilep", "seizure", "migraine", "parkinson"],
+}
+
+
+def patient_features(patient: Dict, history: List[Dict]) -> Dict[str, Any]:
+    """
+    The patient-level part of the features: changes only when the patient
+    record or history does, so it can be computed once and cached.
+
+    patient: {"age", "gender"}; history: patient_medical_history rows.
+    """
+    history_text = " ".join([f"{h['condition_name']} {h.get('notes') or ''}" for h in history]).lower()
+
+    return {
+        "age_band": age_band(patient.get("age")),
+        "gender": (patient.get("gender") or "").lower(),
+        "cardiac_history": any(k in history_text for k in CARDIAC_KEYWORDS),
+        "respiratory_history": any(k in history_text for k in RESPIRATORY_KEYWORDS),
+        "chronic_conditions": sum(1 for h in history if h.get("is_chronic")),
+        "condition_categories": sorted(
+            c for c, keywords in CONDITION_CATEGORIES.items() if any(k in history_text for k in keywords)
+        ),
+    }
+
+
+def visit_features(patient_record: Dict[str, Any], vitals: Dict, symptoms: List[Dict]) -> Dict[str, Any]:
+    """
+    Canonical scoring inputs for one visit, from a patient_features() record.
+
+    vitals: {"bp_systolic", "heart_rate", "temperature"};
+    symptoms: [{"symptom_name", "severity_score"}].
+    """
+    return {
+        "age_band": patient_record["age_band"],
+        "gender": patient_record["gender"],
+        "cardiac_history": patient_record["cardiac_history"],
+        "respiratory_history": patient_record["respiratory_history"],
+        "chronic_conditions": patient_record["chronic_conditions"],
+        "bp_band": systolic_band(vitals.get("bp_systolic")),
+        "hr_band": heart_rate_band(vitals.get("heart_rate")),
+        "temp_band": temperature_band(vitals.get("temperature")),
+        "symptoms": sorted(
+            (s["symptom_name"].lower().strip(), s.get("severity_score") or 0) for s in symptoms
+        ),
+    }
+
+
+def extract_features(patient: Dict, history: List[Dict], vitals: Dict, symptoms: List[Dict]) -> Dict[str, Any]:
+    """Canonical scoring inputs for one visit, straight from DB rows"""
+    return visit_features(patient_features(patient, history), vitals, symptoms)
+
+
+def feature_signature(features: Dict[str, Any]) -> str:
+    """Stable hash of a feature record, used as a cache key"""
+    canonical = json.dumps(features, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(canonical.encode()).hexdigest()
+
+
+DEFAULT_RULES = {
+    "version": "rules-1",
+    "base_risk": 0.1,
+    "base_department_scores": {"Emergency": 0.1, "Cardiology": 0.1, "Respiratory": 0.1, "Neurology": 0.1, "General Medicine": 0.15, "Orthopedics": 0.05},
+    # Applied when features[feature] == equals
+    "feature_rules": [
+        {"feature": "cardiac_history", "equals": True, "risk": 0.15, "departments": {"Cardiology": 0.3}, "explain": "Cardiac History"},
+        {"feature": "respiratory_history", "equals": True, "risk": 0.1, "departments": {"Respiratory": 0.3}},
+        {"feature": "bp_band", "equals": "high", "risk": 0.25, "departments": {"Emergency": 0.2, "Cardiology": 0.3}, "explain": "BP >160"},
+    ],
+    # Per symptom, the first rule with a matching keyword applies
+    "symptom_rules": [
+        {"keywords": ["chest", "heart", "pain"], "risk": 0.3, "departments": {"Cardiology": 0.5, "Emergency": 0.2}, "explain": True},
+        {"keywords": ["breath", "cough"], "risk": 0.25, "departments": {"Respiratory": 0.5}},
+    ],
+    "max_risk": 0.99,
+    "risk_levels": {"High": 0.70, "Medium": 0.40},
+}
+
+
+def score_rules(features: Dict[str, Any], rules: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Rule-based triage, used when the external ML engine is unavailable"""
+    rules = rules or DEFAULT_RULES
+    risk_score = rules["base_risk"]
+    explainability = {}
+    dept_scores = dict(rules["base_department_scores"])
+
+    # A. History + Vitals
+    for rule in rules["feature_rules"]:
+        if features.get(rule["feature"]) == rule["equals"]:
+            risk_score += rule["risk"]
+            for dept, boost in rule["departments"].items():
+                dept_scores[dept] = dept_scores.get(dept, 0.0) + boost
+            if rule.get("explain"):
+                explainability[rule["explain"]] = rule["risk"]
+
+    # B. Symptoms
+    for name, _severity in features["symptoms"]:
+        for rule in rules["symptom_rules"]:
+            if any(k in name for k in rule["keywords"]):
+                risk_score += rule["risk"]
+                for dept, boost in rule["departments"].items():
+                    dept_scores[dept] = dept_scores.get(dept, 0.0) + boost
+                if rule.get("explain"):
+                    explainability[f"Sx: {name}"] = rule["risk"]
+                break
+
+    # Normalize
+    risk_score = min(risk_score, rules["max_risk"])
+    # Classification
+    if risk_score > rules["risk_levels"]["High"]: risk_level = "High"
+    elif risk_score > rules["risk_levels"]["Medium"]: risk_level = "Medium"
+    else: risk_level = "Low"
+
+    recommended_department = max(dept_scores, key=dept_scores.get)
+
+    return {
+        "risk_level": risk_level,
+        "risk_score": round(risk_score, 2),
+        "primary_department": recommended_department, # key match
+        "recommended_department": recommended_department,
+        "department_scores": dept_scores,
+        "explainability": explainability,
+        "model_version": rules["version"]
+    }
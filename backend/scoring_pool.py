@@ -0,0 +1,110 @@
+"""
+Process-pool scoring.
+
+Runs feature scoring (embedded model or rules) in a bounded pool of worker
+processes so CPU-heavy scoring never competes with the event loop that also
+serves queue polling.
+
+- Each worker loads the active model and rule set once, in its initializer.
+  Model arrays are memory-mapped, so all workers share one copy in the page
+  cache; a job only carries the visit's small feature record.
+- At most `max_pending` jobs may be in flight. Further callers wait up to
+  `queue_timeout` seconds for a slot and then get PoolSaturated; the caller
+  must then shed work (main.py falls back to the cheap rules), not score the
+  model inline on the event loop.
+- When the registry swaps artifacts the pool is replaced, so workers never
+  score with a stale model.
+"""
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Optional
+
+from scoring import score_rules
+from triage_model import TriageModel
+
+
+class PoolSaturated(Exception):
+    pass
+
+
+# --- Worker side ---
+
+_worker_model: Optional[TriageModel] = None
+_worker_rules: Optional[Dict[str, Any]] = None
+
+
+def _init_worker(model_path: Optional[str], rules: Dict[str, Any]):
+    global _worker_model, _worker_rules
+    _worker_model = TriageModel.load(model_path, mmap=True) if model_path else None
+    _worker_rules = rules
+
+
+def _score_one(features: Dict[str, Any]) -> Dict[str, Any]:
+    if _worker_model is not None:
+        return _worker_model.predict(features)
+    return score_rules(features, _worker_rules)
+
+
+# --- Parent side ---
+
+class ScoringPool:
+    def __init__(self, workers: int, max_pending: int = 64, queue_timeout: float = 2.0):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.queue_timeout = queue_timeout
+        self._slots = asyncio.Semaphore(max_pending)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self.stats = {"jobs": 0, "saturated": 0, "restarts": 0}
+
+    def start(self, model_path: Optional[str], rules: Dict[str, Any]):
+        """(Re)start the workers with the given artifacts; the old pool drains in the background"""
+        old = self._executor
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_worker,
+            initargs=(model_path, rules),
+        )
+        if old is not None:
+            self.stats["restarts"] += 1
+            old.shutdown(wait=False)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def _require_started(self) -> ProcessPoolExecutor:
+        # run_in_executor(None, ...) would quietly score on the thread pool instead
+        if self._executor is None:
+            raise RuntimeError("Scoring pool is not started")
+        return self._executor
+
+    async def _acquire(self):
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.stats["saturated"] += 1
+            raise PoolSaturated(f"Scoring pool busy ({self.max_pending} jobs in flight)")
+
+    async def score(self, features: Dict[str, Any]) -> Dict[str, Any]:
+        executor = self._require_started()
+        await self._acquire()
+        try:
+            self.stats["jobs"] += 1
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(executor, _score_one, features)
+        finally:
+            self._slots.release()
+
+
+def pool_from_env() -> Optional[ScoringPool]:
+    """SCORING_POOL_WORKERS > 0 enables the pool (default: score inline)"""
+    workers = int(os.getenv("SCORING_POOL_WORKERS", "0"))
+    if workers <= 0:
+        return None
+    return ScoringPool(
+        workers=workers,
+        max_pending=int(os.getenv("SCORING_POOL_MAX_PENDING", str(workers * 8))),
+        queue_timeout=float(os.getenv("SCORING_POOL_QUEUE_TIMEOUT", "2")),
+    )
@@ -0,0 +1,84 @@
+-- Change notifications for cross-worker cache coherence (see change_listener.py)
+--
+-- Every row change on the tables the API caches is published on the
+-- `triage_changes` channel as a small JSON payload (ids only, well under
+-- the 8000-byte NOTIFY limit). pg_notify is transactional: listeners only
+-- hear about committed changes, in commit order.
+--
+-- `origin` is the X-Triage-Worker header PostgREST exposes in
+-- request.headers, so a worker can skip the echo of its own writes. It is
+-- null for writes made outside PostgREST (SQL editor, scripts).
+--
+-- Safe to re-run.
+
+CREATE OR REPLACE FUNCTION notify_triage_change() RETURNS trigger AS $$
+DECLARE
+    rec RECORD;
+    payload JSONB;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        rec := OLD;
+    ELSE
+        rec := NEW;
+    END IF;
+
+    payload := jsonb_build_object(
+        'table', TG_TABLE_NAME,
+        'op', TG_OP,
+        'origin', NULLIF(current_setting('request.headers', true), '')::json ->> 'x-triage-worker'
+    );
+
+    IF TG_TABLE_NAME = 'department_queue' THEN
+        payload := payload || jsonb_build_object(
+            'queue_id', rec.queue_id,
+            'dept_id', rec.dept_id,
+            'prediction_id', rec.prediction_id,
+            'status', rec.status,
+            'priority_score', rec.priority_score
+        );
+    ELSIF TG_TABLE_NAME = 'triage_predictions' THEN
+        -- Risk shows on the prediction's queue entries, so name them
+        payload := payload || jsonb_build_object(
+            'prediction_id', rec.prediction_id,
+            'queues', (
+                SELECT COALESCE(jsonb_agg(jsonb_build_object('queue_id', q.queue_id, 'dept_id', q.dept_id)), '[]'::jsonb)
+                FROM department_queue q
+                WHERE q.prediction_id = rec.prediction_id
+            )
+        );
+    ELSIF TG_TABLE_NAME IN ('patients', 'patient_medical_history') THEN
+        payload := payload || jsonb_build_object('patient_id', rec.patient_id);
+    ELSIF TG_TABLE_NAME = 'departments' THEN
+        payload := payload || jsonb_build_object('dept_id', rec.dept_id);
+    END IF;
+
+    PERFORM pg_notify('triage_changes', payload::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS department_queue_notify ON department_queue;
+CREATE TRIGGER department_queue_notify
+    AFTER INSERT OR UPDATE OR DELETE ON department_queue
+    FOR EACH ROW EXECUTE FUNCTION notify_triage_change();
+
+-- New predictions have no queue entries yet; their department_queue inserts notify
+DROP TRIGGER IF EXISTS triage_predictions_notify ON triage_predictions;
+CREATE TRIGGER triage_predictions_notify
+    AFTER UPDATE OR DELETE ON triage_predictions
+    FOR EACH ROW EXECUTE FUNCTION notify_triage_change();
+
+DROP TRIGGER IF EXISTS patients_notify ON patients;
+CREATE TRIGGER patients_notify
+    AFTER INSERT OR UPDATE OR DELETE ON patients
+    FOR EACH ROW EXECUTE FUNCTION notify_triage_change();
+
+DROP TRIGGER IF EXISTS patient_medical_history_notify ON patient_medical_history;
+CREATE TRIGGER patient_medical_history_notify
+    AFTER INSERT OR UPDATE OR DELETE ON patient_medical_history
+    FOR EACH ROW EXECUTE FUNCTION notify_triage_change();
+
+DROP TRIGGER IF EXISTS departments_notify ON departments;
+CREATE TRIGGER departments_notify
+    AFTER INSERT OR UPDATE OR DELETE ON departments
+    FOR EACH ROW EXECUTE FUNCTION notify_triage_change();
@@ -59,7 +59,8 @@ CREATE TABLE triage_predictions (
 	
 	recommended_department VARCHAR(100),
 	department_scores JSONB,
-	explainability JSONB
+	explainability JSONB,
+	model_version VARCHAR(50) -- Model / rule set version that produced this row
 );
 
 CREATE TABLE department_queue (
@@ -69,7 +70,8 @@ CREATE TABLE department_queue (
 	dept_id INT REFERENCES departments(dept_id),
 	
 	priority_score FLOAT,
-	queue_position INT,
+	queue_position INT, -- Served live by the API position index; not stored per write
+	routing_role VARCHAR(10) DEFAULT 'primary', -- 'primary' or 'shadow'
 	
 	status VARCHAR(20) DEFAULT 'pending',
 	added_timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
@@ -78,3 +80,14 @@ CREATE TABLE department_queue (
 CREATE INDEX idx_patient_visit ON patient_visits(patient_id);
 CREATE INDEX idx_prediction_visit ON triage_predictions(visit_id);
 CREATE INDEX idx_queue_dept ON department_queue(dept_id);
+CREATE INDEX idx_queue_prediction ON department_queue(prediction_id);
+
+-- Active queue entries ranked within their department, as GET /queues/{dept}
+-- orders them; GET /queues reads the top of every department in one query
+CREATE VIEW active_department_queue AS
+SELECT q.*,
+       row_number() OVER (PARTITION BY q.dept_id ORDER BY q.priority_score DESC, q.queue_id) AS queue_rank
+FROM department_queue q
+WHERE q.status NOT IN ('completed', 'discharged');
+
+-- Existing databases: run migrate_database.sql instead
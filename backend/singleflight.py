@@ -0,0 +1,53 @@
+"""
+Single-flight request coalescing.
+
+When several identical reads arrive while one is already being computed
+(wall displays polling /queues/Emergency at the same instant), only the
+first caller - the leader - runs the computation. Everyone else awaits the
+same task and receives the same result, so N concurrent polls cost one DB
+query. Nothing is cached: once the flight lands, the next caller starts a
+new one.
+
+The computation runs as its own task, so a leader whose client disconnects
+doesn't cancel the result the followers are waiting for.
+
+Put the data version in the key when callers must not get a result that
+predates a change they know about; `label` then groups the stats:
+
+    await flights.do(("queue", dept_id, version), load, label=f"queue:{dept_id}")
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+
+class SingleFlight:
+    def __init__(self):
+        self._flights: Dict[Hashable, asyncio.Task] = {}
+        self.stats = {"leaders": 0, "coalesced": 0, "errors": 0, "by_key": {}}
+
+    def _count(self, label: str, field: str):
+        self.stats[field] += 1
+        per_key = self.stats["by_key"].setdefault(label, {"leaders": 0, "coalesced": 0})
+        per_key[field] += 1
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]], label: Optional[str] = None) -> Any:
+        label = label or str(key)
+        task = self._flights.get(key)
+        if task is not None:
+            self._count(label, "coalesced")
+            return await asyncio.shield(task)
+
+        self._count(label, "leaders")
+        task = asyncio.ensure_future(fn())
+        self._flights[key] = task
+        task.add_done_callback(lambda t: self._land(key, t))
+        return await asyncio.shield(task)
+
+    def _land(self, key: Hashable, task: asyncio.Task):
+        if self._flights.get(key) is task:
+            del self._flights[key]
+        if not task.cancelled() and task.exception() is not None:
+            self.stats["errors"] += 1
+
+    def in_flight(self) -> int:
+        return len(self._flights)
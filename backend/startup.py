@@ -0,0 +1,111 @@
+"""
+Startup warm-up and readiness.
+
+Expensive first-use work (connecting to the database, loading departments,
+scoring artifacts and queue indexes, opening connections to the ML engine)
+is registered as warm-up steps and run once at startup, instead of landing
+on the first requests after a deploy:
+
+    warmup = Warmup(started_at)
+
+    @warmup.step("departments")
+    async def load_departments():
+        await run_in_threadpool(get_department_ids)
+
+The process reports ready (/readyz) once every required step has succeeded.
+Failed required steps are retried every `retry_seconds`; optional steps are
+attempted once and only logged. Import, warm-up and import-to-ready times
+are recorded for /readyz and /metrics.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+log = logging.getLogger(__name__)
+
+
+class WarmupStep:
+    def __init__(self, name: str, fn: Callable[[], Awaitable[Any]], required: bool):
+        self.name = name
+        self.fn = fn
+        self.required = required
+        self.ok: Optional[bool] = None
+        self.seconds: Optional[float] = None
+        self.attempts = 0
+        self.error: Optional[str] = None
+
+
+class Warmup:
+    def __init__(self, started_at: float):
+        self.started_at = started_at  # time.perf_counter() at the start of the import
+        self.imported_at: Optional[float] = None
+        self.warmup_started_at: Optional[float] = None
+        self.ready_at: Optional[float] = None
+        self.shutting_down = False
+        self.steps: List[WarmupStep] = []
+
+    def step(self, name: str, required: bool = True):
+        """Register an async warm-up step; steps run in registration order"""
+        def register(fn):
+            self.steps.append(WarmupStep(name, fn, required))
+            return fn
+        return register
+
+    def mark_imported(self):
+        self.imported_at = time.perf_counter()
+
+    @property
+    def ready(self) -> bool:
+        return self.ready_at is not None and not self.shutting_down
+
+    async def _run_step(self, step: WarmupStep):
+        step.attempts += 1
+        start = time.perf_counter()
+        try:
+            await step.fn()
+            step.ok, step.error = True, None
+        except Exception as e:
+            step.ok, step.error = False, str(e)
+            level = logging.ERROR if step.required else logging.WARNING
+            log.log(level, f"Warm-up step {step.name} failed: {e}", extra={"attempt": step.attempts})
+        step.seconds = time.perf_counter() - start
+
+    async def run(self, retry_seconds: float = 5.0):
+        self.warmup_started_at = time.perf_counter()
+        pending = list(self.steps)
+        while True:
+            for step in pending:
+                await self._run_step(step)
+            pending = [s for s in self.steps if s.required and not s.ok]
+            if not pending:
+                break
+            await asyncio.sleep(retry_seconds)
+
+        self.ready_at = time.perf_counter()
+        log.info("Ready", extra=self.timings())
+
+    def timings(self) -> Dict[str, Optional[float]]:
+        def span(start, end):
+            return round(end - start, 3) if start is not None and end is not None else None
+        return {
+            "import_seconds": span(self.started_at, self.imported_at),
+            "warmup_seconds": span(self.warmup_started_at, self.ready_at),
+            "import_to_ready_seconds": span(self.started_at, self.ready_at),
+        }
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "status": "shutting_down" if self.shutting_down else "ready" if self.ready else "starting",
+            **self.timings(),
+            "steps": {
+                s.name: {
+                    "ok": s.ok,
+                    "required": s.required,
+                    "seconds": round(s.seconds, 3) if s.seconds is not None else None,
+                    "attempts": s.attempts,
+                    **({"error": s.error} if s.error else {}),
+                }
+                for s in self.steps
+            },
+        }
@@ -0,0 +1,81 @@
+"""
+Dashboard aggregation.
+
+Pure functions over rows already fetched from the database, kept out of
+main.py so they can be benchmarked (bench_suite.py) without a database.
+"""
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+log = logging.getLogger(__name__)
+
+
+def summarize_active_queue(active_items: List[Dict[str, Any]], now: Optional[datetime] = None) -> Dict[str, int]:
+    """
+    Risk breakdown and average wait (minutes) of the active visits in
+    department_queue rows embedding triage_predictions(risk_level,
+    patient_visits(visit_timestamp)). A patient queued to several
+    departments is counted once.
+    """
+    unique_active_preds = {}
+
+    avg_wait = 0
+    total_seconds = 0
+    valid_wait_times = 0
+
+    if active_items:
+        try:
+            now = now or datetime.now(timezone.utc)
+
+            for item in active_items:
+                pred_id = item['prediction_id']
+
+                if pred_id not in unique_active_preds:
+                    unique_active_preds[pred_id] = {
+                        "risk_level": item['triage_predictions'].get('risk_level', 'Low')
+                    }
+
+                    try:
+                        ts_str = item['triage_predictions']['patient_visits']['visit_timestamp']
+                        if ts_str.endswith('Z'):
+                            ts_str = ts_str.replace('Z', '+00:00')
+                        visit_time = datetime.fromisoformat(ts_str)
+                        if visit_time.tzinfo is None:
+                            visit_time = visit_time.replace(tzinfo=timezone.utc)
+
+                        diff = now - visit_time
+                        wait_secs = max(0, diff.total_seconds())
+                        total_seconds += wait_secs
+                        valid_wait_times += 1
+
+                    except Exception:
+                        pass
+
+        except Exception as e:
+            log.warning(f"Error calculating stats: {e}")
+
+    high_count = 0
+    medium_count = 0
+    low_count = 0
+
+    for pid, data in unique_active_preds.items():
+        if data['risk_level'] == 'High':
+            high_count += 1
+        elif data['risk_level'] == 'Medium':
+            medium_count += 1
+        else:
+            low_count += 1
+
+    active_count = len(unique_active_preds)
+
+    if valid_wait_times > 0:
+        avg_wait = int((total_seconds / valid_wait_times) / 60)
+
+    return {
+        "active_visits": active_count,
+        "high_risk_patients": high_count,
+        "medium_risk_patients": medium_count,
+        "low_risk_patients": low_count,
+        "avg_wait_time": avg_wait
+    }
@@ -0,0 +1,96 @@
+"""
+Latency and failure injection for the local stand-ins (fake database, ML
+engine stub, LLM stub).
+
+Each stand-in reads a profile from env vars under its own prefix. For
+prefix ML_STUB:
+
+    ML_STUB_LATENCY=lognormal:80:40   distribution:mean_ms[:spread_ms]
+                                      (fixed, uniform, exponential, lognormal)
+    ML_STUB_ERROR_RATE=0.02           share of calls that fail
+    ML_STUB_COLD_START_MS=8000        extra delay before the first call is served...
+    ML_STUB_IDLE_SECONDS=900          ...and again after this long without traffic (0 = first call only)
+    ML_STUB_SEED=7                    make the samples reproducible
+
+Calls that arrive during a cold start all wait for it to finish, the way
+requests pile up behind a service that is spinning up.
+"""
+import math
+import os
+import random
+import time
+from typing import Optional
+
+DISTRIBUTIONS = ("fixed", "uniform", "exponential", "lognormal")
+
+
+class LatencyProfile:
+    def __init__(
+        self,
+        distribution: str = "fixed",
+        mean_ms: float = 0.0,
+        spread_ms: float = 0.0,
+        error_rate: float = 0.0,
+        cold_start_ms: float = 0.0,
+        idle_seconds: float = 0.0,
+        seed: Optional[int] = None,
+    ):
+        if distribution not in DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution {distribution!r}, expected one of {DISTRIBUTIONS}")
+        self.distribution = distribution
+        self.mean_ms = mean_ms
+        self.spread_ms = spread_ms
+        self.error_rate = error_rate
+        self.cold_start_ms = cold_start_ms
+        self.idle_seconds = idle_seconds
+        self._rng = random.Random(seed)
+        self._last_call: Optional[float] = None
+        self._warm_at = 0.0
+
+    @classmethod
+    def from_env(cls, prefix: str) -> "LatencyProfile":
+        spec = os.getenv(f"{prefix}_LATENCY", "fixed:0").split(":")
+        seed = os.getenv(f"{prefix}_SEED")
+        return cls(
+            distribution=spec[0],
+            mean_ms=float(spec[1]) if len(spec) > 1 else 0.0,
+            spread_ms=float(spec[2]) if len(spec) > 2 else 0.0,
+            error_rate=float(os.getenv(f"{prefix}_ERROR_RATE", "0")),
+            cold_start_ms=float(os.getenv(f"{prefix}_COLD_START_MS", "0")),
+            idle_seconds=float(os.getenv(f"{prefix}_IDLE_SECONDS", "0")),
+            seed=int(seed) if seed else None,
+        )
+
+    def _sample_ms(self) -> float:
+        m, s = self.mean_ms, self.spread_ms
+        if m <= 0:
+            return 0.0
+        if self.distribution == "uniform":
+            return self._rng.uniform(max(0.0, m - s), m + s)
+        if self.distribution == "exponential":
+            return self._rng.expovariate(1.0 / m)
+        if self.distribution == "lognormal" and s > 0:
+            sigma = math.sqrt(math.log(1 + (s / m) ** 2))
+            return self._rng.lognormvariate(math.log(m) - sigma ** 2 / 2, sigma)
+        return m
+
+    def delay_seconds(self) -> float:
+        """Delay for the next call, including any cold start it has to wait out"""
+        now = time.monotonic()
+        if self.cold_start_ms > 0:
+            cold = self._last_call is None or (self.idle_seconds > 0 and now - self._last_call > self.idle_seconds)
+            if cold and now >= self._warm_at:
+                self._warm_at = now + self.cold_start_ms / 1000
+        self._last_call = now
+        return max(0.0, self._warm_at - now) + self._sample_ms() / 1000
+
+    def fails(self) -> bool:
+        return self.error_rate > 0 and self._rng.random() < self.error_rate
+
+    def describe(self) -> dict:
+        return {
+            "latency": f"{self.distribution}:{self.mean_ms:g}:{self.spread_ms:g}",
+            "error_rate": self.error_rate,
+            "cold_start_ms": self.cold_start_ms,
+            "idle_seconds": self.idle_seconds,
+        }
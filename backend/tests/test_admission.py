@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+
+from admission import AdmissionController, Rejected, classify
+
+
+def controller(total=1, limit=4, timeout=1.0):
+    classes = ("triage", "write", "read", "explain")
+    return AdmissionController(
+        total=total,
+        limits={c: limit for c in classes},
+        queue_timeouts={c: timeout for c in classes},
+    )
+
+
+def test_classify():
+    assert classify("POST", "/patient-visits") == "triage"
+    assert classify("POST", "/patients") == "triage"
+    assert classify("PATCH", "/queue/1/status") == "write"
+    assert classify("GET", "/queues/Emergency") == "read"
+    assert classify("POST", "/triage-explain") == "explain"
+    assert classify("GET", "/healthz") is None
+    assert classify("GET", "/admin/scoring") is None
+    assert classify("OPTIONS", "/queues") is None
+
+
+def test_freed_slots_go_to_waiters_in_priority_order():
+    async def scenario():
+        admission = controller(total=1)
+        await admission.acquire("read")  # Holds the only slot
+        order = []
+
+        async def request(cls):
+            await admission.acquire(cls)
+            order.append(cls)
+            admission.release(cls)
+
+        waiters = []
+        for cls in ("read", "write", "triage", "read"):
+            waiters.append(asyncio.create_task(request(cls)))
+            await asyncio.sleep(0)  # Queue them in this order
+        assert admission.under_pressure
+
+        admission.release("read")
+        await asyncio.gather(*waiters)
+        return order
+
+    assert asyncio.run(scenario()) == ["triage", "write", "read", "read"]
+
+
+def test_class_at_its_limit_is_skipped_for_lower_priority():
+    async def scenario():
+        admission = AdmissionController(
+            total=2,
+            limits={"triage": 1, "write": 2, "read": 2, "explain": 1},
+            queue_timeouts={"triage": 1.0, "write": 1.0, "read": 1.0, "explain": 0.0},
+        )
+        await admission.acquire("triage")
+        await admission.acquire("read")
+        triage = asyncio.create_task(admission.acquire("triage"))
+        read = asyncio.create_task(admission.acquire("read"))
+        await asyncio.sleep(0)
+
+        admission.release("read")  # Triage is still at its own limit
+        await asyncio.wait_for(read, 1)
+        assert not triage.done()
+
+        admission.release("triage")
+        await asyncio.wait_for(triage, 1)
+
+    asyncio.run(scenario())
+
+
+def test_queue_timeout_rejects_with_503():
+    async def scenario():
+        admission = controller(total=1, timeout=0.01)
+        await admission.acquire("write")
+        with pytest.raises(Rejected) as rejected:
+            await admission.acquire("read")
+        assert rejected.value.status_code == 503
+        assert admission.snapshot()["waiting"] == 0
+        assert admission.stats["rejected"]["read"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_explain_is_shed_under_pressure():
+    async def scenario():
+        admission = controller(total=4)
+        await admission.acquire("explain")
+        admission.release("explain")
+        for _ in range(3):  # 3 of 4 is the default shed threshold
+            await admission.acquire("read")
+        with pytest.raises(Rejected) as rejected:
+            await admission.acquire("explain")
+        assert rejected.value.status_code == 429
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def scenario():
+        admission = controller(total=1)
+        await admission.acquire("read")
+        waiter = asyncio.create_task(admission.acquire("write"))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        admission.release("read")
+        assert admission.snapshot()["waiting"] == 0
+        assert admission.total_in_flight == 0
+
+    asyncio.run(scenario())
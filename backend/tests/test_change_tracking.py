@@ -0,0 +1,61 @@
+from change_tracking import ChangeCounters, QueueChangeLog, etag_matches, make_etag
+
+
+def test_etag_matches():
+    etag = make_etag("q", "abc", 1, 2)
+    assert etag == 'W/"q-abc-1-2"'
+    assert etag_matches(etag, etag)
+    assert etag_matches('"q-abc-1-2"', etag)  # Weak comparison
+    assert etag_matches('W/"other", W/"q-abc-1-2"', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches("", etag)
+    assert not etag_matches('W/"q-abc-1-3"', etag)
+
+
+def test_counters():
+    counters = ChangeCounters()
+    counters.bump(("dept", 1), "patients")
+    counters.bump(("dept", 1))
+    assert counters.get(("dept", 1)) == 2
+    assert counters.get(("dept", 2)) == 0
+    assert counters.total == 3
+    assert ChangeCounters().epoch != counters.epoch
+
+
+def test_since_returns_latest_op_per_entry():
+    log = QueueChangeLog(ChangeCounters())
+    start = log.version(1)
+    log.record(1, 10, "upsert")
+    middle = log.version(1)
+    log.record(1, 11, "upsert")
+    log.record(1, 10, "remove")
+    log.record(2, 20, "upsert")  # Other departments don't show up
+
+    assert log.since(1, start) == {10: "remove", 11: "upsert"}
+    assert log.since(1, middle) == {11: "upsert", 10: "remove"}
+    assert log.since(1, log.version(1)) == {}
+
+
+def test_since_needs_resync():
+    log = QueueChangeLog(ChangeCounters(), max_entries=2)
+    start = log.version(1)
+    epoch, _, n = start.rpartition("-")
+    for queue_id in range(3):
+        log.record(1, queue_id, "upsert")
+
+    assert log.since(1, start) is None  # Oldest change was dropped
+    assert log.since(1, f"{epoch}-1") == {1: "upsert", 2: "upsert"}
+    assert log.since(1, f"{epoch}-99") is None  # Ahead of us
+    assert log.since(1, "feedbeef-1") is None  # Another process lifetime
+    assert log.since(1, "garbage") is None
+
+
+def test_reset_invalidates_held_versions():
+    log = QueueChangeLog(ChangeCounters())
+    log.record(1, 10, "upsert")
+    held = log.version(1)
+    log.reset([1, 2])
+    assert log.version(1) != held
+    assert log.since(1, held) is None
+    assert log.since(1, log.version(1)) == {}
@@ -0,0 +1,46 @@
+import gzip
+
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from compression import CompressionMiddleware
+
+
+def client():
+    app = Starlette(routes=[
+        Route("/big", lambda r: JSONResponse({"rows": ["x" * 50] * 100})),
+        Route("/small", lambda r: JSONResponse({"ok": True}, headers={"Vary": "Origin"})),
+        Route("/image", lambda r: Response(b"\x89PNG" * 500, media_type="image/png")),
+    ])
+    app.add_middleware(CompressionMiddleware, minimum_size=1024)
+    return TestClient(app)
+
+
+def test_large_json_is_compressed_and_varies():
+    r = client().get("/big", headers={"Accept-Encoding": "gzip"})
+    assert r.headers["content-encoding"] == "gzip"
+    assert r.headers["vary"] == "Accept-Encoding"
+    assert len(r.json()["rows"]) == 100
+
+
+def test_small_body_varies_and_keeps_existing_vary():
+    r = client().get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in r.headers
+    assert r.headers["vary"] == "Origin, Accept-Encoding"
+
+
+def test_client_without_an_encoding_still_gets_vary():
+    r = client().get("/big", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in r.headers
+    assert r.headers["vary"] == "Accept-Encoding"
+    r = client().get("/big", headers={"Accept-Encoding": ""})
+    assert r.headers["vary"] == "Accept-Encoding"
+
+
+def test_other_content_types_pass_through():
+    r = client().get("/image", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in r.headers
+    assert "vary" not in r.headers
+    assert not r.content.startswith(gzip.compress(b"")[:2])
@@ -0,0 +1,63 @@
+import asyncio
+import json
+
+import httpx
+
+from ml_batcher import BATCH_PATH, MLMicroBatcher
+
+
+def batcher(handler, **kwargs):
+    b = MLMicroBatcher(base_url="http://engine", enabled=True, **kwargs)
+    b._client = httpx.AsyncClient(base_url="http://engine", transport=httpx.MockTransport(handler))
+    return b
+
+
+def test_concurrent_visits_share_one_batch_call():
+    calls = []
+
+    async def handler(request):
+        calls.append(request.url.path)
+        ids = json.loads(request.content)["visit_ids"]
+        return httpx.Response(200, json={"results": [{"visit_id": i, "risk_score": i / 10} for i in ids]})
+
+    async def scenario():
+        b = batcher(handler, max_wait_ms=10)
+        results = await asyncio.gather(*(b.score(i) for i in range(3)))
+        await b.close()
+        return results
+
+    assert [r["risk_score"] for r in asyncio.run(scenario())] == [0.0, 0.1, 0.2]
+    assert calls == [BATCH_PATH]
+
+
+def test_close_flushes_and_waits_for_in_flight_batches():
+    async def handler(request):
+        await asyncio.sleep(0.02)
+        ids = json.loads(request.content)["visit_ids"]
+        return httpx.Response(200, json={"results": [{"visit_id": i} for i in ids]})
+
+    async def scenario():
+        b = batcher(handler, max_wait_ms=1000)
+        waiting = [asyncio.create_task(b.score(i)) for i in range(2)]
+        await asyncio.sleep(0)
+        await b.close()
+        assert all(t.done() for t in waiting)
+        assert not b._in_flight
+        return [t.result()["visit_id"] for t in waiting]
+
+    assert asyncio.run(scenario()) == [0, 1]
+
+
+def test_missing_result_fails_only_that_visit():
+    async def handler(request):
+        return httpx.Response(200, json={"results": [{"visit_id": 1}]})
+
+    async def scenario():
+        b = batcher(handler, max_batch_size=2)
+        results = await asyncio.gather(b.score(1), b.score(2), return_exceptions=True)
+        await b.close()
+        return results
+
+    found, missing = asyncio.run(scenario())
+    assert found == {"visit_id": 1}
+    assert isinstance(missing, ValueError)
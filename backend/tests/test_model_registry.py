@@ -0,0 +1,35 @@
+import json
+import os
+
+import pytest
+
+from model_registry import ScoringRegistry
+from scoring import DEFAULT_RULES
+
+
+def registry(tmp_path, use_model):
+    models, rules = tmp_path / "models", tmp_path / "rules"
+    models.mkdir()
+    rules.mkdir()
+    (rules / "r2.json").write_text(json.dumps({**DEFAULT_RULES, "version": "r2"}))
+    return ScoringRegistry(str(models), str(rules), use_model=use_model)
+
+
+def test_rules_only_registry_rejects_a_model_version(tmp_path):
+    scorers = registry(tmp_path, use_model=False)
+    with pytest.raises(ValueError):
+        scorers.reload(model_version="lr-1", rules_version="r2")
+    assert not os.path.exists(tmp_path / "models" / "CURRENT")
+    assert not os.path.exists(tmp_path / "rules" / "CURRENT")
+    assert scorers.active.versions == {"model": None, "rules": DEFAULT_RULES["version"]}
+
+
+def test_rules_only_registry_still_swaps_rules(tmp_path):
+    scorers = registry(tmp_path, use_model=False)
+    (tmp_path / "models" / "CURRENT").write_text("lr-1")
+    swapped = []
+    scorers.on_swap(swapped.append)
+    snapshot = scorers.reload(rules_version="r2")
+    assert snapshot.versions == {"model": None, "rules": "r2"}
+    assert (tmp_path / "rules" / "CURRENT").read_text() == "r2"
+    assert swapped == [snapshot]
@@ -0,0 +1,67 @@
+from types import SimpleNamespace
+
+import pytest
+
+from pretriage import (
+    DIASTOLIC_HIGH, HEART_RATE_HIGH, HEART_RATE_LOW, SYSTOLIC_HIGH, SYSTOLIC_LOW,
+    TEMPERATURE_HIGH, TEMPERATURE_LOW, check_red_flags,
+)
+
+
+def visit(symptoms=(), **vitals):
+    """A VisitInput-shaped visit with unremarkable vitals unless overridden"""
+    values = {"bp_systolic": 120, "bp_diastolic": 80, "heart_rate": 80, "temperature": 98.6}
+    values.update(vitals)
+    return SimpleNamespace(
+        symptoms=[SimpleNamespace(symptom_name=name, severity_score=severity) for name, severity in symptoms],
+        **values,
+    )
+
+
+def test_normal_visit_has_no_flags():
+    assert check_red_flags(visit([("cough", 3)])) == []
+
+
+@pytest.mark.parametrize("vitals, flagged", [
+    ({"bp_systolic": SYSTOLIC_HIGH}, True),
+    ({"bp_systolic": SYSTOLIC_HIGH - 1}, False),
+    ({"bp_systolic": SYSTOLIC_LOW}, True),
+    ({"bp_systolic": SYSTOLIC_LOW + 1}, False),
+    ({"bp_diastolic": DIASTOLIC_HIGH}, True),
+    ({"bp_diastolic": DIASTOLIC_HIGH - 1}, False),
+    ({"heart_rate": HEART_RATE_HIGH}, True),
+    ({"heart_rate": HEART_RATE_HIGH - 1}, False),
+    ({"heart_rate": HEART_RATE_LOW}, True),
+    ({"heart_rate": HEART_RATE_LOW + 1}, False),
+    ({"temperature": TEMPERATURE_HIGH}, True),
+    ({"temperature": TEMPERATURE_HIGH - 0.1}, False),
+    ({"temperature": TEMPERATURE_LOW - 0.1}, True),
+    ({"temperature": TEMPERATURE_LOW}, False),  # The intake form's minimum
+])
+def test_vital_thresholds(vitals, flagged):
+    assert bool(check_red_flags(visit(**vitals))) == flagged
+
+
+@pytest.mark.parametrize("name", [
+    "Unconscious", "seizure", "suspected stroke", "anaphylaxis", "severe bleeding",
+    "cardiac arrest", "overdose", "not breathing", "thunderclap headache",
+])
+def test_critical_symptoms_flag_at_any_severity(name):
+    assert check_red_flags(visit([(name, 1)])) == [f"Sx: {name.lower()}"]
+
+
+@pytest.mark.parametrize("name", ["Chest Pain", "Shortness of Breath", "difficulty breathing"])
+def test_severe_symptoms_flag_only_at_maximum_severity(name):
+    assert check_red_flags(visit([(name, 5)])) == [f"Sx: {name.lower()} (severity 5)"]
+    assert check_red_flags(visit([(name, 4)])) == []
+    # Out-of-scale values (the API rejects them) never fast-track
+    assert check_red_flags(visit([(name, 10)])) == []
+
+
+def test_ordinary_headache_is_not_a_red_flag():
+    assert check_red_flags(visit([("Headache", 5)])) == []
+
+
+def test_flags_accumulate():
+    flags = check_red_flags(visit([("chest pain", 5)], bp_systolic=200, heart_rate=140))
+    assert flags == ["Systolic BP 200", "Heart rate 140", "Sx: chest pain (severity 5)"]
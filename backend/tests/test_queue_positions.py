@@ -0,0 +1,121 @@
+import random
+
+from queue_positions import DepartmentPositions, QueuePositionIndex
+
+
+def expected_positions(entries):
+    """Same order as GET /queues/{dept}: priority desc, then queue_id"""
+    ordered = sorted(entries.items(), key=lambda item: (-item[1], item[0]))
+    return {queue_id: i + 1 for i, (queue_id, _) in enumerate(ordered)}
+
+
+def test_orders_by_priority_then_queue_id():
+    positions = DepartmentPositions()
+    positions.insert(3, 0.5)
+    positions.insert(1, 0.9)
+    positions.insert(2, 0.5)
+    assert [positions.position(q) for q in (1, 2, 3)] == [1, 2, 3]
+    assert len(positions) == 3
+
+
+def test_priorities_within_one_bucket_keep_exact_order():
+    positions = DepartmentPositions()
+    positions.insert(1, 0.54)
+    positions.insert(2, 0.5405)  # Shadow priority, finer than the bucket width
+    assert positions.position(2) == 1
+    assert positions.position(1) == 2
+
+
+def test_remove_and_reinsert():
+    positions = DepartmentPositions()
+    for queue_id, priority in [(1, 0.9), (2, 0.8), (3, 0.7)]:
+        positions.insert(queue_id, priority)
+    positions.remove(1)
+    assert positions.position(1) is None
+    assert positions.position(3) == 2
+    positions.insert(3, 0.95)  # Re-inserting moves the entry
+    assert positions.position(3) == 1
+    assert len(positions) == 2
+    positions.remove(42)  # Unknown ids are ignored
+
+
+def test_out_of_range_priorities_are_clamped():
+    positions = DepartmentPositions()
+    positions.insert(1, None)
+    positions.insert(2, -1.0)
+    positions.insert(3, 99.0)
+    assert positions.position(3) == 1
+    assert {positions.position(1), positions.position(2)} == {2, 3}
+
+
+def test_matches_sorted_order_under_random_updates():
+    rng = random.Random(7)
+    positions = DepartmentPositions()
+    entries = {}
+    for step in range(3000):
+        queue_id = rng.randint(1, 200)
+        if queue_id in entries and rng.random() < 0.4:
+            positions.remove(queue_id)
+            del entries[queue_id]
+        else:
+            priority = round(rng.uniform(0.0, 3.0), rng.choice([2, 3, 4]))
+            positions.insert(queue_id, priority)
+            entries[queue_id] = priority
+        if step % 50 == 0:
+            assert {q: positions.position(q) for q in entries} == expected_positions(entries)
+    assert {q: positions.position(q) for q in entries} == expected_positions(entries)
+
+
+def test_index_loads_department_once_then_applies_hooks():
+    loads = []
+
+    def loader(dept_id):
+        loads.append(dept_id)
+        return [{"queue_id": 1, "priority_score": 0.5}, {"queue_id": 2, "priority_score": 0.7}]
+
+    index = QueuePositionIndex(loader)
+    index.on_insert(1, 3, 0.9)  # Not loaded yet: left to the loader
+    assert index.position(1, 2) == 1
+    index.on_insert(1, 3, 0.9)
+    index.on_remove(1, 2)
+    assert index.position(1, 3) == 1
+    assert index.position(1, 1) == 2
+    assert loads == [1]
+
+    index.invalidate(1)
+    assert index.position(1, 3) is None
+    assert loads == [1, 1]
+
+
+def test_hooks_during_a_load_are_replayed():
+    index = None
+
+    def loader(dept_id):
+        rows = [{"queue_id": 1, "priority_score": 0.5}, {"queue_id": 2, "priority_score": 0.6}]
+        # Writes landing after the loader's query, before the index is installed
+        index.on_insert(dept_id, 3, 0.9)
+        index.on_remove(dept_id, 2)
+        return rows
+
+    index = QueuePositionIndex(loader)
+    assert index.position(1, 3) == 1
+    assert index.position(1, 1) == 2
+    assert index.position(1, 2) is None
+    assert index._loading == {}
+
+
+def test_load_overlapping_invalidate_is_not_installed():
+    index = None
+    loads = []
+
+    def loader(dept_id):
+        loads.append(dept_id)
+        if len(loads) == 1:
+            index.invalidate()  # e.g. a resync after missed notifications
+        return [{"queue_id": 1, "priority_score": 0.5}]
+
+    index = QueuePositionIndex(loader)
+    assert index.position(1, 1) == 1
+    assert 1 not in index.departments
+    index.position(1, 1)
+    assert 1 in index.departments and loads == [1, 1]
@@ -0,0 +1,75 @@
+import pytest
+
+from routing import MAX_SHADOWS, DepartmentLoadTracker, plan_routing
+
+DEPT_IDS = {"Emergency": 1, "Cardiology": 2, "Respiratory": 3, "Neurology": 4, "General Medicine": 5}
+
+
+def tracker(depths=None):
+    load = DepartmentLoadTracker()
+    load.sync([{"dept_id": d_id} for d_id, n in (depths or {}).items() for _ in range(n)])
+    return load
+
+
+def summary(targets):
+    return [(t.dept_name, t.role) for t in targets]
+
+
+def test_best_score_is_primary_when_queues_are_equal():
+    targets = plan_routing({"Cardiology": 0.9, "Neurology": 0.2}, "Cardiology", DEPT_IDS, tracker())
+    assert summary(targets) == [("Cardiology", "primary")]
+    assert targets[0].priority_score == 0.9
+
+
+def test_shortest_wait_among_close_scores_becomes_primary():
+    scores = {"Cardiology": 0.8, "Respiratory": 0.7}  # Within PRIMARY_MARGIN of each other
+    targets = plan_routing(scores, "Cardiology", DEPT_IDS, tracker({2: 5}))
+    assert summary(targets) == [("Respiratory", "primary")]  # Cardiology is slower: no shadow
+
+
+def test_distant_scores_are_not_interchangeable():
+    scores = {"Cardiology": 0.9, "Respiratory": 0.4}
+    targets = plan_routing(scores, "Cardiology", DEPT_IDS, tracker({2: 5}))
+    assert summary(targets) == [("Cardiology", "primary"), ("Respiratory", "shadow")]
+    assert targets[1].priority_score == pytest.approx(0.36)
+
+
+def test_shadows_are_capped_and_best_score_first():
+    scores = {"Cardiology": 0.9, "Respiratory": 0.5, "Neurology": 0.6, "General Medicine": 0.4}
+    targets = plan_routing(scores, "Cardiology", DEPT_IDS, tracker())
+    shadows = [t.dept_name for t in targets if t.role == "shadow"]
+    assert shadows == ["Neurology", "Respiratory"][:MAX_SHADOWS]
+
+
+def test_no_candidate_falls_back_to_recommended_department():
+    targets = plan_routing({"Cardiology": 0.1}, "Neurology", DEPT_IDS, tracker(), fallback_score=0.3)
+    assert summary(targets) == [("Neurology", "primary")]
+    assert targets[0].priority_score == 0.3
+
+    targets = plan_routing({}, "Unknown", DEPT_IDS, tracker())
+    assert summary(targets) == [("Emergency", "primary")]
+
+
+def test_reserved_primary_only_adds_shadows():
+    scores = {"Emergency": 0.9, "Cardiology": 0.8, "Respiratory": 0.5}
+    targets = plan_routing(scores, "Cardiology", DEPT_IDS, tracker({2: 50}), reserved_primary="Emergency")
+    assert summary(targets) == [("Cardiology", "shadow"), ("Respiratory", "shadow")]
+
+
+def test_oldest_wait_tracks_sync_enqueue_and_empty_queue():
+    load = DepartmentLoadTracker()
+    load.sync([
+        {"dept_id": 1, "added_timestamp": "2020-01-01T00:00:00Z"},
+        {"dept_id": 1, "added_timestamp": "2020-01-01T00:05:00"},
+    ])
+    assert load.depth == {1: 2}
+    assert load.oldest_wait(1) > 365 * 24 * 3600
+    assert load.oldest_wait(2) == 0.0
+
+    load.on_enqueue(2)
+    assert 0.0 <= load.oldest_wait(2) < 5
+
+    load.on_dequeue(1)
+    assert load.oldest_wait(1) > 0
+    load.on_dequeue(1)
+    assert load.oldest_wait(1) == 0.0
@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    async def scenario():
+        flights = SingleFlight()
+        calls = []
+
+        async def load():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return {"rows": len(calls)}
+
+        results = await asyncio.gather(*(flights.do("queue:1", load) for _ in range(5)))
+        assert results == [{"rows": 1}] * 5
+        assert len(calls) == 1
+        assert flights.stats["leaders"] == 1
+        assert flights.stats["coalesced"] == 4
+        assert flights.in_flight() == 0
+
+        # Nothing is cached once the flight has landed
+        assert await flights.do("queue:1", load) == {"rows": 2}
+
+    asyncio.run(scenario())
+
+
+def test_different_keys_fly_separately_under_one_label():
+    async def scenario():
+        flights = SingleFlight()
+
+        async def load(value):
+            await asyncio.sleep(0.01)
+            return value
+
+        results = await asyncio.gather(
+            flights.do(("queue", 1, 1), lambda: load("old"), label="queue:1"),
+            flights.do(("queue", 1, 2), lambda: load("new"), label="queue:1"),
+        )
+        assert results == ["old", "new"]
+        assert flights.stats["by_key"] == {"queue:1": {"leaders": 2, "coalesced": 0}}
+
+    asyncio.run(scenario())
+
+
+def test_errors_reach_every_caller():
+    async def scenario():
+        flights = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("db down")
+
+        results = await asyncio.gather(*(flights.do("k", fail) for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert flights.stats["errors"] == 1
+        assert flights.in_flight() == 0
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_leader_does_not_cancel_followers():
+    async def scenario():
+        flights = SingleFlight()
+
+        async def load():
+            await asyncio.sleep(0.02)
+            return "rows"
+
+        leader = asyncio.create_task(flights.do("k", load))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flights.do("k", load))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        assert await follower == "rows"
+
+    asyncio.run(scenario())
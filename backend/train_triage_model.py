@@ -0,0 +1,158 @@
+"""
+Train the embedded triage model from historical predictions.
+
+Pulls triage_predictions with their visits, patients, history, vitals and
+symptoms, rebuilds the canonical features for each visit and fits the
+logistic model in triage_model.py to reproduce the recorded risk and
+department scores. Only predictions recorded with a remote ML engine
+version are used: rows from the local rules, earlier embedded models,
+red-flag pre-triage or the seed scripts (no version) would feed the model
+its own, a placeholder's or synthetic output. The result is
+written to models/<version>/ and, unless --no-promote is given, made
+current.
+
+    python train_triage_model.py [--models-dir models] [--rules-dir rules] [--epochs 2000] [--no-promote]
+"""
+import argparse
+import os
+import random
+from datetime import datetime, timezone
+
+import numpy as np
+from dotenv import load_dotenv
+
+from db import create_db_client
+from model_registry import _write_pointer
+from pretriage import PRETRIAGE_VERSION
+from scoring import DEFAULT_RULES, extract_features
+from triage_model import FEATURE_NAMES, TriageModel, train, vectorize
+
+load_dotenv()
+supabase = create_db_client()
+
+PAGE_SIZE = 1000
+
+
+def fetch_all(table, columns):
+    rows = []
+    start = 0
+    while True:
+        res = supabase.table(table).select(columns).range(start, start + PAGE_SIZE - 1).execute()
+        rows.extend(res.data)
+        if len(res.data) < PAGE_SIZE:
+            return rows
+        start += PAGE_SIZE
+
+
+def group_by(rows, key):
+    grouped = {}
+    for r in rows:
+        grouped.setdefault(r[key], []).append(r)
+    return grouped
+
+
+def local_versions(models_dir, rules_dir):
+    """model_version values written by this backend's own scorers"""
+    versions = {PRETRIAGE_VERSION, DEFAULT_RULES["version"]}
+    if os.path.isdir(models_dir):
+        versions.update(d for d in os.listdir(models_dir) if os.path.isdir(os.path.join(models_dir, d)))
+    if os.path.isdir(rules_dir):
+        versions.update(f[:-len(".json")] for f in os.listdir(rules_dir) if f.endswith(".json"))
+    return versions
+
+
+def from_remote_engine(prediction, excluded_versions):
+    version = prediction.get("model_version")
+    # No version: written before versions were recorded, by the engine or equally by
+    # the old rules fallback or the seed/demo scripts - no way to tell them apart
+    if not version or version in excluded_versions or version.startswith("lr-"):
+        return False
+    # Fast-tracked visits keep a forced High risk after rescoring
+    return not any(k.startswith("Red flag: ") for k in (prediction.get("explainability") or {}))
+
+
+def load_dataset(departments, excluded_versions):
+    print("Fetching training data...")
+    predictions = fetch_all("triage_predictions", "visit_id, risk_score, department_scores, explainability, model_version")
+    fetched = len(predictions)
+    predictions = [p for p in predictions if from_remote_engine(p, excluded_versions)]
+    visits = {v["visit_id"]: v for v in fetch_all("patient_visits", "visit_id, patient_id")}
+    patients = {p["patient_id"]: p for p in fetch_all("patients", "patient_id, age, gender")}
+    history = group_by(fetch_all("patient_medical_history", "patient_id, condition_name, notes, is_chronic"), "patient_id")
+    vitals = {v["visit_id"]: v for v in fetch_all("vitals", "visit_id, bp_systolic, heart_rate, temperature")}
+    symptoms = group_by(fetch_all("visit_symptoms", "visit_id, symptom_name, severity_score"), "visit_id")
+    print(f"  {len(predictions)} remote-engine predictions (of {fetched}), {len(visits)} visits, {len(patients)} patients")
+
+    X, Y = [], []
+    for p in predictions:
+        visit = visits.get(p["visit_id"])
+        if not visit or not p.get("department_scores") or p.get("risk_score") is None:
+            continue
+        features = extract_features(
+            patients.get(visit["patient_id"], {}),
+            history.get(visit["patient_id"], []),
+            vitals.get(p["visit_id"], {}),
+            symptoms.get(p["visit_id"], []),
+        )
+        X.append(vectorize(features))
+        target = [p["risk_score"]] + [p["department_scores"].get(d, 0.0) for d in departments]
+        Y.append(np.clip(target, 0.0, 1.0))
+
+    return np.array(X, dtype=np.float32), np.array(Y, dtype=np.float32)
+
+
+def evaluate(model, X, Y):
+    P = 1.0 / (1.0 + np.exp(-(X @ model.weights + model.bias)))
+    return {
+        "risk_mae": round(float(np.abs(P[:, 0] - Y[:, 0]).mean()), 4),
+        "department_top1_agreement": round(float((P[:, 1:].argmax(axis=1) == Y[:, 1:].argmax(axis=1)).mean()), 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--models-dir", default="models")
+    parser.add_argument("--rules-dir", default="rules")
+    parser.add_argument("--epochs", type=int, default=2000)
+    parser.add_argument("--no-promote", action="store_true")
+    args = parser.parse_args()
+
+    departments = [d["dept_name"] for d in supabase.table("departments").select("dept_name").order("dept_id").execute().data]
+    X, Y = load_dataset(departments, local_versions(args.models_dir, args.rules_dir))
+    if len(X) < 20:
+        print(f"❌ Only {len(X)} usable rows - not enough to train")
+        return
+
+    order = list(range(len(X)))
+    random.Random(42).shuffle(order)
+    split = int(len(order) * 0.8)
+    train_idx, test_idx = order[:split], order[split:]
+
+    print(f"Training on {len(train_idx)} rows, holding out {len(test_idx)}...")
+    weights, bias = train(X[train_idx], Y[train_idx], epochs=args.epochs)
+
+    version = "lr-" + datetime.now(timezone.utc).strftime("%Y%m%d%H%M%S")
+    model = TriageModel(version, departments, weights, bias, {})
+    metrics = evaluate(model, X[test_idx], Y[test_idx])
+    model.manifest = {
+        "version": version,
+        "kind": "logistic_regression",
+        "departments": departments,
+        "feature_names": FEATURE_NAMES,
+        "trained_at": datetime.now(timezone.utc).isoformat(),
+        "training_rows": len(train_idx),
+        "holdout_metrics": metrics,
+    }
+
+    path = os.path.join(args.models_dir, version)
+    model.save(path)
+    print(f"✅ Saved model {version} to {path}: {metrics}")
+
+    if not args.no_promote:
+        # Atomic: a running API watching CURRENT never reads it half-written
+        _write_pointer(args.models_dir, version)
+        print(f"✅ {version} is now CURRENT")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Embedded triage model.
+
+A small multi-output logistic regression that predicts the risk score and a
+score per department from the canonical visit features (see scoring.py).
+It is trained offline by train_triage_model.py and shipped as a versioned
+artifact directory:
+
+    models/<version>/manifest.json   version, departments, feature names, training metadata
+    models/<version>/weights.npy     (n_features, 1 + n_departments) float32
+    models/<version>/bias.npy        (1 + n_departments,) float32
+    models/CURRENT                   name of the version to serve
+
+Output column 0 is the risk score, the rest follow manifest["departments"].
+Inference is one small dot product - well under a millisecond per visit.
+"""
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+AGE_BANDS = ["0-17", "18-39", "40-64", "65+", "unknown"]
+GENDERS = ["male", "female"]
+BP_BANDS = ["low", "normal", "elevated", "high", "unknown"]
+HR_BANDS = ["low", "normal", "elevated", "high", "unknown"]
+TEMP_BANDS = ["low", "normal", "fever", "high fever", "unknown"]
+SYMPTOM_GROUPS = {
+    "chest": ["chest", "heart", "palpitation"],
+    "pain": ["pain"],
+    "respiratory": ["breath", "cough", "wheez"],
+    "neuro": ["headache", "dizz", "seizure", "numb", "confus", "stroke"],
+    "fever": ["fever", "chill"],
+    "abdominal": ["abdominal", "nausea", "vomit", "diarrh"],
+    "musculoskeletal": ["fracture", "sprain", "back", "joint", "injury", "fall"],
+}
+
+FEATURE_NAMES = (
+    [f"age:{b}" for b in AGE_BANDS]
+    + [f"gender:{g}" for g in GENDERS]
+    + ["cardiac_history", "respiratory_history", "chronic_conditions"]
+    + [f"bp:{b}" for b in BP_BANDS]
+    + [f"hr:{b}" for b in HR_BANDS]
+    + [f"temp:{b}" for b in TEMP_BANDS]
+    + [f"sx:{g}" for g in SYMPTOM_GROUPS]
+    + ["symptom_count"]
+)
+_INDEX = {name: i for i, name in enumerate(FEATURE_NAMES)}
+
+GENDER_ALIASES = {"m": "male", "f": "female"}
+
+
+def vectorize(features: Dict[str, Any]) -> np.ndarray:
+    """Feature record -> fixed-length float32 vector (layout: FEATURE_NAMES)"""
+    x = np.zeros(len(FEATURE_NAMES), dtype=np.float32)
+
+    def one_hot(prefix: str, value: str):
+        i = _INDEX.get(f"{prefix}:{value}")
+        if i is not None:
+            x[i] = 1.0
+
+    one_hot("age", features["age_band"])
+    gender = features["gender"]
+    one_hot("gender", GENDER_ALIASES.get(gender, gender))
+    x[_INDEX["cardiac_history"]] = float(features["cardiac_history"])
+    x[_INDEX["respiratory_history"]] = float(features["respiratory_history"])
+    x[_INDEX["chronic_conditions"]] = min(features["chronic_conditions"], 3) / 3
+    one_hot("bp", features["bp_band"])
+    one_hot("hr", features["hr_band"])
+    one_hot("temp", features["temp_band"])
+
+    for name, severity in features["symptoms"]:
+        for group, keywords in SYMPTOM_GROUPS.items():
+            if any(k in name for k in keywords):
+                i = _INDEX[f"sx:{group}"]
+                x[i] = max(x[i], min(max(severity, 1), 5) / 5)
+    x[_INDEX["symptom_count"]] = min(len(features["symptoms"]), 5) / 5
+    return x
+
+
+def _sigmoid(z: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-z))
+
+
+def train(
+    X: np.ndarray,
+    Y: np.ndarray,
+    epochs: int = 2000,
+    learning_rate: float = 0.5,
+    l2: float = 1e-3,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Fit independent logistic outputs with soft targets in [0, 1] by
+    full-batch gradient descent. Returns (weights, bias) as float32.
+    """
+    n, f = X.shape
+    k = Y.shape[1]
+    W = np.zeros((f, k))
+    b = np.log(np.clip(Y.mean(axis=0), 1e-3, 1 - 1e-3) / (1 - np.clip(Y.mean(axis=0), 1e-3, 1 - 1e-3)))
+    for _ in range(epochs):
+        P = _sigmoid(X @ W + b)
+        G = (P - Y) / n
+        W -= learning_rate * (X.T @ G + l2 * W)
+        b -= learning_rate * G.sum(axis=0)
+    return W.astype(np.float32), b.astype(np.float32)
+
+
+class TriageModel:
+    def __init__(self, version: str, departments: List[str], weights: np.ndarray, bias: np.ndarray, manifest: Dict[str, Any], path: Optional[str] = None):
+        self.version = version
+        self.path = path
+        self.departments = departments
+        self.weights = weights
+        self.bias = bias
+        self.manifest = manifest
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = False) -> "TriageModel":
+        """Load an artifact directory; with mmap=True the arrays are memory-mapped read-only"""
+        with open(os.path.join(path, "manifest.json")) as f:
+            manifest = json.load(f)
+        if manifest["feature_names"] != FEATURE_NAMES:
+            raise ValueError(f"Model {manifest['version']} was trained on a different feature layout")
+        mmap_mode = "r" if mmap else None
+        weights = np.load(os.path.join(path, "weights.npy"), mmap_mode=mmap_mode)
+        bias = np.load(os.path.join(path, "bias.npy"), mmap_mode=mmap_mode)
+        return cls(manifest["version"], manifest["departments"], weights, bias, manifest, path=path)
+
+    def save(self, path: str):
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "weights.npy"), self.weights)
+        np.save(os.path.join(path, "bias.npy"), self.bias)
+        with open(os.path.join(path, "manifest.json"), "w") as f:
+            json.dump(self.manifest, f, indent=2)
+
+    def predict(self, features: Dict[str, Any]) -> Dict[str, Any]:
+        """Score one visit; same result shape as scoring.score_rules()"""
+        x = vectorize(features)
+        out = _sigmoid(x @ self.weights + self.bias)
+
+        risk_score = float(min(out[0], 0.99))
+        if risk_score > 0.70: risk_level = "High"
+        elif risk_score > 0.40: risk_level = "Medium"
+        else: risk_level = "Low"
+
+        dept_scores = {d: round(float(s), 3) for d, s in zip(self.departments, out[1:])}
+        recommended_department = max(dept_scores, key=dept_scores.get)
+
+        # Top positive contributions to the risk output
+        contributions = x * self.weights[:, 0]
+        top = np.argsort(contributions)[::-1][:3]
+        explainability = {FEATURE_NAMES[i]: round(float(contributions[i]), 2) for i in top if contributions[i] > 0}
+
+        return {
+            "risk_level": risk_level,
+            "risk_score": round(risk_score, 2),
+            "primary_department": recommended_department,
+            "recommended_department": recommended_department,
+            "department_scores": dept_scores,
+            "explainability": explainability,
+            "model_version": self.version,
+        }
+
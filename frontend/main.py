@@ -185,7 +185,7 @@ if 'selected_patient' in st.session_state:
     # Dynamic symptom adder (simple version)
     with st.expander("Add Symptoms", expanded=True):
         s_name = st.selectbox("Symptom", ["Chest Pain", "Shortness of Breath", "Fever", "Dizziness", "Nausea", "Headache"])
-        s_severity = st.slider("Severity (1-10)", 1, 10, 5)
+        s_severity = st.slider("Severity (1-5)", 1, 5, 3)
         s_duration = st.text_input("Duration", "1 hour")
         if st.checkbox("Confirm Symptom Entry"):
             symptom_list.append({
@@ -193,7 +193,7 @@ if 'selected_patient' in st.session_state:
                 "severity_score": s_severity,
                 "duration": s_duration
             })
-            st.write(f"Added: {s_name} ({s_severity}/10)")
+            st.write(f"Added: {s_name} ({s_severity}/5)")
     
     if st.button("🚀 SUBMIT FOR TRIAGE", type="primary"):
         # POST to backend
@@ -0,0 +1,255 @@
+"""
+Synthetic ED load test for the triage API.
+
+Drives the backend the way a busy emergency department does and reports
+throughput and p50/p95/p99 latency per endpoint as JSON.
+
+Traffic:
+  - Arrivals: patients arrive as a Poisson process. Each arrival registers
+    (POST /patients), or for returning patients looks them up and reads
+    their history, then checks in (POST /patient-visits).
+  - Surge: with --scenario surge the arrival rate ramps linearly from
+    --rate to --surge-rate over --ramp seconds, holds, then ramps back down.
+  - Discharges: --clinicians workers each pick a waiting patient from a
+    department queue, mark them treating, and then after a treatment time
+    mark them completed (PATCH /queue/{id}/status).
+  - Dashboards: --pollers wall displays poll /dashboard/stats and one
+    department queue every --poll-interval seconds. With --etag they send
+    If-None-Match as a real browser would.
+
+Examples:
+    python loadtest.py --duration 120 --rate 30 --pollers 20
+    python loadtest.py --scenario surge --rate 10 --surge-rate 120 --ramp 30 --duration 180 --out surge.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+from collections import defaultdict
+
+import httpx
+
+DEPARTMENTS = ["Emergency", "Cardiology", "Respiratory", "Neurology", "General Medicine", "Orthopedics"]
+FIRST_NAMES = ["James", "Mary", "Robert", "Patricia", "Michael", "Linda", "David", "Susan", "Thomas", "Karen"]
+LAST_NAMES = ["Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Rodriguez", "Martinez"]
+CONDITIONS = ["Hypertension", "Type 2 Diabetes", "Asthma", "COPD", "Coronary Artery Disease", "Hyperlipidemia"]
+SYMPTOMS = [
+    ("Chest Pain", (3, 5), "2 hours"),
+    ("Shortness of Breath", (2, 5), "1 day"),
+    ("Severe Headache", (2, 4), "3 days"),
+    ("High Fever", (3, 5), "2 days"),
+    ("Abdominal Pain", (2, 5), "4 hours"),
+    ("Dizziness", (1, 3), "Morning"),
+    ("Palpitations", (2, 4), "30 mins"),
+    ("Cough", (1, 3), "1 week"),
+]
+
+
+class Recorder:
+    """Latency samples per endpoint (method + route template)"""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.errors = defaultdict(int)
+        self.started = time.perf_counter()
+
+    async def call(self, client, name, method, url, **kwargs):
+        start = time.perf_counter()
+        try:
+            resp = await client.request(method, url, **kwargs)
+        except httpx.HTTPError as e:
+            self.errors[name] += 1
+            self.statuses[name][type(e).__name__] += 1
+            return None
+        self.samples[name].append(time.perf_counter() - start)
+        self.statuses[name][str(resp.status_code)] += 1
+        if resp.status_code >= 400:
+            self.errors[name] += 1
+        return resp
+
+    def report(self):
+        elapsed = time.perf_counter() - self.started
+        endpoints = {}
+        for name in sorted(set(self.samples) | set(self.errors)):
+            lat = sorted(self.samples[name])
+            endpoints[name] = {
+                "requests": len(lat) + sum(v for k, v in self.statuses[name].items() if not k.isdigit()),
+                "errors": self.errors[name],
+                "throughput_rps": round(len(lat) / elapsed, 2),
+                "p50_ms": percentile(lat, 50),
+                "p95_ms": percentile(lat, 95),
+                "p99_ms": percentile(lat, 99),
+                "max_ms": round(lat[-1] * 1000, 1) if lat else None,
+                "status_codes": dict(self.statuses[name]),
+            }
+        return {"elapsed_seconds": round(elapsed, 1), "endpoints": endpoints}
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    k = max(0, math.ceil(p / 100 * len(sorted_values)) - 1)
+    return round(sorted_values[k] * 1000, 1)
+
+
+def arrival_rate(args, t):
+    """Patients per minute at t seconds into the run"""
+    if args.scenario != "surge":
+        return args.rate
+    ramp_up_end = args.surge_start + args.ramp
+    ramp_down_start = ramp_up_end + args.surge_hold
+    if t < args.surge_start:
+        return args.rate
+    if t < ramp_up_end:
+        return args.rate + (args.surge_rate - args.rate) * (t - args.surge_start) / args.ramp
+    if t < ramp_down_start:
+        return args.surge_rate
+    if t < ramp_down_start + args.ramp:
+        return args.surge_rate - (args.surge_rate - args.rate) * (t - ramp_down_start) / args.ramp
+    return args.rate
+
+
+def new_patient(rng):
+    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+    history = [
+        {"condition_name": c, "is_chronic": True, "notes": f"Patient reports history of {c}", "diagnosis_date": "2020-01-01"}
+        for c in rng.sample(CONDITIONS, rng.randint(1, 2))
+    ] if rng.random() < 0.4 else []
+    return {
+        "full_name": name,
+        "age": rng.randint(1, 95),
+        "gender": rng.choice(["Male", "Female"]),
+        "contact_info": f"{name.lower().replace(' ', '.')}.{rng.randint(1, 10**6)}@example.com",
+        "medical_history": history,
+    }
+
+
+def new_visit(rng, patient_id):
+    name, (lo, hi), duration = rng.choice(SYMPTOMS)
+    severity = rng.randint(lo, hi)
+    sys, dia, hr, temp = 120 + rng.randint(-10, 40), 80 + rng.randint(-10, 20), 80 + rng.randint(-10, 40), 98.6 + rng.random() * 2
+    if name == "Chest Pain" or rng.random() > 0.8:
+        sys, hr, severity = sys + 50, hr + 35, 5
+    return {
+        "patient_id": patient_id,
+        "chief_complaint": f"{name} for {duration}",
+        "bp_systolic": sys,
+        "bp_diastolic": dia,
+        "heart_rate": hr,
+        "temperature": round(temp, 1),
+        "symptoms": [{"symptom_name": name, "severity_score": severity, "duration": duration}],
+    }
+
+
+async def arrive(client, rec, rng, args, known_patients):
+    if known_patients and rng.random() < args.returning:
+        pid, name = rng.choice(known_patients)
+        await rec.call(client, "GET /patients/lookup", "GET", "/patients/lookup", params={"name": name})
+        await rec.call(client, "GET /patients/{id}/history", "GET", f"/patients/{pid}/history")
+    else:
+        payload = new_patient(rng)
+        resp = await rec.call(client, "POST /patients", "POST", "/patients", json=payload)
+        if resp is None or resp.status_code != 200:
+            return
+        pid = resp.json()["patient_id"]
+        known_patients.append((pid, payload["full_name"]))
+    await rec.call(client, "POST /patient-visits", "POST", "/patient-visits", json=new_visit(rng, pid))
+
+
+async def arrivals(client, rec, rng, args, deadline, tasks):
+    known_patients = []
+    start = time.perf_counter()
+    while True:
+        now = time.perf_counter()
+        rate = arrival_rate(args, now - start) / 60.0
+        await asyncio.sleep(rng.expovariate(rate) if rate > 0 else 1.0)
+        if time.perf_counter() >= deadline:
+            return
+        if rate > 0:
+            tasks.append(asyncio.create_task(arrive(client, rec, rng, args, known_patients)))
+
+
+async def clinician(client, rec, rng, args, deadline):
+    while time.perf_counter() < deadline:
+        dept = rng.choice(DEPARTMENTS)
+        resp = await rec.call(client, "GET /queues/{dept}", "GET", f"/queues/{dept}")
+        waiting = [e for e in (resp.json().get("queue", []) if resp is not None and resp.status_code == 200 else [])
+                   if e.get("status") == "pending"]
+        if not waiting:
+            await asyncio.sleep(args.idle)
+            continue
+        entry = rng.choice(waiting[:3])  # Clinicians don't always take the very top entry
+        await rec.call(client, "PATCH /queue/{id}/status", "PATCH", f"/queue/{entry['queue_id']}/status", params={"status": "treating"})
+        await asyncio.sleep(rng.expovariate(1.0 / args.treatment))
+        await rec.call(client, "PATCH /queue/{id}/status", "PATCH", f"/queue/{entry['queue_id']}/status", params={"status": "completed"})
+
+
+async def poller(client, rec, rng, args, deadline):
+    dept = rng.choice(DEPARTMENTS)
+    etags = {}
+    await asyncio.sleep(rng.uniform(0, args.poll_interval))  # Displays don't start in lockstep
+    while time.perf_counter() < deadline:
+        for name, url in (("GET /dashboard/stats", "/dashboard/stats"), ("GET /queues/{dept}", f"/queues/{dept}")):
+            headers = {"If-None-Match": etags[url]} if args.etag and url in etags else {}
+            resp = await rec.call(client, name, "GET", url, headers=headers)
+            if resp is not None and "etag" in resp.headers:
+                etags[url] = resp.headers["etag"]
+        await asyncio.sleep(args.poll_interval)
+
+
+async def run(args):
+    rng = random.Random(args.seed)
+    rec = Recorder()
+    limits = httpx.Limits(max_connections=args.max_connections)
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+        deadline = time.perf_counter() + args.duration
+        arrival_tasks = []
+        workers = [asyncio.create_task(arrivals(client, rec, rng, args, deadline, arrival_tasks))]
+        workers += [asyncio.create_task(clinician(client, rec, rng, args, deadline)) for _ in range(args.clinicians)]
+        workers += [asyncio.create_task(poller(client, rec, rng, args, deadline)) for _ in range(args.pollers)]
+        await asyncio.gather(*workers)
+        await asyncio.gather(*arrival_tasks)  # Let in-flight check-ins finish
+
+    report = rec.report()
+    report["config"] = {k: v for k, v in vars(args).items() if k != "out"}
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--duration", type=float, default=60, help="seconds")
+    parser.add_argument("--scenario", choices=["steady", "surge"], default="steady")
+    parser.add_argument("--rate", type=float, default=20, help="arrivals per minute (base rate)")
+    parser.add_argument("--surge-rate", type=float, default=120, help="arrivals per minute at the surge peak")
+    parser.add_argument("--surge-start", type=float, default=10, help="seconds before the surge starts")
+    parser.add_argument("--ramp", type=float, default=20, help="seconds to ramp up (and down)")
+    parser.add_argument("--surge-hold", type=float, default=30, help="seconds at the peak rate")
+    parser.add_argument("--returning", type=float, default=0.2, help="share of arrivals who are returning patients")
+    parser.add_argument("--clinicians", type=int, default=4)
+    parser.add_argument("--treatment", type=float, default=5, help="mean treatment time in seconds")
+    parser.add_argument("--idle", type=float, default=1, help="seconds a clinician waits when the queue is empty")
+    parser.add_argument("--pollers", type=int, default=10)
+    parser.add_argument("--poll-interval", type=float, default=2)
+    parser.add_argument("--etag", action="store_true", help="pollers send If-None-Match")
+    parser.add_argument("--max-connections", type=int, default=200)
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--out", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+        print(f"Report written to {args.out}")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()